@@ -6,7 +6,13 @@ import time
 import threading
 
 class Controller:
-  def __init__(self, port):
+  def __init__(self, port, led_interval=0.01, led_refresh=0.5):
+    """:param led_interval: least seconds between LED frames
+    :param led_refresh: seconds after which an unchanged LED frame is sent again
+    """
+    self.led_interval = led_interval
+    self.led_refresh = led_refresh
+
     # Open up Serial connection with AutoTracker
     self.ser = serial.Serial(port, 2000000)
     self.LED = ledControl.LedController(self.ser)
@@ -36,13 +42,17 @@ class Controller:
       except:
         time.sleep(0.01)
 
+  # Send the LED frame whenever a new one is committed, and again every led_refresh seconds
   def update_led(self):
+    shown = None
     while not self.stop_led_thread:
+      version = self.LED.wait_for_commit(shown, timeout=self.led_refresh)
       try:
         self.LED.show()
+        shown = version
       except Exception as e:
         print(f"Error updating LEDs: {e}")
-      time.sleep(0.01)
+      time.sleep(self.led_interval)  # commits in the meantime go out together in the next frame
 
   def close(self):
     # Stop the serial_thread at the end of the program
@@ -57,4 +67,78 @@ class Controller:
     self.ser.close()
 
   def are_threads_alive(self):
-    return self.serial_thread.is_alive() and self.led_thread.is_alive()
\ No newline at end of file
+    return self.serial_thread.is_alive() and self.led_thread.is_alive()
+
+
+class ReactorController:
+  """
+  Same interface as Controller, but instead of a reader thread, an LED thread and an animation
+  thread everything runs on an io_reactor.Reactor: serial input is read when it arrives, and LED
+  frames go out on a timer only when a new one has been committed (plus a periodic refresh).
+  """
+
+  def __init__(self, port, reactor, on_input=None, led_interval=0.01, led_refresh=0.5):
+    """:param reactor: the io_reactor.Reactor to run on
+    :param on_input: called on the reactor after each batch of frames, e.g. to act on the new state at once
+    :param led_interval: seconds between LED frame checks
+    :param led_refresh: seconds after which an unchanged LED frame is sent again
+    """
+    self.ser = serial.Serial(port, 2000000, timeout=0)
+    self.LED = ledControl.LedController(self.ser, animate=False)
+    self.inputCtrl = inputControl.inputController(self.ser)
+    self.reactor = reactor
+    self.on_input = on_input
+    self.led_refresh = led_refresh
+
+    self._buffer = b''
+    self._last_frame = None
+    self._last_version = None
+    self._last_write = 0.0
+    self._failed = False
+
+    reactor.add_reader(self.ser.fileno(), self._read)
+    self._led_timer = reactor.call_every(led_interval, self._update_led)
+
+  def _read(self):
+    try:
+      data = self.ser.read(max(1, self.ser.in_waiting))
+    except serial.SerialException as e:
+      print(f"Serial port failed: {e}")
+      self._failed = True
+      self.reactor.remove_reader(self.ser.fileno())
+      return
+    lines = (self._buffer + data).split(b'\n')
+    self._buffer = lines.pop()  # the unfinished line, if any
+    for line in lines:
+      try:
+        self.inputCtrl.processPacket(line.rstrip(b'\r').split(b','), self.LED)
+      except Exception as e:
+        print(f"Error processing serial frame {line!r}: {e}")
+    if lines and self.on_input:
+      self.on_input()
+
+  def _update_led(self):
+    self.LED.step_animations()
+    version = self.LED.version
+    now = time.monotonic()
+    refresh = now - self._last_write >= self.led_refresh
+    if version == self._last_version and not refresh:
+      return
+    frame = self.LED.frame()
+    if frame != self._last_frame or refresh:
+      try:
+        self.ser.write(frame)
+      except Exception as e:
+        print(f"Error updating LEDs: {e}")
+        return
+      self._last_frame = frame
+      self._last_write = now
+    self._last_version = version
+
+  def close(self):
+    self._led_timer.cancel()
+    self.reactor.remove_reader(self.ser.fileno())
+    self.ser.close()
+
+  def are_threads_alive(self):
+    return not self._failed and self.reactor.is_running()
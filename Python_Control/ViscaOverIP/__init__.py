@@ -1,4 +1,5 @@
 from ViscaOverIP.camera import Camera
 from ViscaOverIP.caching_camera import CachingCamera
+from ViscaOverIP.command_handle import CommandHandle, wait_all
 
 __version__ = '0.4.1'
@@ -18,27 +18,32 @@ class CachingCamera(Camera):
         return self.state['focus_mode']
 
     def set_focus_mode(self, mode: str):
-        super().set_focus_mode(mode)
+        handle = super().set_focus_mode(mode)
         self.state['focus_mode'] = mode
+        return handle
 
     def pantilt(self, pan_speed: int, tilt_speed: int, pan_position=None, tilt_position=None, relative=False):
+        handle = None
         if pan_speed == 0 and tilt_speed == 0:
             if self.state['pan_tilt_stop'] is False:
-                super().pantilt(pan_speed, tilt_speed, pan_position, tilt_position, relative)
+                handle = super().pantilt(pan_speed, tilt_speed, pan_position, tilt_position, relative)
 
             self.state['pan_tilt_stop'] = True
 
         else:
-            super().pantilt(pan_speed, tilt_speed, pan_position, tilt_position, relative)
+            handle = super().pantilt(pan_speed, tilt_speed, pan_position, tilt_position, relative)
             self.state['pan_tilt_stop'] = False
+        return handle
 
     def zoom(self, speed: int):
+        handle = None
         if speed == 0:
             if self.state['zoom_stop'] is False:
-                super().zoom(speed)
+                handle = super().zoom(speed)
 
             self.state['zoom_stop'] = True
 
         else:
-            super().zoom(speed)
+            handle = super().zoom(speed)
             self.state['zoom_stop'] = False
+        return handle
@@ -2,59 +2,120 @@ import socket
 from typing import Optional, Tuple
 import logging
 import time
-from threading import Lock
+from contextlib import contextmanager
 
 #from ViscaOverIP.CommandBuffer import CommandBuffer
+from ViscaOverIP.command_handle import CommandHandle, wait_all
 from ViscaOverIP.exceptions import ViscaException, NoQueryResponse
+from ViscaOverIP.lanes import LaneScheduler, lane_for
+from ViscaOverIP.rtt import RttEstimator
+from ViscaOverIP.window import CommandWindow
 
 SEQUENCE_NUM_MAX = 2 ** 32 - 1
 
+# How many times a command refused with "Command buffer full" is offered again, backing off in between
+BUFFER_FULL_RETRIES = 5
+
 class Camera:
     """
     Represents a camera that has a VISCA-over-IP interface.
     Provides methods to control a camera over that interface.
 
+    Commands return a :class:`CommandHandle` that resolves when the camera acknowledges the command and
+    again when it reports the command complete.
+
     Only one camera can be connected on a given port at a time.
     If you wish to use multiple cameras, you will need to switch between them (use :meth:`close_connection`)
     or set them up to use different ports.
     """
-    def __init__(self, ip: str, port=52381):
+    def __init__(self, ip: str, port=52381, local_port=None, rate_caps=None, recorder=None):
         """:param ip: the IP address or hostname of the camera you want to talk to.
         :param port: the port number to use. 52381 is the default for most cameras.
+        :param local_port: the local port to bind to. Defaults to `port`; pass 0 to use an ephemeral port
+            so that several cameras can be connected at once.
+        :param rate_caps: commands per second allowed in each transport lane, see :class:`LaneScheduler`
+        :param recorder: optionally something with a ``visca(sent, ip, datagram)`` method, such as a
+            SessionRecorder, given every datagram sent and received
         """
         self._location = (ip, port)
+        self._local_port = port if local_port is None else local_port
         self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)  # for UDP stuff
-        self._sock.bind(('', port))
-        self._sock.settimeout(0.1)
+        self._sock.bind(('', self._local_port))
+        self.rtt = RttEstimator()  # derives the reply timeout and retry pacing from measured round trips
+        self._sock.settimeout(self.rtt.rto)
+
+        # Serialises access to the socket and sequence number so one camera can be shared between threads,
+        # letting stops go ahead of queued motion, settings and inquiries
+        self._lanes = LaneScheduler(rate_caps)
 
         self.num_missed_responses = 0
+        self.num_buffer_full = 0
+        self.completions = 0  # replies that freed a command socket
+        self._handles = {}  # sequence number -> CommandHandle awaiting its ACK or completion
+        self._handles_by_socket = {}  # camera command socket -> the acknowledged CommandHandle running in it
+        self._tracked = None  # handles collected by track_completions()
+        self.command_listeners = []  # called with the hex of every command sent, e.g. to follow the camera's motion
+        self.recorder = recorder
+        self.window = CommandWindow(self)  # for commands sent with send_pipelined()
         self.sequence_number = 0  # This number is encoded in each message and incremented after sending each message
         self.num_retries = 5
         self.reset_sequence_number()
         self._send_command('00 01')  # clear the camera's interface socket
         #self.command_buffer = CommandBuffer(self)
-        self._operation_lock = Lock()
-
-    def reset_connection(self):
-        # Close the existing socket
-        self._sock.close()
-        
-        # Recreate the socket
-        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self._sock.bind(('', self._location[1]))
-        self._sock.settimeout(0.1)
 
-        # Reset sequence number and clear interface socket
-        self.reset_sequence_number()
-        self._send_command('00 01')
-
-        # Small delay to ensure connection is established
-        time.sleep(0.5)
+    @property
+    def ip(self) -> str:
+        return self._location[0]
 
-    def _send_command(self, command_hex: str, query=False) -> Optional[bytes]:
+    def reset_connection(self):
+        with self._lanes.turn('stop'):
+            # Close the existing socket
+            self._sock.close()
+
+            # Recreate the socket
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.bind(('', self._local_port))
+            self._sock.settimeout(self.rtt.rto)
+
+            # The interface clear below abandons everything the camera was doing
+            for handle in list(self._handles.values()) + list(self._handles_by_socket.values()):
+                if not handle.done:
+                    handle._resolve_cancelled()
+            self._handles.clear()
+            self._handles_by_socket.clear()
+
+            # Reset sequence number and clear interface socket
+            self.reset_sequence_number()
+            self._send_command('00 01')
+
+            # Small delay to ensure connection is established
+            time.sleep(0.5)
+
+    def _send_command(self, command_hex: str, query=False):
+        """Sends a command in its lane. "Command buffer full" is back-pressure, not a broken connection: the
+        command is offered again once a command socket frees up, and other commands that need a socket
+        hold back meanwhile.
+
+        :return: the reply's payload for a query, otherwise a :class:`CommandHandle` for the command
+        """
+        lane = lane_for(command_hex, query)
+        back_off = 0.02
+        for attempt in range(BUFFER_FULL_RETRIES + 1):
+            with self._lanes.turn(lane):
+                try:
+                    return self._send_command_locked(command_hex, query)
+                except ViscaException as exc:
+                    if exc.status_code != 3 or attempt == BUFFER_FULL_RETRIES:
+                        raise
+            self.num_buffer_full += 1
+            self._lanes.back_off(back_off)
+            completions = self.completions
+            self._wait_until(lambda: self.completions != completions, back_off)
+            back_off = min(back_off * 2, 0.5)
+
+    def _send_command_locked(self, command_hex: str, query=False):
         #self.command_buffer.add_command(command_hex, query)
         max_retries = 3
-        retry_delay = 0.1
 
         for retry in range(max_retries):
             try:
@@ -69,20 +130,35 @@ class Camera:
                 sequence_bytes = self.sequence_number.to_bytes(4, 'big')
                 message = payload_type + payload_length + sequence_bytes + payload_bytes
 
-                self._sock.sendto(message, self._location)
+                handle = None
+                if not query:
+                    handle = CommandHandle(self, self.sequence_number, command_hex)
+                    self._register(handle)
 
-                response = self._receive_response()
+                self._sock.settimeout(self.rtt.rto)
+                sent_at = time.monotonic()
+                self._sendto(message)
+                if not query:
+                    self._notify_listeners(command_hex)
 
-                if response is not None:
+                response = self._receive_response()
+                if retry == 0 and response is not None:  # Karn's rule: never time a command sent twice
+                    self.rtt.sample((handle.acked_at if handle and handle.acked_at else time.monotonic()) - sent_at)
+
+                if not query:
+                    if self._tracked is not None:
+                        self._tracked.append(handle)
+                    return handle
+                elif response is not None:
                     return response[1:-1]
-                elif not query:
-                    return None
             except ViscaException as exc:
+                if exc.status_code == 3:  # "Command buffer full", left to _send_command to back off
+                    raise
                 logging.error(f"ViscaException on retry {retry + 1}: {exc}")
                 self.reset_sequence_number()
                 self.reset_connection()
                 if retry < max_retries - 1:
-                    time.sleep(retry_delay)
+                    time.sleep(self.rtt.retry_delay(retry))
                 else:
                     raise
             except Exception as e:
@@ -90,7 +166,7 @@ class Camera:
                 self.reset_sequence_number()
                 self.reset_connection()
                 if retry < max_retries - 1:
-                    time.sleep(retry_delay)
+                    time.sleep(self.rtt.retry_delay(retry))
                 else:
                     raise
 
@@ -100,17 +176,20 @@ class Camera:
         """Attempts to receive the response of the most recent command.
         Sometimes we don't get the response because this is UDP.
         In that case we just increment num_missed_responses and move on.
+        Every reply read on the way, including late ones for earlier commands, resolves its CommandHandle.
         :raises ViscaException: if the response if an error and not an acknowledge or completion
         """
         while True:
             try:
-                response = self._sock.recv(32)
+                response = self._recv()
                 response_sequence_number = int.from_bytes(response[4:8], 'big')
 
+                response_payload = response[8:]
+                self._dispatch_reply(response_sequence_number, response_payload)
+
                 if response_sequence_number < self.sequence_number:
                     continue
                 else:
-                    response_payload = response[8:]
                     if len(response_payload) > 2:
                         status_byte = response_payload[1]
                         if status_byte >> 4 not in [5, 4]:
@@ -120,13 +199,175 @@ class Camera:
 
             except socket.timeout:  # Occasionally we don't get a response because this is UDP
                 self.num_missed_responses += 1
+                self.rtt.timed_out()
                 break
 
-    def reset_sequence_number(self):
-        message = bytearray.fromhex('02 00 00 01 00 00 00 01 01')
+    # Completion tracking ----------------------------------------------------
+
+    def _register(self, handle: CommandHandle):
+        self._handles[handle.sequence_number] = handle
+        if len(self._handles) > 128:  # forget the oldest command nobody is waiting on any more
+            del self._handles[next(iter(self._handles))]
+
+    def _dispatch_reply(self, sequence_number: int, payload: bytes):
+        """Resolves the CommandHandle a reply belongs to. ACKs are matched by sequence number, and tell us
+        which command socket the camera put the command in. Completions and errors are matched through
+        that socket, falling back to the sequence number for replies that carry no socket."""
+        if len(payload) < 3:
+            return
+        kind, socket_number = payload[1] >> 4, payload[1] & 0x0F
+        if kind == 4:
+            handle = self._handles.get(sequence_number)
+            if handle is not None:
+                handle._ack(socket_number)
+                self._handles_by_socket[socket_number] = handle
+        elif kind in (5, 6):
+            handle = self._handles_by_socket.pop(socket_number, None) if socket_number else None
+            if handle is None:
+                handle = self._handles.get(sequence_number)
+            if handle is None or handle.done:
+                return
+            self._handles.pop(handle.sequence_number, None)
+            if kind == 5 or payload[2] != 0x03:  # "buffer full" refuses the command; no socket freed up
+                self.completions += 1
+                self._lanes.resume()
+            if kind == 5:
+                handle._complete()
+            else:
+                try:
+                    handle._fail(ViscaException(payload))
+                except KeyError:  # an error code ViscaException doesn't know
+                    handle._resolve_cancelled()
+
+    def _wait_until(self, predicate, timeout=10.0, cancel=None) -> bool:
+        """Reads replies until `predicate()` holds. The socket is only held for short reads, so other
+        threads can keep sending in the meantime.
+
+        :param timeout: seconds to wait, or None to wait indefinitely
+        :param cancel: an optional threading.Event that abandons the wait when set
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.window.service()
+            if predicate():
+                break
+            if cancel is not None and cancel.is_set():
+                return False
+            remaining = 0.01 if deadline is None else min(0.01, deadline - time.monotonic())
+            if remaining <= 0:
+                return False
+            with self._lanes.turn('receive'):
+                if predicate():
+                    break
+                self._sock.settimeout(remaining)
+                try:
+                    response = self._recv()
+                except socket.timeout:
+                    continue
+                except OSError:  # the connection was closed
+                    return False
+                finally:
+                    self._sock.settimeout(self.rtt.rto)
+                self._dispatch_reply(int.from_bytes(response[4:8], 'big'), response[8:])
+        return True
+
+    def send_pipelined(self, command_hex: str, timeout=5.0) -> CommandHandle:
+        """Sends a command without waiting for the previous one to be acknowledged, keeping as many in
+        flight as the camera's command buffer takes (see :class:`CommandWindow`).
+
+        :param command_hex: the command, without the 81 01 preamble and FF terminator
+        :return: a CommandHandle for the command
+        :raises TimeoutError: if no room opened up in the window within `timeout` seconds
+        """
+        return self.window.submit(command_hex, timeout)
+
+    def _transmit(self, handle: CommandHandle):
+        """Sends a handle's command, or sends it again under a new sequence number, without waiting for
+        a reply. Call during a turn."""
+        resend = handle.refusals or handle.losses
+        if resend:
+            self._handles.pop(handle.sequence_number, None)
+        handle.sequence_number = self._send_raw(b'\x81\x01' + bytes.fromhex(handle.command_hex) + b'\xff')
+        if not resend:
+            handle.sent_at = time.monotonic()
+        self._register(handle)
+
+    def _cancel_socket(self, socket_number: int):
+        """Sends the VISCA cancel command for whatever is running in a command socket."""
+        with self._lanes.turn('stop'):
+            self._send_raw(bytes([0x81, 0x20 | socket_number, 0xFF]))
+
+    def _send_raw(self, payload_bytes: bytes) -> int:
+        """Sends a complete VISCA payload without waiting for a reply. Call during a turn.
+
+        :return: the sequence number it was sent with
+        """
+        self._increment_sequence_number()
+        message = (b'\x01\x00' + len(payload_bytes).to_bytes(2, 'big') +
+                   self.sequence_number.to_bytes(4, 'big') + payload_bytes)
+        self._sendto(message)
+        return self.sequence_number
+
+    def _sendto(self, message):
         self._sock.sendto(message, self._location)
-        self._receive_response()
-        self.sequence_number = 1
+        if self.recorder is not None:
+            self.recorder.visca(True, self._location[0], message)
+
+    def _recv(self) -> bytes:
+        response = self._sock.recv(32)
+        if self.recorder is not None:
+            self.recorder.visca(False, self._location[0], response)
+        return response
+
+    def _notify_listeners(self, command_hex: str):
+        for listener in self.command_listeners:
+            try:
+                listener(command_hex)
+            except Exception as e:
+                logging.error(f"Error in command listener: {e}")
+
+    @contextmanager
+    def track_completions(self, lane='motion'):
+        """Collects the CommandHandles of the commands sent inside the block, e.g. for commands that send
+        more than one message. Holds the socket for the whole block, so only send commands inside it.
+
+        :param lane: the transport lane to queue the block in
+        """
+        with self._lanes.turn(lane):
+            self._tracked = []
+            try:
+                yield self._tracked
+            finally:
+                self._tracked = None
+
+    def wait_for_completion(self, handles, timeout=10.0, cancel=None) -> bool:
+        """Waits until the camera reports that all of these commands are finished.
+
+        :param handles: CommandHandles, e.g. as collected by :meth:`track_completions`
+        :param timeout: seconds to wait
+        :param cancel: an optional threading.Event that abandons the wait when set
+        :return: True if every command completed, False if the timeout expired or the wait was cancelled
+        :raises ViscaException: if one of the commands failed
+        """
+        return wait_all(handles, timeout, cancel)
+
+    def transport_stats(self) -> dict:
+        """:return: per-lane turns and queueing time, plus missed replies and buffer-full refusals"""
+        return {
+            **self._lanes.stats(),
+            'missed_responses': self.num_missed_responses,
+            'buffer_full': self.num_buffer_full,
+            'window': self.window.stats(),
+            'rtt': self.rtt.stats(),
+        }
+
+    def reset_sequence_number(self):
+        with self._lanes.turn('stop'):
+            message = bytearray.fromhex('02 00 00 01 00 00 00 01 01')
+            self._sendto(message)
+            self._receive_response()
+            self.sequence_number = 1
+            self._handles.clear()  # sequence numbers are about to be reused
 
     def _increment_sequence_number(self):
         self.sequence_number += 1
@@ -158,9 +399,9 @@ class Camera:
         :param display_mode: True for on, False for off
         """
         if display_mode:
-            self._send_command('7E 08 18 02')
+            return self._send_command('7E 08 18 02')
         else:
-            self._send_command('7E 08 18 03')
+            return self._send_command('7E 08 18 03')
 
     def pantilt(self, pan_speed: int, tilt_speed: int, pan_position=None, tilt_position=None, relative=False):
         """Commands the camera to pan and/or tilt.
@@ -206,7 +447,7 @@ class Camera:
 
             relative_hex = '03' if relative else '02'
 
-            self._send_command(
+            return self._send_command(
                 '06' + relative_hex + pan_speed_hex + tilt_speed_hex + encode(pan_position) + encode(tilt_position)
             )
 
@@ -227,26 +468,47 @@ class Camera:
             )
 
             if pan_speed == 0 and tilt_speed == 0:
-                # send multiple times for reliability
+                # A lost stop leaves the camera moving, so resend until the camera acknowledges it
                 for _ in range(3):
-                    self._send_command(command_to_send)
-                    time.sleep(0.005)
+                    handle = self._send_command(command_to_send)
+                    if handle.acked.is_set():
+                        break
+                return handle
             else:
-                self._send_command(command_to_send)
+                return self._send_command(command_to_send)
 
 
     def pantilt_home(self):
         """Moves the camera to the home position"""
-        self._send_command('06 04')
+        return self._send_command('06 04')
 
     def pantilt_reset(self):
         """Moves the camera to the reset position"""
-        self._send_command('06 05')
+        return self._send_command('06 05')
 
     def home(self):
-        """Moves the camera to the home position"""
-        self.zoom_to(0)
-        self.pantilt_home()
+        """Moves the camera to the home position
+
+        :return: the CommandHandles of the zoom and pan/tilt moves, see :func:`wait_all`
+        """
+        return [self.zoom_to(0), self.pantilt_home()]
+
+    def move_to(self, pan_position: int, tilt_position: int, zoom_position: int,
+                pan_speed=24, tilt_speed=23, timeout=10.0) -> bool:
+        """Drives pan/tilt and zoom to absolute positions at the same time and waits for both to finish.
+
+        :param pan_position: absolute pan position, as returned by :meth:`get_pantilt_position`
+        :param tilt_position: absolute tilt position, as returned by :meth:`get_pantilt_position`
+        :param zoom_position: absolute zoom position, as returned by :meth:`get_zoom_position`
+        :param pan_speed: 1-24
+        :param tilt_speed: 1-24, most cameras top out at 23
+        :param timeout: seconds to wait for the camera to report both moves complete
+        :return: True once both moves completed, False if the timeout expired first
+        """
+        with self._lanes.turn('motion'):
+            pantilt = self.pantilt(pan_speed, tilt_speed, pan_position, tilt_position)
+            zoom = self.zoom_to(zoom_position / 16384)
+        return wait_all([pantilt, zoom], timeout)
 
     def zoom(self, speed: int):
         """Zooms out or in at the given speed.
@@ -268,12 +530,14 @@ class Camera:
         command_to_send = f'04 07 {direction_hex}{speed_hex}'
 
         if speed == 0:
-            # send multiple times for reliability
+            # A lost stop leaves the camera zooming, so resend until the camera acknowledges it
             for _ in range(3):
-                self._send_command(command_to_send)
-                time.sleep(0.005)
+                handle = self._send_command(command_to_send)
+                if handle.acked.is_set():
+                    break
+            return handle
         else:
-            self._send_command(command_to_send)
+            return self._send_command(command_to_send)
     
     def zoom_to(self, position: float):
         """Zooms to an absolute position
@@ -282,22 +546,22 @@ class Camera:
         """
         position_int = round(position * 16384)
         position_hex = f'{position_int:04x}'
-        self._send_command('04 47 ' + ''.join(['0' + char for char in position_hex]))
+        return self._send_command('04 47 ' + ''.join(['0' + char for char in position_hex]))
 
     def digital_zoom(self, digital_zoom_state: bool):
         """Sets the digital zoom state of the camera
         :param digital_zoom_state: True for on, False for off
         """
         if digital_zoom_state:
-            self._send_command('04 06 02')
+            return self._send_command('04 06 02')
         else:
-            self._send_command('04 06 03')
+            return self._send_command('04 06 03')
 
     def increase_exposure_compensation(self):
-        self._send_command('04 0E 02')
+        return self._send_command('04 0E 02')
 
     def decrease_exposure_compensation(self):
-        self._send_command('04 0E 03')
+        return self._send_command('04 0E 03')
 
     def set_focus_mode(self, mode: str):
         """Sets the focus mode of the camera
@@ -317,7 +581,7 @@ class Camera:
         if mode not in modes:
             raise ValueError(f'"{mode}" is not a valid mode. Valid modes: {", ".join(modes.keys())}')
 
-        self._send_command('04 ' + modes[mode])
+        return self._send_command('04 ' + modes[mode])
 
     def set_autofocus_mode(self, mode: str):
         """Sets the autofocus mode of the camera
@@ -334,7 +598,7 @@ class Camera:
         if mode not in modes:
             raise ValueError(f'"{mode}" is not a valid mode. Valid modes: {", ".join(modes.keys())}')
 
-        self._send_command('04 57 0' + modes[mode])
+        return self._send_command('04 57 0' + modes[mode])
 
     def set_autofocus_interval(self, active_time: int, interval_time: int):
         """Sets the autofocus interval of the camera
@@ -343,16 +607,16 @@ class Camera:
         if interval_time < 1 or interval_time > 255 or active_time < 1 or active_time > 255:
             raise ValueError('The time must be between 1 and 255 seconds')
 
-        self._send_command('04 27 ' + f'{active_time:02x}' +' '+ f'{interval_time:02x}')
+        return self._send_command('04 27 ' + f'{active_time:02x}' +' '+ f'{interval_time:02x}')
 
     def autofocus_sensitivity_low(self, sensitivity_low: bool):
         """Sets the sensitivity of the autofocus to low
         :param sensitivity_low: True for on, False for off
         """
         if sensitivity_low:
-            self._send_command('04 58 03')
+            return self._send_command('04 58 03')
         else:
-            self._send_command('04 58 02')
+            return self._send_command('04 58 02')
 
     def manual_focus(self, speed: int):
         """Focuses near or far at the given speed.
@@ -372,16 +636,16 @@ class Camera:
         else:
             direction_hex = '3'
 
-        self._send_command(f'04 08 {direction_hex}{speed_hex}')
+        return self._send_command(f'04 08 {direction_hex}{speed_hex}')
 
     def ir_correction(self, mode: bool):
         """Sets the focus IR correction mode of the camera
         :param value: True for IR correction mode, False for standard mode
         """
         if mode:
-            self._send_command('04 11 01')
+            return self._send_command('04 11 01')
         else:
-            self._send_command('04 11 00')
+            return self._send_command('04 11 00')
 
     def white_balance_mode(self, mode: str):
         """Sets the white balance mode of the camera
@@ -403,7 +667,7 @@ class Camera:
         if mode not in modes:
             raise ValueError(f'"{mode}" is not a valid mode. Valid modes: {", ".join(modes.keys())}')
 
-        self._send_command('04 ' + modes[mode])
+        return self._send_command('04 ' + modes[mode])
 
     def set_red_gain(self, gain: int):
         """Sets the red gain of the camera
@@ -412,16 +676,16 @@ class Camera:
         if not isinstance(gain, int) or gain < 0 or gain > 255:
             raise ValueError('The gain must be an integer from 0 to 255 inclusive')
 
-        self._send_command('04 43 00 00 ' + f'{gain:02x}')
+        return self._send_command('04 43 00 00 ' + f'{gain:02x}')
 
     def increase_red_gain(self):
-        self._send_command('04 03 02')
+        return self._send_command('04 03 02')
 
     def decrease_red_gain(self):
-        self._send_command('04 03 03')
+        return self._send_command('04 03 03')
 
     def reset_red_gain(self):
-        self._send_command('04 03 00')
+        return self._send_command('04 03 00')
 
     def set_blue_gain(self, gain: int):
         """Sets the blue gain of the camera
@@ -430,16 +694,16 @@ class Camera:
         if not isinstance(gain, int) or gain < 0 or gain > 255:
             raise ValueError('The gain must be an integer from 0 to 255 inclusive')
 
-        self._send_command('04 44 00 00 ' + f'{gain:02x}')
+        return self._send_command('04 44 00 00 ' + f'{gain:02x}')
 
     def increase_blue_gain(self):
-        self._send_command('04 04 02')
+        return self._send_command('04 04 02')
 
     def decrease_blue_gain(self):
-        self._send_command('04 03 03')
+        return self._send_command('04 03 03')
 
     def reset_blue_gain(self):
-        self._send_command('04 04 00')
+        return self._send_command('04 04 00')
 
     def set_white_balance_temperature(self, temperature: int):
         """Sets the white balance temperature of the camera
@@ -448,16 +712,16 @@ class Camera:
         if not isinstance(temperature, int) or temperature < 0 or temperature > 255:
             raise ValueError('The temperature must be an integer from 0 to 255 inclusive')
 
-        self._send_command('04 43 00 20 ' + f'{temperature:02x}')
+        return self._send_command('04 43 00 20 ' + f'{temperature:02x}')
 
     def increase_white_balance_temperature(self):
-        self._send_command('04 03 02')
+        return self._send_command('04 03 02')
 
     def decrease_white_balance_temperature(self):
-        self._send_command('04 03 03')
+        return self._send_command('04 03 03')
 
     def reset_white_balance_temperature(self):
-        self._send_command('04 03 00')
+        return self._send_command('04 03 00')
 
     def set_color_gain(self, color:str, gain: int):
         """Sets the color gain of the camera
@@ -479,7 +743,7 @@ class Camera:
         if not isinstance(gain, int) or gain < 0 or gain > 15:
             raise ValueError('The gain must be an integer from 0 to 15 inclusive')
 
-        self._send_command('04 49 00 00 0' + colors[color] + f' {gain:02x}')
+        return self._send_command('04 49 00 00 0' + colors[color] + f' {gain:02x}')
 
     def set_gain(self, gain: int):
         """Sets the gain of the camera
@@ -488,16 +752,16 @@ class Camera:
         if not isinstance(gain, int) or gain < 0 or gain > 255:
             raise ValueError('The gain must be an integer from 0 to 255 inclusive')
 
-        self._send_command('04 4C 00 00 ' + f'{gain:02x}')
+        return self._send_command('04 4C 00 00 ' + f'{gain:02x}')
 
     def increase_gain(self):
-        self._send_command('04 0C 02')
+        return self._send_command('04 0C 02')
     
     def decrease_gain(self):
-        self._send_command('04 0C 03')
+        return self._send_command('04 0C 03')
 
     def reset_gain(self):
-        self._send_command('04 0C 00')
+        return self._send_command('04 0C 00')
 
     def autoexposure_mode(self, mode: str):
         """Sets the autoexposure mode of the camera
@@ -516,7 +780,7 @@ class Camera:
         if mode not in modes:
             raise ValueError(f'"{mode}" is not a valid mode. Valid modes: {", ".join(modes.keys())}')
 
-        self._send_command('04 39 0' + modes[mode])
+        return self._send_command('04 39 0' + modes[mode])
 
     def set_shutter(self, shutter: int):
         """Sets the shutter of the camera
@@ -525,25 +789,25 @@ class Camera:
         if not isinstance(shutter, int) or shutter < 0 or shutter > 21:
             raise ValueError('The shutter must be an integer from 0 to 21 inclusive')
 
-        self._send_command('04 4A 00 ' + f'{shutter:02x}')
+        return self._send_command('04 4A 00 ' + f'{shutter:02x}')
 
     def increase_shutter(self):
-        self._send_command('04 0A 02')
+        return self._send_command('04 0A 02')
     
     def decrease_shutter(self):
-        self._send_command('04 0A 03')
+        return self._send_command('04 0A 03')
     
     def reset_shutter(self):
-        self._send_command('04 0A 00')
+        return self._send_command('04 0A 00')
 
     def slow_shutter(self, mode: bool):
         """Sets the slow shutter mode of the camera
         :param mode: True for on, False for off
         """
         if mode:
-            self._send_command('04 5A 02')
+            return self._send_command('04 5A 02')
         else:
-            self._send_command('04 5A 03')
+            return self._send_command('04 5A 03')
 
     def set_iris(self, iris: int):
         """Sets the iris of the camera
@@ -552,16 +816,16 @@ class Camera:
         if not isinstance(iris, int) or iris < 0 or iris > 17:
             raise ValueError('The iris must be an integer from 0 to 17 inclusive')
 
-        self._send_command('04 4B 00 00 ' + f'{iris:02x}')
+        return self._send_command('04 4B 00 00 ' + f'{iris:02x}')
     
     def increase_iris(self):
-        self._send_command('04 0B 02')
+        return self._send_command('04 0B 02')
 
     def decrease_iris(self):
-        self._send_command('04 0B 03')
+        return self._send_command('04 0B 03')
 
     def reset_iris(self):
-        self._send_command('04 0B 00')
+        return self._send_command('04 0B 00')
 
     def set_brightness(self, brightness: int):
         """Sets the brightness of the camera
@@ -570,13 +834,13 @@ class Camera:
         if not isinstance(brightness, int) or brightness < 0 or brightness > 255:
             raise ValueError('The brightness must be an integer from 0 to 255 inclusive')
 
-        self._send_command('04 4D 00 00 ' + f'{brightness:02x}')
+        return self._send_command('04 4D 00 00 ' + f'{brightness:02x}')
     
     def increase_brightness(self):
-        self._send_command('04 0D 02')
+        return self._send_command('04 0D 02')
 
     def decrease_brightness(self):
-        self._send_command('04 0D 03')
+        return self._send_command('04 0D 03')
 
     # exposure compensation
 
@@ -585,9 +849,9 @@ class Camera:
         :param mode: True for on, False for off
         """
         if mode:
-            self._send_command('04 33 02')
+            return self._send_command('04 33 02')
         else:
-            self._send_command('04 33 03')
+            return self._send_command('04 33 03')
 
     def set_aperture(self, aperture: int):
         """Sets the aperture of the camera
@@ -596,34 +860,34 @@ class Camera:
         if not isinstance(aperture, int) or aperture < 0 or aperture > 255:
             raise ValueError('The aperture must be an integer from 0 to 255 inclusive')
 
-        self._send_command('04 42 00 00 ' + f'{aperture:02x}')
+        return self._send_command('04 42 00 00 ' + f'{aperture:02x}')
 
     def increase_aperture(self):
-        self._send_command('04 02 02')
+        return self._send_command('04 02 02')
     
     def decrease_aperture(self):
-        self._send_command('04 02 03')
+        return self._send_command('04 02 03')
     
     def reset_aperture(self):
-        self._send_command('04 02 00')
+        return self._send_command('04 02 00')
 
     def flip_horizontal(self, flip_mode: bool):
         """Sets the horizontal flip mode of the camera
         :param value: True for horizontal flip mode, False for normal mode
         """
         if flip_mode:
-            self._send_command('04 61 02')
+            return self._send_command('04 61 02')
         else:
-            self._send_command('04 61 03')
+            return self._send_command('04 61 03')
 
     def flip_vertical(self, flip_mode: bool):
         """Sets the vertical flip (mount) mode of the camera
         :param flip_mode: True for vertical flip mode, False for normal mode
         """
         if flip_mode:
-            self._send_command('04 66 02')
+            return self._send_command('04 66 02')
         else:
-            self._send_command('04 66 03')
+            return self._send_command('04 66 03')
 
     def flip(self, horizontal: bool, vertical: bool):
         """Sets the horizontal and vertical flip modes of the camera
@@ -631,13 +895,13 @@ class Camera:
         :param vertical: True for vertical flip mode, False for normal mode
         """
         if horizontal and vertical:
-            self._send_command('04 A4 03')
+            return self._send_command('04 A4 03')
         elif vertical:
-            self._send_command('04 A4 02')
+            return self._send_command('04 A4 02')
         elif horizontal:
-            self._send_command('04 A4 01')
+            return self._send_command('04 A4 01')
         else:
-            self._send_command('04 A4 00')
+            return self._send_command('04 A4 00')
 
     # noise reduction 2d
 
@@ -648,23 +912,23 @@ class Camera:
         :param value: True for defog mode, False for normal mode
         """
         if mode:
-            self._send_command('04 37 02 00')
+            return self._send_command('04 37 02 00')
         else:
-            self._send_command('04 37 03 00')
+            return self._send_command('04 37 03 00')
 
     def save_preset(self, preset_num: int):
         """Saves many of the camera's settings in one of 16 slots"""
         if not 0 <= preset_num <= 15:
             raise ValueError('Preset num must be 0-15 inclusive')
 
-        self._send_command(f'04 3F 01 0{preset_num:x}')
+        return self._send_command(f'04 3F 01 0{preset_num:x}')
 
     def recall_preset(self, preset_num: int):
         """Instructs the camera to recall one of the 16 saved presets"""
         if not 0 <= preset_num <= 16:
             raise ValueError('Preset num must be 0-15 inclusive')
 
-        self._send_command(f'04 3F 02 0{preset_num:x}')
+        return self._send_command(f'04 3F 02 0{preset_num:x}')
 
     @staticmethod
     def _zero_padded_bytes_to_int(zero_padded: bytes, signed=True) -> int:
@@ -688,6 +952,53 @@ class Camera:
         response = self._send_command('04 47', query=True)
         return self._zero_padded_bytes_to_int(response[1:], signed=False)
 
+    def get_pose(self, timeout=None) -> Tuple[int, int, int]:
+        """Reads pan, tilt and zoom in a single round trip: both inquiries are sent back to back and
+        the replies are matched by sequence number as they arrive.
+
+        :return: the absolute pan, tilt and zoom positions
+        :param timeout: seconds to wait for both replies, by default twice the retransmission timeout
+        :raises NoQueryResponse: if either reply doesn't arrive within `timeout` seconds
+        """
+        with self._lanes.turn('inquiry'):
+            inquiries = {self._send_raw(b'\x81\x09\x06\x12\xff'): 'pantilt',
+                         self._send_raw(b'\x81\x09\x04\x47\xff'): 'zoom'}
+            replies = {}
+            deadline = time.monotonic() + (2 * self.rtt.rto if timeout is None else timeout)
+            try:
+                while len(replies) < len(inquiries):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise NoQueryResponse('No reply to the position inquiries')
+                    self._sock.settimeout(remaining)
+                    try:
+                        response = self._recv()
+                    except socket.timeout:
+                        continue
+                    sequence_number, payload = int.from_bytes(response[4:8], 'big'), response[8:]
+                    if sequence_number not in inquiries:
+                        self._dispatch_reply(sequence_number, payload)
+                    elif len(payload) > 2 and payload[1] >> 4 == 6:
+                        raise ViscaException(payload)
+                    elif len(payload) > 2 and payload[1] >> 4 == 5:
+                        replies[inquiries[sequence_number]] = payload[1:-1]
+            finally:
+                self._sock.settimeout(self.rtt.rto)
+
+        pantilt, zoom = replies['pantilt'], replies['zoom']
+        return (self._zero_padded_bytes_to_int(pantilt[1:5]), self._zero_padded_bytes_to_int(pantilt[5:9]),
+                self._zero_padded_bytes_to_int(zoom[1:], signed=False))
+
+    def get_version(self) -> dict:
+        """:return: the camera's vendor and model codes, ROM version and number of command sockets"""
+        response = self._send_command('00 02', query=True)
+        return {
+            'vendor': int.from_bytes(response[1:3], 'big'),
+            'model': int.from_bytes(response[3:5], 'big'),
+            'rom': int.from_bytes(response[5:7], 'big'),
+            'sockets': response[7],
+        }
+
     def get_focus_mode(self) -> str:
         """:return: either 'auto' or 'manual'"""
         modes = {2: 'auto', 3: 'manual'}
@@ -711,8 +1022,9 @@ class Camera:
                     self._send_command('06 44 03')
                     break
             except Exception as e:
-                logging.error(f"Error setting slow pan/tilt mode: {e}. Trying again in 100ms.")
-                time.sleep(0.1)
+                delay = self.rtt.retry_delay(tries)
+                logging.error(f"Error setting slow pan/tilt mode: {e}. Trying again in {delay * 1000:.0f}ms.")
+                time.sleep(delay)
                 tries += 1
                 if tries > 3:
                     logging.error("Failed to set slow pan/tilt mode after 3 tries. Exiting.")
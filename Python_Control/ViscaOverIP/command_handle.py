@@ -0,0 +1,122 @@
+import threading
+import time
+from typing import Optional
+
+from ViscaOverIP.exceptions import ViscaException
+
+
+class CommandHandle:
+    """
+    Tracks one VISCA command through its replies.
+
+    A camera answers a command with an ACK (``90 4y FF``) once it has accepted it into command socket
+    ``y``, then a completion (``90 5y FF``) when the action has finished, or an error (``90 6y ee FF``).
+    `acked` and `completed` are set as those replies arrive. Waiting reads the camera's socket itself,
+    so a handle resolves whichever thread is waiting on it.
+    """
+
+    def __init__(self, camera, sequence_number: int, command_hex: str):
+        self.camera = camera
+        self.sequence_number = sequence_number
+        self.command_hex = command_hex
+        self.socket: Optional[int] = None  # the camera's command socket, known once acknowledged
+        self.error: Optional[ViscaException] = None
+        self.cancelled = False
+        self.refusals = 0  # times the camera answered "Command buffer full"
+        self.losses = 0  # times no ACK came back in time, see CommandWindow
+        self.on_refused = None  # if set, called instead of failing when the camera's buffer is full
+
+        self.sent_at = time.monotonic()
+        self.acked_at: Optional[float] = None
+        self.completed_at: Optional[float] = None
+        self.acked = threading.Event()
+        self.completed = threading.Event()  # set on completion, error or cancellation
+
+    def __repr__(self):
+        state = 'completed' if self.completed.is_set() else 'acked' if self.acked.is_set() else 'sent'
+        return f'<CommandHandle {self.command_hex!r} seq={self.sequence_number} socket={self.socket} {state}>'
+
+    @property
+    def done(self) -> bool:
+        return self.completed.is_set()
+
+    @property
+    def ok(self) -> bool:
+        """True once the command completed without an error or cancellation."""
+        return self.completed.is_set() and self.error is None and not self.cancelled
+
+    def wait_ack(self, timeout=1.0, cancel=None) -> bool:
+        """:return: True once the camera has accepted the command, False on timeout"""
+        return self.camera._wait_until(lambda: self.acked.is_set() or self.completed.is_set(), timeout, cancel) \
+            and self.error is None
+
+    def wait(self, timeout=10.0, cancel=None) -> bool:
+        """Waits for the command to finish.
+
+        :param cancel: an optional threading.Event that abandons the wait when set
+        :return: True if the command completed, False on timeout, cancellation or if the camera cancelled it
+        :raises ViscaException: if the camera reported an error for this command
+        """
+        if not self.camera._wait_until(self.completed.is_set, timeout, cancel):
+            return False
+        if self.error is not None and not self.cancelled:
+            raise self.error
+        return not self.cancelled
+
+    def cancel(self):
+        """Asks the camera to abandon the command (VISCA ``8x 2y FF``) and resolves the handle as cancelled.
+        A command that has not been acknowledged yet is only given up on locally."""
+        if self.completed.is_set():
+            return
+        if self.socket is not None:
+            self.camera._cancel_socket(self.socket)
+        self._resolve_cancelled()
+
+    # Called by the camera as replies arrive ---------------------------------
+
+    def _ack(self, socket_number: int):
+        self.socket = socket_number
+        self.acked_at = time.monotonic()
+        self.acked.set()
+
+    def _complete(self):
+        self.completed_at = time.monotonic()
+        if not self.acked.is_set():  # commands that finish at once may skip the ACK
+            self.acked_at = self.completed_at
+            self.acked.set()
+        self.completed.set()
+
+    def _fail(self, error: ViscaException):
+        if error.status_code == 3:  # "Command buffer full"
+            self.refusals += 1
+            if self.on_refused is not None:
+                self.on_refused(self)
+                return
+        self.error = error
+        if error.status_code == 4:  # "Command cancelled"
+            self.cancelled = True
+        self._complete()
+
+    def _give_up(self, error):
+        """Resolves a command the camera never acknowledged, so waiters get `error`."""
+        self.error = error
+        self._complete()
+
+    def _resolve_cancelled(self):
+        self.cancelled = True
+        self._complete()
+
+
+def wait_all(handles, timeout=10.0, cancel=None) -> bool:
+    """Waits for every handle to complete, sharing one deadline.
+
+    :return: True if all completed, False if the deadline passed or the wait was cancelled
+    :raises ViscaException: if any command failed
+    """
+    deadline = time.monotonic() + timeout
+    for handle in handles:
+        if handle is None:
+            continue
+        if not handle.wait(max(0.0, deadline - time.monotonic()), cancel):
+            return False
+    return True
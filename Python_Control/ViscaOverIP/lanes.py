@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Transport lanes, highest priority first. "receive" is for threads that only read replies, e.g. while
+# waiting for a command to complete, so they never hold up anything that wants to send.
+LANES = ('stop', 'motion', 'configuration', 'inquiry', 'receive')
+
+# Most commands per second each lane may send, None for no cap
+DEFAULT_RATE_CAPS = {
+    'stop': None,
+    'motion': 100.0,
+    'configuration': 20.0,
+    'inquiry': 20.0,
+    'receive': None,
+}
+
+# Lanes whose commands take up one of the camera's command sockets, and so wait out back-pressure
+BUFFERED_LANES = ('motion', 'configuration')
+
+
+def lane_for(command_hex: str, query=False) -> str:
+    """Picks the lane for a command (the hex between 8x 01 and FF)."""
+    if query:
+        return 'inquiry'
+    body = bytes.fromhex(command_hex)
+    if body[:2] == b'\x06\x01' and body[4:6] == b'\x03\x03':  # pan/tilt stop
+        return 'stop'
+    if body[:3] == b'\x04\x07\x00' or body == b'\x00\x01':  # zoom stop, interface clear
+        return 'stop'
+    if body[:1] == b'\x06' and body[1:2] != b'\x44':  # pan/tilt moves, but not the slow mode setting
+        return 'motion'
+    if body[:2] in (b'\x04\x07', b'\x04\x47', b'\x04\x08', b'\x04\x48') or body[:3] == b'\x04\x3F\x02':
+        return 'motion'  # zoom and focus drives, preset recall
+    return 'configuration'
+
+
+class LaneScheduler:
+    """
+    Decides which thread may use a camera's socket next.
+
+    Threads queue in the lane of the command they want to send and the next turn goes to the
+    highest-priority lane with a waiter that is allowed to send, so a stop never waits behind queued
+    settings or inquiries, only for the turn in progress to end. Each lane is paced to its rate cap.
+    While the camera reports its command buffer full, the buffered lanes hold back (see `back_off`).
+    Turns are re-entrant: a thread that already holds one passes straight through.
+    """
+
+    def __init__(self, rate_caps=None):
+        """:param rate_caps: {lane: commands per second or None}, overriding DEFAULT_RATE_CAPS"""
+        self.rate_caps = {**DEFAULT_RATE_CAPS, **(rate_caps or {})}
+        self._cond = threading.Condition()
+        self._owner = None
+        self._depth = 0
+        self._waiting = {lane: deque() for lane in LANES}
+        self._next_allowed = {lane: 0.0 for lane in LANES}
+        self._held_until = 0.0
+
+        self.turns = {lane: 0 for lane in LANES}
+        self.wait_time = {lane: 0.0 for lane in LANES}  # total seconds spent queueing
+        self.back_offs = 0
+
+    @contextmanager
+    def turn(self, lane: str):
+        me = threading.get_ident()
+        with self._cond:
+            if self._owner == me:
+                self._depth += 1
+            else:
+                queued_at = time.monotonic()
+                ticket = object()
+                self._waiting[lane].append(ticket)
+                try:
+                    while True:
+                        delay = self._delay(lane, ticket, time.monotonic())
+                        if delay == 0:
+                            break
+                        self._cond.wait(delay)
+                finally:
+                    self._waiting[lane].remove(ticket)
+                now = time.monotonic()
+                self._owner, self._depth = me, 1
+                cap = self.rate_caps.get(lane)
+                if cap:
+                    self._next_allowed[lane] = max(now, self._next_allowed[lane]) + 1.0 / cap
+                self.turns[lane] += 1
+                self.wait_time[lane] += now - queued_at
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._owner = None
+                    self._cond.notify_all()
+
+    def _ready_at(self, lane, now) -> float:
+        ready = self._next_allowed[lane]
+        if lane in BUFFERED_LANES:
+            ready = max(ready, self._held_until)
+        return ready
+
+    def _delay(self, lane, ticket, now):
+        """0 if `ticket` may take the turn now, else how long to wait before looking again (None until
+        woken). Called with the condition held."""
+        ready_at = self._ready_at(lane, now)
+        if ready_at > now:
+            return ready_at - now
+        if self._owner is not None or self._waiting[lane][0] is not ticket:
+            return None
+        for higher in LANES[:LANES.index(lane)]:
+            if self._waiting[higher] and self._ready_at(higher, now) <= now:
+                return None  # it will be woken when the higher lane's turn ends
+        return 0
+
+    def back_off(self, seconds: float):
+        """Holds the buffered lanes for `seconds`, e.g. after the camera reported its buffer full."""
+        with self._cond:
+            self._held_until = max(self._held_until, time.monotonic() + seconds)
+            self.back_offs += 1
+
+    def resume(self):
+        """Ends a back-off early, e.g. once a command socket has been freed."""
+        with self._cond:
+            if self._held_until > time.monotonic():
+                self._held_until = 0.0
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'turns': dict(self.turns),
+                'wait_ms': {lane: round(self.wait_time[lane] * 1000, 1) for lane in LANES},
+                'back_offs': self.back_offs,
+                'rate_caps': dict(self.rate_caps),
+            }
@@ -0,0 +1,24 @@
+"""
+Position ranges and the nibble encoding VISCA uses for positions: each byte carries four bits,
+most significant first, e.g. pan -1 is 0F 0F 0F 0F.
+"""
+
+PAN_LIMIT = 2448
+TILT_MIN, TILT_MAX = -432, 1296
+ZOOM_MAX = 16384
+
+
+def encode_nibbles(value: int, length: int, signed=True) -> bytes:
+    """:param length: number of nibbles"""
+    raw = value.to_bytes(length // 2, 'big', signed=signed)
+    return bytes(int(char, 16) for char in raw.hex())
+
+
+def decode_nibbles(data: bytes, signed=True) -> int:
+    value = 0
+    for b in data:
+        value = (value << 4) | (b & 0x0F)
+    bits = len(data) * 4
+    if signed and value >= 1 << (bits - 1):
+        value -= 1 << bits
+    return value
@@ -0,0 +1,74 @@
+import threading
+
+# Gains from RFC 6298
+ALPHA = 1 / 8
+BETA = 1 / 4
+K = 4
+GRANULARITY = 0.005  # seconds, the smallest variance term, leaving room for scheduling jitter
+
+
+class RttEstimator:
+    """
+    Smoothed round-trip time to one camera, the way TCP keeps it (RFC 6298).
+
+    Every ACK that answers a command sent exactly once is a sample (Karn's rule: a command sent again
+    can't tell which send the ACK answers). The retransmission timeout is SRTT + 4 * RTTVAR, clamped
+    to [minimum, maximum], and doubles after each timeout until the next sample brings it back, so a
+    camera that has gone quiet isn't hammered.
+    """
+
+    def __init__(self, initial=0.1, minimum=0.02, maximum=2.0):
+        """:param initial: timeout in seconds until the first sample arrives
+        :param minimum: lower bound for the timeout, a wired LAN answers well within it
+        :param maximum: upper bound for the timeout
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.srtt = None
+        self.rttvar = None
+        self.rto = initial
+        self.samples = 0
+        self.timeouts = 0
+        self.last_sample = None
+        self._lock = threading.Lock()
+
+    def sample(self, rtt: float):
+        """Feeds one measured round trip, in seconds."""
+        with self._lock:
+            if self.srtt is None:
+                self.srtt = rtt
+                self.rttvar = rtt / 2
+            else:
+                self.rttvar = (1 - BETA) * self.rttvar + BETA * abs(self.srtt - rtt)
+                self.srtt = (1 - ALPHA) * self.srtt + ALPHA * rtt
+            self.rto = self._clamp(self.srtt + max(GRANULARITY, K * self.rttvar))
+            self.samples += 1
+            self.last_sample = rtt
+
+    def timed_out(self):
+        """Backs the timeout off after a reply didn't arrive in time."""
+        with self._lock:
+            self.timeouts += 1
+            self.rto = self._clamp(self.rto * 2)
+
+    def retry_delay(self, attempt: int) -> float:
+        """How long to pause before retry number `attempt` (from 0): grows with the timeout, and
+        exponentially with each further attempt."""
+        return self._clamp(self.rto * 2 ** attempt)
+
+    def _clamp(self, seconds):
+        return max(self.minimum, min(self.maximum, seconds))
+
+    def stats(self) -> dict:
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 2)
+
+        with self._lock:
+            return {
+                'srtt_ms': ms(self.srtt),
+                'rttvar_ms': ms(self.rttvar),
+                'rto_ms': ms(self.rto),
+                'last_ms': ms(self.last_sample),
+                'samples': self.samples,
+                'timeouts': self.timeouts,
+            }
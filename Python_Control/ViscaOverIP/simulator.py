@@ -0,0 +1,333 @@
+"""
+A VISCA-over-IP camera simulator for development and benchmarks.
+
+Each SimulatedCamera listens on its own address (use 127.0.0.x to run several on one machine),
+acknowledges and completes commands the way a PTZ camera does, tracks pan/tilt/zoom so inquiries
+return sensible values, and can add latency, drop packets or run out of command sockets.
+
+Run from Python_Control:  python -m ViscaOverIP.simulator --count 3 --base-ip 127.0.0.2
+"""
+import heapq
+import ipaddress
+import logging
+import random
+import select
+import socket
+import threading
+import time
+
+from ViscaOverIP.positions import PAN_LIMIT, TILT_MAX, TILT_MIN, ZOOM_MAX, decode_nibbles, encode_nibbles
+
+UNITS_PER_SPEED_STEP = 40  # pan/tilt position units per second for each VISCA speed step
+ZOOM_UNITS_PER_STEP = 1600  # zoom units per second for each zoom speed step
+
+# vendor 0x0001 (Sony), model 0x0519, ROM 0x0100, 2 command sockets
+VERSION_REPLY = bytes.fromhex('00 01 05 19 01 00 02')
+
+
+class SimulatedCamera:
+    """A single simulated VISCA-over-IP camera."""
+
+    def __init__(self, ip='127.0.0.1', port=52381, latency=0.0, loss=0.0, sockets=2, seed=None):
+        """:param ip: the address to listen on
+        :param port: the port to listen on
+        :param latency: seconds before each reply is sent
+        :param loss: probability of silently dropping an incoming packet
+        :param sockets: number of command sockets; further commands are refused with "Command buffer full"
+        """
+        self.address = (ip, port)
+        self.latency = latency
+        self.loss = loss
+        self.num_sockets = sockets
+        self._random = random.Random(seed)
+
+        self.pan = 0.0
+        self.tilt = 0.0
+        self.zoom = 0.0
+        self.pan_speed = 0.0  # position units per second
+        self.tilt_speed = 0.0
+        self.zoom_speed = 0.0
+        self.presets = {}
+        self._moving_until = {}  # socket number -> completion time
+        self._socket_tokens = {}  # socket number -> token of the command whose completion is still due
+        self._move_generation = {'pantilt': 0, 'zoom': 0}  # bumped whenever a new move supersedes the last
+        self._last_physics = time.monotonic()
+
+        self.received = 0
+        self.dropped = 0
+        self.commands = 0
+        self.inquiries = 0
+        self.buffer_full = 0
+
+        self._events = []  # heap of (due time, order, datagram, address, callback)
+        self._order = 0
+        self._sock = None
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(self.address)
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join()
+        if self._sock:
+            self._sock.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # Event loop -------------------------------------------------------------
+
+    def _serve(self):
+        while self._running:
+            timeout = 0.05
+            if self._events:
+                timeout = max(0.0, min(timeout, self._events[0][0] - time.monotonic()))
+            readable, _, _ = select.select([self._sock], [], [], timeout)
+            if readable:
+                try:
+                    data, address = self._sock.recvfrom(1024)
+                except OSError:
+                    continue
+                self.received += 1
+                if self.loss and self._random.random() < self.loss:
+                    self.dropped += 1
+                else:
+                    self._handle(data, address)
+
+            now = time.monotonic()
+            while self._events and self._events[0][0] <= now:
+                _, _, datagram, address, callback = heapq.heappop(self._events)
+                if callback:
+                    callback()
+                if datagram:
+                    try:
+                        self._sock.sendto(datagram, address)
+                    except OSError:
+                        pass
+
+    def _schedule(self, delay, datagram=None, address=None, callback=None):
+        self._order += 1
+        heapq.heappush(self._events, (time.monotonic() + delay, self._order, datagram, address, callback))
+
+    def _reply(self, sequence: bytes, payload: bytes, address, delay=0.0, payload_type=b'\x01\x11'):
+        header = payload_type + len(payload).to_bytes(2, 'big') + sequence
+        self._schedule(self.latency + delay, header + payload, address)
+
+    def _complete_later(self, sequence: bytes, socket_num: int, address, delay):
+        """Sends the completion for the command in `socket_num` after `delay`, unless it is cancelled first."""
+        token = object()
+        self._socket_tokens[socket_num] = token
+        payload = bytes([0x90, 0x50 | socket_num, 0xFF])
+        datagram = b'\x01\x11' + len(payload).to_bytes(2, 'big') + sequence + payload
+
+        def complete():
+            if self._socket_tokens.get(socket_num) is token:
+                del self._socket_tokens[socket_num]
+                try:
+                    self._sock.sendto(datagram, address)
+                except OSError:
+                    pass
+
+        self._schedule(self.latency + delay, callback=complete)
+
+    def _cancel(self, sequence: bytes, socket_num: int, address):
+        """VISCA cancel (8x 2y FF). The simulator doesn't track which axes a socket drives, so a
+        cancelled move stops every axis that is travelling to a position."""
+        if self._socket_tokens.pop(socket_num, None) is None:
+            self._reply(sequence, bytes([0x90, 0x60 | socket_num, 0x05, 0xFF]), address)  # no such command
+            return
+        self._moving_until.pop(socket_num, None)
+        self._update_physics()
+        for axis in self._move_generation:
+            self._move_generation[axis] += 1
+        self.pan_speed = self.tilt_speed = self.zoom_speed = 0.0
+        self._reply(sequence, bytes([0x90, 0x60 | socket_num, 0x04, 0xFF]), address)
+
+    # VISCA handling ---------------------------------------------------------
+
+    def _handle(self, data: bytes, address):
+        if len(data) < 9:
+            return
+        payload_type, sequence, payload = data[0:2], data[4:8], data[8:]
+
+        if payload_type == b'\x02\x00':  # control command, e.g. sequence number reset
+            self._reply(sequence, b'\x01', address, payload_type=b'\x02\x01')
+            return
+
+        if len(payload) < 2:  # not a VISCA message
+            return
+
+        if payload[1] == 0x09:
+            self.inquiries += 1
+            self._reply(sequence, b'\x90\x50' + self._inquire(payload[2:-1]) + b'\xff', address)
+            return
+
+        if payload[1] & 0xF0 == 0x20:
+            self._cancel(sequence, payload[1] & 0x0F, address)
+            return
+
+        self.commands += 1
+        body = payload[2:-1]
+        if body == b'\x00\x01':  # interface clear
+            self._moving_until.clear()
+            self._socket_tokens.clear()
+            self._reply(sequence, b'\x90\x50\xff', address)
+            return
+
+        now = time.monotonic()
+        self._moving_until = {s: t for s, t in self._moving_until.items() if t > now}
+        # A socket stays taken until its completion has actually gone out
+        free = [s for s in range(1, self.num_sockets + 1)
+                if s not in self._moving_until and s not in self._socket_tokens]
+        if not free:
+            self.buffer_full += 1
+            self._reply(sequence, b'\x90\x60\x03\xff', address)
+            return
+        socket_num = free[0]
+
+        try:
+            duration = self._execute(body)
+        except (ValueError, IndexError, KeyError):  # malformed or unknown values: syntax error
+            self._reply(sequence, b'\x90\x60\x02\xff', address)
+            return
+
+        self._moving_until[socket_num] = now + self.latency + duration
+        self._reply(sequence, bytes([0x90, 0x40 | socket_num, 0xFF]), address)
+        self._complete_later(sequence, socket_num, address, duration)
+
+    def _update_physics(self):
+        now = time.monotonic()
+        elapsed = now - self._last_physics
+        self._last_physics = now
+        self.pan = max(-PAN_LIMIT, min(PAN_LIMIT, self.pan + self.pan_speed * elapsed))
+        self.tilt = max(TILT_MIN, min(TILT_MAX, self.tilt + self.tilt_speed * elapsed))
+        self.zoom = max(0.0, min(ZOOM_MAX, self.zoom + self.zoom_speed * elapsed))
+
+    def _move_to(self, pan=None, tilt=None, zoom=None, pan_rate=24, tilt_rate=20, zoom_rate=7) -> float:
+        """Starts an absolute move on the given axes and returns how long it will take."""
+        self._update_physics()
+        axes = [axis for axis, target in (('pantilt', pan), ('zoom', zoom)) if target is not None]
+        for axis in axes:
+            self._move_generation[axis] += 1
+        generation = {axis: self._move_generation[axis] for axis in axes}
+
+        duration = 0.0
+        if pan is not None:
+            duration = max(abs(pan - self.pan) / (pan_rate * UNITS_PER_SPEED_STEP),
+                           abs(tilt - self.tilt) / (tilt_rate * UNITS_PER_SPEED_STEP))
+        if zoom is not None:
+            duration = max(duration, abs(zoom - self.zoom) / (zoom_rate * ZOOM_UNITS_PER_STEP))
+
+        if duration:
+            if pan is not None:
+                self.pan_speed = (pan - self.pan) / duration
+                self.tilt_speed = (tilt - self.tilt) / duration
+            if zoom is not None:
+                self.zoom_speed = (zoom - self.zoom) / duration
+
+        def arrive():
+            self._update_physics()
+            if pan is not None and generation['pantilt'] == self._move_generation['pantilt']:
+                self.pan, self.tilt = float(pan), float(tilt)
+                self.pan_speed = self.tilt_speed = 0.0
+            if zoom is not None and generation['zoom'] == self._move_generation['zoom']:
+                self.zoom = float(zoom)
+                self.zoom_speed = 0.0
+
+        self._schedule(self.latency + duration, callback=arrive)
+        return duration
+
+    def _execute(self, body: bytes) -> float:
+        """Applies a command and returns how long until it completes."""
+        category, command = body[0], body[1]
+
+        if category == 0x06 and command == 0x01:  # pan/tilt drive
+            directions = {0x01: -1, 0x02: 1, 0x03: 0}
+            pan_direction, tilt_direction = directions[body[4]], directions[body[5]]
+            self._update_physics()
+            self._move_generation['pantilt'] += 1
+            self.pan_speed = pan_direction * body[2] * UNITS_PER_SPEED_STEP
+            self.tilt_speed = tilt_direction * body[3] * UNITS_PER_SPEED_STEP
+            return 0.0
+        if category == 0x06 and command in (0x02, 0x03):  # absolute / relative position
+            pan, tilt = decode_nibbles(body[4:8]), decode_nibbles(body[8:12])
+            if command == 0x03:
+                self._update_physics()
+                pan, tilt = self.pan + pan, self.tilt + tilt
+            pan = max(-PAN_LIMIT, min(PAN_LIMIT, pan))
+            tilt = max(TILT_MIN, min(TILT_MAX, tilt))
+            return self._move_to(pan, tilt, pan_rate=max(body[2], 1), tilt_rate=max(body[3], 1))
+        if category == 0x06 and command in (0x04, 0x05):  # home / reset
+            return self._move_to(0, 0)
+        if category == 0x04 and command == 0x07:  # zoom drive
+            direction = {0x0: 0, 0x2: 1, 0x3: -1}[body[2] >> 4]
+            self._update_physics()
+            self._move_generation['zoom'] += 1
+            self.zoom_speed = direction * max(body[2] & 0x0F, 1) * ZOOM_UNITS_PER_STEP
+            return 0.0
+        if category == 0x04 and command == 0x47:  # zoom direct
+            return self._move_to(zoom=decode_nibbles(body[2:6], signed=False))
+        if category == 0x04 and command == 0x3F:  # presets
+            self._update_physics()
+            if body[2] == 0x01:
+                self.presets[body[3]] = (self.pan, self.tilt, self.zoom)
+                return 0.0
+            if body[2] == 0x02:
+                pan, tilt, zoom = self.presets.get(body[3], (0.0, 0.0, 0.0))
+                return self._move_to(pan, tilt, zoom)
+        return 0.0
+
+    def _inquire(self, body: bytes) -> bytes:
+        self._update_physics()
+        if body == b'\x06\x12':
+            return encode_nibbles(round(self.pan), 4) + encode_nibbles(round(self.tilt), 4)
+        if body == b'\x04\x47':
+            return encode_nibbles(round(self.zoom), 4, signed=False)
+        if body == b'\x04\x38':
+            return b'\x02'
+        if body == b'\x00\x02':
+            return VERSION_REPLY
+        return b'\x00'
+
+
+def start_simulators(count: int, base_ip='127.0.0.2', **kwargs):
+    """Starts `count` simulators on consecutive loopback addresses and returns them."""
+    first = ipaddress.ip_address(base_ip)
+    return [SimulatedCamera(str(first + i), **kwargs).start() for i in range(count)]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run simulated VISCA-over-IP cameras')
+    parser.add_argument('--count', type=int, default=1)
+    parser.add_argument('--base-ip', default='127.0.0.2')
+    parser.add_argument('--port', type=int, default=52381)
+    parser.add_argument('--latency', type=float, default=0.0, help='reply latency in seconds')
+    parser.add_argument('--loss', type=float, default=0.0, help='probability of dropping a packet')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    simulators = start_simulators(args.count, args.base_ip, port=args.port, latency=args.latency, loss=args.loss)
+    for sim in simulators:
+        logging.info(f"Simulated camera listening on {sim.address[0]}:{sim.address[1]}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for sim in simulators:
+            sim.stop()
@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import deque
+
+from ViscaOverIP.command_handle import CommandHandle
+from ViscaOverIP.exceptions import NoQueryResponse
+from ViscaOverIP.lanes import lane_for
+
+
+class CommandWindow:
+    """
+    Pipelines commands to one camera, keeping up to `size` of them in flight at once.
+
+    The window is sized like TCP's congestion window (AIMD): every clean completion grows it by
+    1/size, so it opens by about one command per window's worth of completions, and a "Command buffer
+    full" refusal or a lost ACK (none within two retransmission timeouts) halves it. It settles around
+    what the camera's command buffer takes.
+    A refused or lost command keeps its CommandHandle and is sent again, after a back-off, by whichever
+    thread next submits or waits on the camera. A command lost more than the camera's num_retries times
+    fails with NoQueryResponse.
+    """
+
+    def __init__(self, camera, initial=2.0, minimum=1.0, maximum=16.0):
+        """:param camera: the Camera to send through
+        :param initial: starting window size
+        :param minimum: the window never shrinks below this
+        :param maximum: the window never grows beyond this
+        """
+        self.camera = camera
+        self.size = float(initial)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+
+        self._in_flight = {}  # CommandHandle -> when it was last sent
+        self._refused = deque()  # (due time, CommandHandle) refused or lost, waiting to be sent again
+        self._shrunk_at = 0.0  # commands sent before the last decrease don't shrink the window again
+        self._lock = threading.Lock()  # never held while waiting for a turn on the camera
+
+        self.sent = 0
+        self.completed = 0
+        self.failed = 0
+        self.refused = 0
+        self.lost = 0
+        self.latencies = deque(maxlen=1000)  # seconds from first send to completion
+
+    def submit(self, command_hex: str, timeout=5.0) -> CommandHandle:
+        """Sends a command as soon as the window has room, without waiting for its ACK.
+
+        :return: the command's CommandHandle, which stays valid if the command has to be sent again
+        :raises TimeoutError: if the window stayed full for `timeout` seconds
+        """
+        handle = CommandHandle(self.camera, 0, command_hex)
+        handle.on_refused = self._on_refused
+        deadline = time.monotonic() + timeout
+        while True:
+            self.service()
+            with self._lock:
+                if self._has_room_locked(time.monotonic()):
+                    self._in_flight[handle] = time.monotonic()
+                    break
+            if not self.camera._wait_until(self._has_room, deadline - time.monotonic()):
+                raise TimeoutError(f'The command window for {self.camera.ip} stayed full for {timeout} s')
+        self._transmit(handle)
+        self.camera._notify_listeners(command_hex)
+        return handle
+
+    def drain(self, timeout=10.0) -> bool:
+        """Waits until every submitted command has finished or been given up on.
+
+        :return: False if the timeout expired first
+        """
+        return self.camera._wait_until(self._idle, timeout)
+
+    def service(self):
+        """Sends refused and lost commands again once their back-off is over and the window has room.
+        Called by the camera before every read while a thread waits, so they don't need their own thread."""
+        if not self._refused and not self._in_flight:
+            return
+        due = []
+        with self._lock:
+            now = time.monotonic()
+            self._reap(now)
+            while self._refused and self._refused[0][0] <= now and self._has_room_locked(now, resending=True):
+                _, handle = self._refused.popleft()
+                self._in_flight[handle] = now
+                due.append(handle)
+        for handle in due:
+            self._transmit(handle)
+
+    def _transmit(self, handle):
+        with self.camera._lanes.turn(lane_for(handle.command_hex)):
+            self.camera._transmit(handle)
+        self.sent += 1
+
+    def _has_room(self) -> bool:
+        with self._lock:
+            return self._has_room_locked(time.monotonic())
+
+    def _has_room_locked(self, now, resending=False) -> bool:
+        self._reap(now)
+        if not resending and self._refused:
+            return False  # refused commands go first
+        return len(self._in_flight) < max(1, int(self.size))
+
+    def _idle(self) -> bool:
+        with self._lock:
+            self._reap(time.monotonic())
+            return not self._in_flight and not self._refused
+
+    def _reap(self, now):
+        """Retires finished and lost commands, adjusting the window. Called with the lock held."""
+        for handle, sent_at in list(self._in_flight.items()):
+            if handle.done:
+                del self._in_flight[handle]
+                if handle.ok:
+                    self.completed += 1
+                    self.latencies.append(handle.completed_at - handle.sent_at)
+                    self.size = min(self.maximum, self.size + 1.0 / self.size)
+                else:
+                    self.failed += 1
+            elif not handle.acked.is_set() and now - sent_at > 2 * self.camera.rtt.rto:
+                del self._in_flight[handle]
+                self.lost += 1
+                self._shrink(sent_at)
+                handle.losses += 1
+                if handle.losses > self.camera.num_retries:
+                    handle._give_up(NoQueryResponse(f'{self.camera.ip} never acknowledged {handle.command_hex}'))
+                    self.failed += 1
+                else:
+                    self._refused.append((now, handle))  # send it again under a new sequence number
+
+    def _on_refused(self, handle):
+        """Called by the camera, during its turn, when a command was refused with "Command buffer full"."""
+        with self._lock:
+            sent_at = self._in_flight.pop(handle, 0.0)
+            self.refused += 1
+            self._shrink(sent_at)
+            # The first retry only waits for room in the (now smaller) window, later ones back off too
+            back_off = 0.0 if handle.refusals == 1 else min(0.005 * 2 ** (handle.refusals - 1), 0.5)
+            self._refused.append((time.monotonic() + back_off, handle))
+
+    def _shrink(self, sent_at):
+        """Halves the window, once per window's worth of commands: a burst that overran the camera's
+        buffer is refused several times over but only counts as one congestion event."""
+        if sent_at >= self._shrunk_at:
+            self.size = max(self.minimum, self.size / 2)
+            self._shrunk_at = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            in_flight = len(self._in_flight)
+        return {
+            'size': round(self.size, 2),
+            'in_flight': in_flight,
+            'sent': self.sent,
+            'completed': self.completed,
+            'failed': self.failed,
+            'refused': self.refused,
+            'lost': self.lost,
+            'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else None,
+            'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else None,
+        }
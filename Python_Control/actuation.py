@@ -0,0 +1,257 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class ActuationWorker:
+    """Ticks one camera's MotionMixer at a fixed rate on its own thread, so a slow or dead camera
+    never holds up the others."""
+
+    def __init__(self, shared_state, index, ip, rate):
+        self.state = shared_state
+        self.rate = rate
+        self.index = index
+        self.ip = ip
+        self.interval = 1.0 / rate
+        self.mixer = shared_state.get_mixer(index)
+        self.estimator = shared_state.get_estimator(index)
+
+        self.ticks = 0
+        self.overruns = 0  # ticks that started late because the previous one was slow
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f'actuation-{index}')
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def retire(self):
+        """Stops the worker without waiting. It has let go of its mixer and estimator once `retired()`."""
+        self.stop()
+
+    def retired(self) -> bool:
+        return not self._thread.is_alive()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def _connect(self) -> bool:
+        try:
+            camera = self.state.camera_pool.get(self.ip)
+            self.mixer.set_camera(camera)
+            self.estimator.attach(camera, self.state.cameras[self.index].get('speed_table'))
+            return True
+        except Exception as e:
+            logging.error(f"Actuation worker could not connect to camera {self.index} ({self.ip}): {e}")
+            return False
+
+    def _run(self):
+        if not self._connect():
+            return
+
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            self.mixer.set_auto_enabled(self.state.auto_tracking_enabled(self.index))
+            self.mixer.tick()
+            self.ticks += 1
+            if self.estimator.correction_due():
+                self.estimator.correct_from(self.mixer.camera)
+
+            next_tick += self.interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                self.overruns += 1
+                next_tick = time.monotonic()
+
+        self.mixer.stop()
+        self.estimator.detach()
+
+
+class ReactorActuationWorker(ActuationWorker):
+    """
+    Ticks one camera's MotionMixer on a reactor timer instead of a thread. Each tick plans on the
+    reactor thread and only when there is something to send, or a position to read, does it hand the
+    round trip to the pool's executor. Ticks that come round while that is still going are skipped
+    (counted as overruns), so a slow or dead camera still never holds up the others.
+    """
+
+    def __init__(self, shared_state, index, ip, rate, reactor, executor):
+        super().__init__(shared_state, index, ip, rate)
+        self.reactor = reactor
+        self.executor = executor
+        self._timer = None
+        self._busy = True  # until connected
+        self._stopped = False
+        self._connecting = None
+        self._teardown = None  # resolved once _finish has run, see retire()
+
+    def start(self):
+        self._connecting = self.executor.submit(self._connect)
+        self._connecting.add_done_callback(
+            lambda done: self.reactor.call_soon_threadsafe(lambda: self._connected(done.result())))
+
+    def _connected(self, ok):
+        if ok and not self._stopped:
+            self._busy = False
+            self._timer = self.reactor.call_every(1.0 / self.rate, self._tick)
+        elif not ok:
+            self._stopped = True
+
+    def stop(self):
+        self._stopped = True
+        if self._timer is not None:
+            self._timer.cancel()
+
+    def retire(self):
+        """Stops ticking and lets go of the mixer and estimator on the executor, after connecting is over
+        (so a late attach can't outlive the teardown)."""
+        self.stop()
+        if self._teardown is None:
+            self._teardown = Future()
+            if self._connecting is None:
+                self.executor.submit(self._finish)
+            else:
+                self._connecting.add_done_callback(lambda _: self.executor.submit(self._finish))
+
+    def retired(self) -> bool:
+        return self._teardown is not None and self._teardown.done()
+
+    def join(self, timeout=None):
+        self.retire()
+        self._teardown.result(timeout)
+
+    def _finish(self):
+        try:
+            self.mixer.stop()
+            self.estimator.detach()
+        except Exception as e:
+            logging.error(f"Error stopping actuation for camera {self.index} ({self.ip}): {e}")
+        finally:
+            self._teardown.set_result(None)
+
+    def is_alive(self):
+        return not self._stopped
+
+    def _tick(self):
+        self.ticks += 1
+        if self._busy:
+            self.overruns += 1
+            return
+        self.mixer.set_auto_enabled(self.state.auto_tracking_enabled(self.index))
+        planned = self.mixer.plan()
+        correct = self.estimator.correction_due()
+        if planned is None and not correct:
+            return
+        self._busy = True
+        self.executor.submit(self._round_trip, planned, correct).add_done_callback(
+            lambda done: self.reactor.call_soon_threadsafe(self._done))
+
+    def _round_trip(self, planned, correct):
+        self.mixer.send_planned(planned)
+        if correct:
+            self.estimator.correct_from(self.mixer.camera)
+
+    def _done(self):
+        self._busy = False
+
+
+class ActuationPool:
+    """
+    Drives every configured camera at the same time: one ActuationWorker per camera ticks its
+    MotionMixer, so auto-tracking commands reach every camera, not just the selected one.
+    A keyboard's joystick only feeds the mixer of the camera it has selected (see SharedState.update_joystick).
+    """
+
+    def __init__(self, shared_state, rate=100.0, reactor=None):
+        """:param shared_state: the SharedState whose mixers and camera pool to use
+        :param rate: ticks per second for each camera
+        :param reactor: an io_reactor.Reactor to tick on, instead of a thread per camera
+        """
+        self.state = shared_state
+        self.rate = rate
+        self.reactor = reactor
+        self.workers = {}  # camera index -> ActuationWorker
+        self._retiring = {}  # camera index -> a stopped worker that may still be letting go of the mixer
+        self._stop = threading.Event()
+        self._thread = None
+        self._supervisor = None  # reactor timer standing in for the supervisor thread
+        self._executor = None  # round trips for ReactorActuationWorkers
+
+    def start(self):
+        self._stop.clear()
+        if self.reactor is not None:
+            self._executor = ThreadPoolExecutor(max_workers=min(8, max(1, len(self.state.cameras))),
+                                                thread_name_prefix='actuation')
+            self.reactor.call_soon_threadsafe(self.sync)
+            self._supervisor = self.reactor.call_every(1.0, self._supervise_once)
+            return
+        self.sync()
+        self._thread = threading.Thread(target=self._supervise, daemon=True, name='actuation-supervisor')
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._supervisor:
+            self._supervisor.cancel()
+        if self._thread:
+            self._thread.join()
+        workers = list(self.workers.values()) + list(self._retiring.values())
+        for worker in workers:
+            worker.retire()
+        for worker in workers:
+            worker.join()
+        self.workers.clear()
+        self._retiring.clear()
+        if self._executor:
+            self._executor.shutdown()
+
+    def is_running(self) -> bool:
+        if self.reactor is not None:
+            return not self._stop.is_set() and self._supervisor is not None
+        return self._thread is not None and self._thread.is_alive()
+
+    def sync(self):
+        """Start, restart or retire workers to match the configured camera list. A replacement only starts
+        once the worker before it has let go of the camera's mixer and estimator."""
+        cameras = list(self.state.cameras)
+        for index, worker in list(self.workers.items()):
+            if index >= len(cameras) or cameras[index]['ip'] != worker.ip or not worker.is_alive():
+                worker.retire()
+                self._retiring[index] = worker
+                del self.workers[index]
+        for index, worker in list(self._retiring.items()):
+            if worker.retired():
+                del self._retiring[index]
+        for index, camera in enumerate(cameras):
+            if index not in self.workers and index not in self._retiring:
+                if self.reactor is not None:
+                    worker = ReactorActuationWorker(self.state, index, camera['ip'], self.rate, self.reactor,
+                                                    self._executor)
+                else:
+                    worker = ActuationWorker(self.state, index, camera['ip'], self.rate)
+                self.workers[index] = worker
+                worker.start()
+
+    def _supervise(self):
+        while not self._stop.wait(1.0):
+            self._supervise_once()
+
+    def _supervise_once(self):
+        try:
+            self.sync()
+        except Exception as e:
+            logging.error(f"Error updating actuation workers: {e}")
+
+    def stats(self) -> dict:
+        return {
+            index: {'ip': worker.ip, 'ticks': worker.ticks, 'overruns': worker.overruns, **worker.mixer.stats()}
+            for index, worker in self.workers.items()
+        }
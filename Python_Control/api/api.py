@@ -1,14 +1,25 @@
+import asyncio
 import json
 import threading
+import time
 import logging
+from typing import Literal, Optional, Union
 import fastapi
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 import uvicorn
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ValidationError
+
+from api.static import PrecompressedStaticFiles
+from macro_engine import validate_cameras, validate_steps
+import discovery
+from api.autotrack_codec import CONTENT_TYPE as AUTOTRACK_BATCH_TYPE, BatchDecodeError, decode_batch
+from ViscaOverIP.exceptions import NoQueryResponse, ViscaException
 
 logging.basicConfig(level=logging.DEBUG)
 
+# Most addresses one scan request may probe: a /22
+MAX_SCAN_ADDRESSES = 1024
+
 class CameraModel(BaseModel):
     ip: str
     color: list
@@ -21,6 +32,34 @@ class AutoTrackingCommand(BaseModel):
 class AutoTrackingCommands(BaseModel):
     commands: list[AutoTrackingCommand]
 
+class BroadcastCommand(BaseModel):
+    action: str
+    args: list = []
+    camera_indices: Optional[list[int]] = None  # None means every configured camera
+
+class MoveCommand(BaseModel):
+    pan_speed: Optional[float] = None  # -24..24, same convention as auto tracking; None leaves pan/tilt alone
+    tilt_speed: Optional[float] = None
+    zoom_speed: Optional[int] = None  # -7..7; None leaves zoom alone
+    lease: Optional[float] = 0.5  # seconds until the move lapses unless repeated; None holds until released
+
+class MacroDefinition(BaseModel):
+    steps: list
+    cameras: Optional[Union[list[int], Literal["all"]]] = None  # indices, "all", or None for the selected camera
+
+class MacroTarget(BaseModel):
+    camera_indices: Optional[list[int]] = None
+
+class DiscoveryScan(BaseModel):
+    range: Optional[str] = None  # e.g. "192.168.0.0/24"; defaults to config "discovery" then the local /24
+    port: int = Field(52381, gt=0, le=65535)
+    timeout: float = Field(0.3, gt=0, le=5)
+    concurrency: int = Field(64, gt=0, le=256)
+
+class DiscoveredCamera(BaseModel):
+    ip: str
+    color: Optional[list] = None  # defaults to the next unused palette colour
+
 class API:
     def __init__(self, host='0.0.0.0', port=9000, controller=None, shared_state=None):
         self.host = host
@@ -28,6 +67,10 @@ class API:
         self.controller = controller  # Controller object
         self.shared_state = shared_state  # SharedState object
 
+        # Serialised config responses, keyed by endpoint and reused until the config version changes
+        self._boot_id = f"{int(time.time()):x}"
+        self._config_cache = {}
+
         self.app = fastapi.FastAPI()
         
         # Add CORS middleware
@@ -42,15 +85,15 @@ class API:
         self.setup_routes()
 
         # Mount the frontend static files
-        self.app.mount("/", StaticFiles(directory="./frontend/dist", html=True), name="frontend")
+        self.app.mount("/", PrecompressedStaticFiles(directory="./frontend/dist", html=True), name="frontend")
 
         self.server = None
         self.thread = None
 
     def setup_routes(self):
         @self.app.get("/api/config")
-        async def get_config():
-            return self.shared_state.config
+        async def get_config(request: fastapi.Request):
+            return self.config_response(request, "config", lambda: self.shared_state.config)
 
         @self.app.post("/api/config")
         async def update_config(config: dict):
@@ -60,8 +103,8 @@ class API:
             return {"message": "Configuration updated successfully"}
 
         @self.app.get("/api/cameras")
-        async def get_cameras():
-            return self.shared_state.cameras
+        async def get_cameras(request: fastapi.Request):
+            return self.config_response(request, "cameras", lambda: self.shared_state.cameras)
 
         @self.app.get("/api/camera/{index}")
         async def get_camera(index: int):
@@ -81,14 +124,35 @@ class API:
 
         @self.app.post("/api/camera")
         async def add_camera(camera: CameraModel):
-            if len(self.shared_state.cameras) >= 15:
-                raise fastapi.HTTPException(status_code=400, detail="Maximum number of cameras (15) reached")
-            self.shared_state.cameras.append(camera.dict())
-            self.shared_state.config['cameras'] = self.shared_state.cameras
-            self.save_config()
-            self.shared_state.update_leds()
+            self.add_camera(camera.dict())
             return {"message": "Camera added successfully"}
 
+        @self.app.post("/api/discovery/scan")
+        async def scan_for_cameras(scan: DiscoveryScan):
+            """Probes an address range for VISCA-over-IP cameras. Each result says whether it's configured."""
+            spec = scan.range or self.shared_state.config.get('discovery', {}).get('range')
+            try:
+                spec = spec or await asyncio.to_thread(discovery.local_network)
+                started = time.monotonic()
+                configured = {camera['ip'] for camera in self.shared_state.cameras}
+                found = await discovery.discover(spec, scan.port, scan.timeout, scan.concurrency,
+                                                 known=configured, limit=MAX_SCAN_ADDRESSES)
+            except (ValueError, OSError) as e:
+                raise fastapi.HTTPException(status_code=400, detail=str(e))
+            for camera in found:
+                camera['configured'] = camera['ip'] in configured
+            return {"range": spec, "elapsed_ms": (time.monotonic() - started) * 1000, "cameras": found}
+
+        @self.app.post("/api/discovery/add")
+        async def add_discovered_camera(camera: DiscoveredCamera):
+            """One-click add for a camera found by a scan."""
+            if any(existing['ip'] == camera.ip for existing in self.shared_state.cameras):
+                raise fastapi.HTTPException(status_code=400, detail=f"Camera {camera.ip} is already configured")
+            color = camera.color or discovery.next_colour(self.shared_state.cameras)
+            self.add_camera({"ip": camera.ip, "color": color})
+            return {"message": "Camera added successfully", "index": len(self.shared_state.cameras) - 1,
+                    "color": color}
+
         @self.app.delete("/api/camera/{index}")
         async def remove_camera(index: int):
             if 0 <= index < len(self.shared_state.cameras):
@@ -99,6 +163,135 @@ class API:
                 return {"message": f"Camera at index {index} removed successfully", "removed_camera": removed_camera}
             raise fastapi.HTTPException(status_code=404, detail="Camera not found")
 
+        @self.app.post("/api/camera/{index}/move")
+        async def move_camera(index: int, move: MoveCommand):
+            """Drive a camera as the remote operator. Outranks auto tracking and macros, yields to the keyboard."""
+            if move.pan_speed is None and move.tilt_speed is None and move.zoom_speed is None:
+                raise fastapi.HTTPException(status_code=400, detail="Nothing to move")
+            def drive():
+                self.shared_state.move_camera(index, move.pan_speed, move.tilt_speed, move.zoom_speed, move.lease)
+                return self.shared_state.get_mixer(index).stats()
+            try:
+                return await asyncio.to_thread(drive)
+            except ValueError as e:
+                raise fastapi.HTTPException(status_code=404, detail=str(e))
+
+        @self.app.delete("/api/camera/{index}/move")
+        async def release_camera(index: int):
+            """Hand the camera back to whichever source is next in line."""
+            def release():
+                self.shared_state.release_camera(index)
+                return self.shared_state.get_mixer(index).stats()
+            try:
+                return await asyncio.to_thread(release)
+            except ValueError as e:
+                raise fastapi.HTTPException(status_code=404, detail=str(e))
+
+        @self.app.post("/api/broadcast")
+        async def broadcast(command: BroadcastCommand):
+            """Run one command on several cameras at once and report the outcome per camera."""
+            started = time.perf_counter()
+            try:
+                results = await asyncio.to_thread(
+                    self.shared_state.broadcast, command.action, command.args, command.camera_indices
+                )
+            except ValueError as e:
+                raise fastapi.HTTPException(status_code=400, detail=str(e))
+            return {
+                "action": command.action,
+                "results": results,
+                "elapsed_ms": (time.perf_counter() - started) * 1000,
+            }
+
+        @self.app.get("/api/presets/fast")
+        async def list_fast_presets(camera_index: Optional[int] = None):
+            index = self.shared_state.current_camera_index if camera_index is None else camera_index
+            if index is None:
+                raise fastapi.HTTPException(status_code=404, detail="No camera selected")
+            if not 0 <= index < len(self.shared_state.cameras):
+                raise fastapi.HTTPException(status_code=404, detail="Camera not found")
+            return await asyncio.to_thread(self.shared_state.fast_presets.list, self.shared_state.cameras[index]['ip'])
+
+        @self.app.post("/api/presets/fast/{preset_num}/save")
+        async def save_fast_preset(preset_num: int, camera_index: Optional[int] = None):
+            try:
+                position = await asyncio.to_thread(self.shared_state.save_fast_preset, preset_num, camera_index)
+            except ValueError as e:
+                raise fastapi.HTTPException(status_code=404, detail=str(e))
+            except NoQueryResponse as e:
+                raise fastapi.HTTPException(status_code=504, detail=f"Camera did not answer: {e}")
+            except ViscaException as e:
+                raise fastapi.HTTPException(status_code=502, detail=f"Camera refused: {e}")
+            return {"preset": preset_num, "position": position}
+
+        @self.app.post("/api/presets/fast/{preset_num}/recall")
+        async def recall_fast_preset(preset_num: int, camera_index: Optional[int] = None, timeout: float = 10.0):
+            """Move to a fast preset and respond once the camera reports the shot is ready."""
+            try:
+                result = await asyncio.to_thread(
+                    self.shared_state.recall_fast_preset, preset_num, camera_index, timeout
+                )
+            except (KeyError, ValueError) as e:
+                raise fastapi.HTTPException(status_code=404, detail=str(e))
+            except NoQueryResponse as e:
+                raise fastapi.HTTPException(status_code=504, detail=f"Camera did not answer: {e}")
+            except ViscaException as e:
+                raise fastapi.HTTPException(status_code=502, detail=f"Camera refused: {e}")
+            return {"preset": preset_num, **result}
+
+        @self.app.get("/api/macros")
+        async def get_macros():
+            macros = self.shared_state.macros
+            return {
+                "macros": self.shared_state.config.get("macros", {}),
+                "buttons": self.shared_state.config.get("macro_buttons", []),
+                "status": macros.status() if macros else {},
+            }
+
+        @self.app.put("/api/macros/{name}")
+        async def save_macro(name: str, macro: MacroDefinition):
+            try:
+                validate_steps(macro.steps)
+                validate_cameras(macro.cameras)
+            except ValueError as e:
+                raise fastapi.HTTPException(status_code=400, detail=str(e))
+            self.shared_state.config.setdefault("macros", {})[name] = macro.model_dump(exclude_none=True)
+            self.save_config()
+            return {"message": f"Macro {name} saved"}
+
+        @self.app.delete("/api/macros/{name}")
+        async def delete_macro(name: str):
+            if name not in self.shared_state.config.get("macros", {}):
+                raise fastapi.HTTPException(status_code=404, detail="Macro not found")
+            if self.shared_state.macros:
+                await asyncio.to_thread(self.shared_state.macros.stop_macro, name)
+            del self.shared_state.config["macros"][name]
+            self.save_config()
+            return {"message": f"Macro {name} deleted"}
+
+        @self.app.post("/api/macros/{name}/run")
+        async def run_macro(name: str, target: Optional[MacroTarget] = None):
+            if not self.shared_state.macros:
+                raise fastapi.HTTPException(status_code=503, detail="Macro engine not running")
+            try:
+                cameras = await asyncio.to_thread(
+                    self.shared_state.macros.run, name, target.camera_indices if target else None
+                )
+            except KeyError:
+                raise fastapi.HTTPException(status_code=404, detail="Macro not found")
+            except ValueError as e:
+                raise fastapi.HTTPException(status_code=400, detail=str(e))
+            return {"macro": name, "camera_indices": cameras}
+
+        @self.app.post("/api/macros/stop")
+        async def stop_macros(name: Optional[str] = None, target: Optional[MacroTarget] = None):
+            if not self.shared_state.macros:
+                return {"stopped": []}
+            stopped = await asyncio.to_thread(
+                self.shared_state.macros.stop_macro, name, target.camera_indices if target else None
+            )
+            return {"stopped": stopped}
+
         @self.app.get("/api/autotrack/status")
         async def get_autotrack_status():
             return {
@@ -110,34 +303,137 @@ class API:
         @self.app.post("/api/autotrack/toggle")
         async def toggle_autotrack():
             if self.controller:
-                self.controller.inputCtrl.auto_tracking_active = not self.controller.inputCtrl.auto_tracking_active
-                self.controller.inputCtrl.auto_tracking_changed = True
-                return {"auto_tracking_active": self.controller.inputCtrl.auto_tracking_active}
+                inputs = self.controller.inputCtrl
+                def toggle():
+                    inputs.auto_tracking_active = not inputs.auto_tracking_active
+                    inputs.auto_tracking_changed = True
+                    return inputs.auto_tracking_active
+                return {"auto_tracking_active": await asyncio.to_thread(toggle)}
             raise fastapi.HTTPException(status_code=500, detail="Controller not available")
 
         @self.app.post("/api/autotrack/commands")
-        async def update_autotrack_commands(commands: AutoTrackingCommands):
-            for cmd in commands.commands:
-                self.shared_state.update_auto_tracking_command(
-                    cmd.camera_index, 
-                    cmd.pan_speed, 
-                    cmd.tilt_speed
-                )
+        async def update_autotrack_commands(request: fastapi.Request):
+            body = await request.body()
+            try:
+                if request.headers.get("content-type", "").startswith(AUTOTRACK_BATCH_TYPE):
+                    self.apply_autotrack_batch(body)
+                else:
+                    self.apply_autotrack_json(body)
+            except (BatchDecodeError, ValidationError) as e:
+                raise fastapi.HTTPException(status_code=422, detail=str(e))
             return {"message": "Auto tracking commands updated successfully"}
 
+        @self.app.websocket("/api/autotrack/stream")
+        async def stream_autotrack_commands(websocket: fastapi.WebSocket):
+            """Streaming channel for auto tracking commands: binary frames carry encoded batches,
+            text frames carry the same JSON body as POST /api/autotrack/commands."""
+            await websocket.accept()
+            try:
+                while True:
+                    message = await websocket.receive()
+                    if message["type"] == "websocket.disconnect":
+                        break
+                    try:
+                        if message.get("bytes") is not None:
+                            self.apply_autotrack_batch(message["bytes"])
+                        elif message.get("text") is not None:
+                            self.apply_autotrack_json(message["text"])
+                    except (BatchDecodeError, ValidationError) as e:
+                        await websocket.send_json({"error": str(e)})
+            except fastapi.WebSocketDisconnect:
+                pass
+
+        @self.app.get("/api/motion/stats")
+        async def get_motion_stats():
+            return self.shared_state.get_motion_stats()
+
+        @self.app.get("/api/health")
+        async def get_health():
+            """Up/degraded/down state, probe loss and round trip of every configured camera."""
+            if self.shared_state.health is None:
+                raise fastapi.HTTPException(status_code=404, detail="The health monitor is not running")
+            return self.shared_state.health.status()
+
+        @self.app.get("/api/keyboards")
+        async def get_keyboards():
+            """Every keyboard, the camera it has selected and whether it still drives that camera."""
+            return self.shared_state.get_keyboards()
+
+        @self.app.get("/api/link/stats")
+        async def get_link_stats():
+            """Round-trip time, variance and retransmission timeout per camera, plus transport counters."""
+            return self.shared_state.get_link_stats()
+
+        @self.app.get("/api/pose")
+        async def get_poses():
+            """Estimated pan/tilt/zoom of every camera. Served from the estimators, never from the cameras."""
+            return self.shared_state.get_poses()
+
+        @self.app.get("/api/detection/stats")
+        async def get_detection_stats():
+            if self.shared_state.detection_service is None:
+                raise fastapi.HTTPException(status_code=404, detail="Server-side detection is not enabled")
+            return self.shared_state.detection_service.get_stats()
+
         @self.app.get("/api/python-cameras")
-        async def get_python_cameras():
+        async def get_python_cameras(request: fastapi.Request):
             """Get the list of cameras from Python control system for frontend mapping."""
-            cameras_with_index = []
-            for i, camera in enumerate(self.shared_state.cameras):
-                cameras_with_index.append({
-                    "index": i,
-                    "ip": camera["ip"],
-                    "color": camera["color"]
-                })
-            return {"cameras": cameras_with_index}
+            def build():
+                cameras_with_index = []
+                for i, camera in enumerate(self.shared_state.cameras):
+                    cameras_with_index.append({
+                        "index": i,
+                        "ip": camera["ip"],
+                        "color": camera["color"]
+                    })
+                return {"cameras": cameras_with_index}
+            return self.config_response(request, "python-cameras", build)
+
+    def apply_autotrack_json(self, body):
+        commands = AutoTrackingCommands.model_validate_json(body)
+        for cmd in commands.commands:
+            self.shared_state.update_auto_tracking_command(
+                cmd.camera_index,
+                cmd.pan_speed,
+                cmd.tilt_speed
+            )
+
+    def apply_autotrack_batch(self, body: bytes):
+        # Records are applied in order, so the last command for a camera wins, as with JSON
+        records = decode_batch(body)
+        for camera_index, pan_speed, tilt_speed in zip(
+            records['camera_index'].tolist(), records['pan_speed'].tolist(), records['tilt_speed'].tolist()
+        ):
+            self.shared_state.update_auto_tracking_command(camera_index, pan_speed, tilt_speed)
+
+    def config_response(self, request, key, build):
+        """Serves config-derived JSON with an ETag tied to the config version, answering
+        conditional GETs with 304 and only re-serialising after the config changes."""
+        version = self.shared_state.config_version
+        etag = f'"{self._boot_id}-{version}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            return fastapi.Response(status_code=304, headers=headers)
+
+        cached = self._config_cache.get(key)
+        if cached is None or cached[0] != version:
+            cached = (version, json.dumps(build(), separators=(",", ":")).encode())
+            self._config_cache[key] = cached
+        return fastapi.Response(content=cached[1], media_type="application/json", headers=headers)
+
+    def add_camera(self, camera: dict):
+        """:raises fastapi.HTTPException: if the maximum number of cameras is already configured"""
+        if len(self.shared_state.cameras) >= 15:
+            raise fastapi.HTTPException(status_code=400, detail="Maximum number of cameras (15) reached")
+        self.shared_state.cameras.append(camera)
+        self.shared_state.config['cameras'] = self.shared_state.cameras
+        self.save_config()
+        self.shared_state.update_leds()
 
     def save_config(self):
+        self.shared_state.mark_config_changed()
         with open('config.json', 'w') as f:
             json.dump(self.shared_state.config, f, indent=2)
 
@@ -0,0 +1,69 @@
+"""
+Compact binary encoding for auto-tracking command batches.
+
+A batch is a fixed 6 byte header followed by packed 13 byte records, all little endian:
+
+    header: magic b'AT' | version (uint8) | flags (uint8) | record count (uint16)
+    record: camera_index (uint8) | pan_speed (float32) | tilt_speed (float32) | timestamp_ms (uint32)
+
+Decoding returns a numpy structured array that is a view over the received bytes, so no Python
+object is created per record.
+"""
+import struct
+
+import numpy as np
+
+CONTENT_TYPE = 'application/x-autotrack-batch'
+MAGIC = b'AT'
+VERSION = 1
+
+HEADER = struct.Struct('<2sBBH')
+RECORD_DTYPE = np.dtype([
+    ('camera_index', '<u1'),
+    ('pan_speed', '<f4'),
+    ('tilt_speed', '<f4'),
+    ('timestamp', '<u4'),
+])  # packed, itemsize 13
+
+MAX_CAMERAS = 15
+MAX_SPEED = 24
+
+
+class BatchDecodeError(ValueError):
+    """Raised when a binary batch is malformed"""
+
+
+def encode_batch(camera_indices, pan_speeds, tilt_speeds, timestamps=None) -> bytes:
+    """Packs parallel sequences (or arrays) of commands into a binary batch."""
+    records = np.empty(len(camera_indices), dtype=RECORD_DTYPE)
+    records['camera_index'] = camera_indices
+    records['pan_speed'] = pan_speeds
+    records['tilt_speed'] = tilt_speeds
+    records['timestamp'] = 0 if timestamps is None else timestamps
+    return HEADER.pack(MAGIC, VERSION, 0, len(records)) + records.tobytes()
+
+
+def decode_batch(data: bytes) -> np.ndarray:
+    """Validates a binary batch and returns its records as a read-only structured array.
+
+    :raises BatchDecodeError: if the header, length or any record is invalid
+    """
+    if len(data) < HEADER.size:
+        raise BatchDecodeError('Batch is shorter than its header')
+
+    magic, version, _flags, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise BatchDecodeError('Not an auto-tracking batch')
+    if version != VERSION:
+        raise BatchDecodeError(f'Unsupported batch version {version}')
+    if len(data) != HEADER.size + count * RECORD_DTYPE.itemsize:
+        raise BatchDecodeError(f'Batch length does not match its record count ({count})')
+
+    records = np.frombuffer(data, dtype=RECORD_DTYPE, count=count, offset=HEADER.size)
+    if count:
+        # NaN and infinity fail the comparison, so one check covers range and finiteness
+        if not ((np.abs(records['pan_speed']) <= MAX_SPEED).all() and (np.abs(records['tilt_speed']) <= MAX_SPEED).all()):
+            raise BatchDecodeError(f'Speeds must be finite and between -{MAX_SPEED} and {MAX_SPEED}')
+        if records['camera_index'].max() >= MAX_CAMERAS:
+            raise BatchDecodeError(f'Camera indices must be below {MAX_CAMERAS}')
+    return records
@@ -0,0 +1,537 @@
+"""
+Runs api.api.API in a process of its own, so request parsing, validation and static files don't
+compete for the GIL with the serial reader and VISCA sends (config "api": {"process": true}).
+
+The control process publishes live state (selected camera, flags, auto-tracking commands, telemetry)
+and the config into SeqlockBlocks; the API process reads them without waiting on anything. What the
+API changes goes the other way through a ByteRing: auto-tracking commands, LED refreshes and new
+configs are just applied, calls that return something (moves, presets, broadcasts, macros) get their
+result back through a second ring. A call's reply is sent after the state it changed is published,
+so the API reads its own writes. A byte on a socketpair wakes the other side up.
+
+In the API process the API gets a RemoteState and RemoteController, which stand in for the
+SharedState and keyboard Controller it normally holds.
+"""
+import argparse
+import itertools
+import logging
+import os
+import select
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api.shm import ByteRing, SeqlockBlock
+from ViscaOverIP.exceptions import NoQueryResponse, ViscaException
+
+# Messages to the control process: ('autotrack', camera_index, pan_speed, tilt_speed), ('update_leds',),
+# ('config', config) and ('call', id, method, args). Replies: (id, True, result) or
+# (id, False, (exception type name, message)).
+
+# Errors the API tells apart; anything else comes back as a RuntimeError with the same message
+REMOTE_ERRORS = {cls.__name__: cls for cls in (ValueError, KeyError, TypeError, IndexError, TimeoutError,
+                                                 NoQueryResponse)}
+
+
+class RemoteViscaException(ViscaException):
+    """A ViscaException raised in the control process. Only its message crosses over."""
+
+    def __init__(self, message):
+        RuntimeError.__init__(self, message)
+        self.status_code = None
+        self.description = message
+
+
+def _error_reply(e):
+    """Exceptions are sent as their type name and message: not all of them survive pickling."""
+    message = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+    return type(e).__name__, str(message)
+
+
+def _rebuild_error(name, message):
+    if name == 'ViscaException':
+        return RemoteViscaException(message)
+    return REMOTE_ERRORS.get(name, RuntimeError)(message)
+
+
+class APIProcess:
+    """The control process's end, with the same start/stop as API."""
+
+    def __init__(self, shared_state, host='0.0.0.0', port=9000, interval=0.05, telemetry_interval=0.5):
+        """:param shared_state: the SharedState to serve
+        :param interval: seconds between publishing the live state
+        :param telemetry_interval: seconds between refreshing motion, link, pose and health telemetry
+        """
+        self.state = shared_state
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.telemetry_interval = telemetry_interval
+
+        self.live = SeqlockBlock()
+        self.config = SeqlockBlock(size=1 << 18)
+        self.commands = ByteRing()
+        self.replies = ByteRing()
+        self._wake_receive, self._wake_api = socket.socketpair()  # the API process rings us on _wake_api
+        self._replied_receive, self._replied_send = socket.socketpair()
+        for sock in (self._wake_receive, self._wake_api, self._replied_receive, self._replied_send):
+            sock.setblocking(False)
+
+        self._publish_lock = threading.Lock()
+        self._reply_lock = threading.Lock()
+        self._calls = ThreadPoolExecutor(max_workers=4, thread_name_prefix='api-call')
+        self._telemetry = {}
+        self._telemetry_due = 0.0
+        self._config_version = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.process = None  # the API process, a subprocess.Popen
+        self.applied = 0  # messages taken off the command ring
+
+    def start(self):
+        self.publish()
+        # A fresh interpreter rather than multiprocessing, which would fork a process full of threads or
+        # (spawning) run main.py again
+        package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [package_dir, os.environ.get('PYTHONPATH')])))
+        fds = (self._wake_api.fileno(), self._replied_receive.fileno())
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'api.process', '--host', self.host, '--port', str(self.port),
+             '--live', self.live.name, '--config', self.config.name, '--commands', self.commands.name,
+             '--replies', self.replies.name, '--wake-fd', str(fds[0]), '--replied-fd', str(fds[1])],
+            env=env, pass_fds=fds)
+        self._thread = threading.Thread(target=self._run, daemon=True, name='api-bridge')
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self._thread is not None:
+            self._thread.join()
+        self._calls.shutdown(wait=False)
+        for channel in (self.live, self.config, self.commands, self.replies):
+            channel.close(unlink=True)
+
+    # Publishing -------------------------------------------------------------
+
+    def publish(self):
+        """Publishes the live state, and the config if it changed."""
+        state = self.state
+        now = time.monotonic()
+        if now >= self._telemetry_due:
+            self._telemetry = self._collect_telemetry()
+            self._telemetry_due = now + self.telemetry_interval
+        controller = state.controller
+        live = {
+            'config_version': state.config_version,
+            'current_camera_index': state.current_camera_index,
+            'auto_tracking_active': bool(controller and controller.inputCtrl.auto_tracking_active),
+            'auto_tracking_commands': dict(state.auto_tracking_commands),
+            'fast_mode_active': state.fast_mode_active,
+            'home_mode': state.home_mode,
+            'keyboards': state.get_keyboards(),
+            'published': time.time(),
+            **self._telemetry,
+        }
+        with self._publish_lock:
+            if state.config_version != self._config_version:
+                self._config_version = state.config_version
+                self.config.write(state.config)
+            self.live.write(live)
+
+    def _collect_telemetry(self):
+        state = self.state
+        telemetry = {'motion': state.get_motion_stats(), 'link': state.get_link_stats(), 'poses': state.get_poses(),
+                     'health': state.health.status() if state.health else None,
+                     'detection': state.detection_service.get_stats() if state.detection_service else None,
+                     'macros': state.macros.status() if state.macros else None}
+        return telemetry
+
+    # Applying ---------------------------------------------------------------
+
+    def _run(self):
+        next_publish = time.monotonic()
+        while not self._stop.is_set():
+            select.select([self._wake_receive], [], [], max(0.0, next_publish - time.monotonic()))
+            try:
+                while self._wake_receive.recv(4096):
+                    pass
+            except (BlockingIOError, OSError):
+                pass
+            changed = self._apply_commands()
+            if changed or time.monotonic() >= next_publish:
+                try:
+                    self.publish()
+                except Exception as e:
+                    logging.error(f"Error publishing state to the API process: {e}")
+                next_publish = time.monotonic() + self.interval
+
+    def _apply_commands(self) -> bool:
+        changed = False
+        while True:
+            try:
+                message = self.commands.get()
+            except Exception as e:
+                logging.error(f"Error reading a command from the API process: {e}")
+                continue
+            if message is None:
+                return changed
+            self.applied += 1
+            try:
+                kind = message[0]
+                if kind == 'autotrack':
+                    self.state.update_auto_tracking_command(*message[1:])
+                    changed = True
+                elif kind == 'update_leds':
+                    self.state.update_leds()
+                elif kind == 'config':
+                    self._apply_config(message[1])
+                    changed = True
+                elif kind == 'call':
+                    self._calls.submit(self._call, *message[1:])
+            except Exception as e:
+                logging.error(f"Error applying {message[0]} from the API process: {e}")
+
+    def _apply_config(self, config):
+        self.state.config = config
+        self.state.cameras = config['cameras']
+        self.state.mark_config_changed()
+        self.state.update_leds()
+
+    def _call(self, call_id, method, args):
+        try:
+            reply = (call_id, True, getattr(self, f'_call_{method}')(*args))
+        except Exception as e:
+            reply = (call_id, False, _error_reply(e))
+        try:
+            self.publish()  # before replying, so the caller sees what it changed
+        except Exception as e:
+            logging.error(f"Error publishing state to the API process: {e}")
+        with self._reply_lock:
+            while not self.replies.put(reply):
+                time.sleep(0.001)
+        try:
+            self._replied_send.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    # What the API process may call, see RemoteState
+    def _call_broadcast(self, action, args, camera_indices):
+        return self.state.broadcast(action, args, camera_indices)
+
+    def _call_save_fast_preset(self, preset_num, camera_index):
+        return self.state.save_fast_preset(preset_num, camera_index)
+
+    def _call_recall_fast_preset(self, preset_num, camera_index, timeout):
+        return self.state.recall_fast_preset(preset_num, camera_index, timeout)
+
+    def _call_list_fast_presets(self, ip):
+        return self.state.fast_presets.list(ip)
+
+    def _call_move_camera(self, camera_index, pan, tilt, zoom, lease):
+        self.state.move_camera(camera_index, pan, tilt, zoom, lease)
+
+    def _call_release_camera(self, camera_index):
+        self.state.release_camera(camera_index)
+
+    def _call_mixer_stats(self, camera_index):
+        return self.state.get_mixer(camera_index).stats()
+
+    def _call_run_macro(self, name, camera_indices):
+        return self._macros().run(name, camera_indices)
+
+    def _call_stop_macro(self, name, camera_indices):
+        return self._macros().stop_macro(name, camera_indices)
+
+    def _call_set_auto_tracking(self, active):
+        controls = self.state.controller.inputCtrl
+        controls.auto_tracking_active = active
+        controls.auto_tracking_changed = True
+        return active
+
+    def _macros(self):
+        if self.state.macros is None:
+            raise RuntimeError("Macro engine not running")
+        return self.state.macros
+
+
+# The API process ------------------------------------------------------------
+
+class _Telemetry:
+    """Stands in for the health monitor or detection service: status from the published state."""
+
+    def __init__(self, remote, key):
+        self.remote = remote
+        self.key = key
+
+    def status(self):
+        return self.remote.live()[self.key]
+
+    get_stats = status
+
+
+class _RemoteMacros:
+    def __init__(self, remote):
+        self.remote = remote
+
+    def status(self):
+        return self.remote.live()['macros']
+
+    def run(self, name, camera_indices=None):
+        return self.remote.call('run_macro', name, camera_indices)
+
+    def stop_macro(self, name=None, camera_indices=None):
+        return self.remote.call('stop_macro', name, camera_indices)
+
+
+class _RemoteMixer:
+    def __init__(self, remote, camera_index):
+        self.remote = remote
+        self.camera_index = camera_index
+
+    def stats(self):
+        return self.remote.call('mixer_stats', self.camera_index)
+
+
+class _RemotePresets:
+    def __init__(self, remote):
+        self.remote = remote
+
+    def list(self, ip):
+        return self.remote.call('list_fast_presets', ip)
+
+
+class RemoteState:
+    """
+    What api.api.API uses of SharedState, served from the control process's published state and
+    calls through the command ring. The config and camera list are a local copy the API edits in
+    place; save_config's mark_config_changed sends the edited config back.
+    """
+
+    def __init__(self, live, config, commands, replies, wake, replied):
+        self._live = live
+        self._config_block = config
+        self._commands = commands
+        self._replies = replies
+        self._wake = wake
+        self._replied = replied
+        wake.setblocking(False)
+        replied.setblocking(False)
+        self._push_lock = threading.Lock()  # API requests run on several threads, the ring has one producer
+        self._calls = {}  # id -> [threading.Event, ok, result]
+        self._ids = itertools.count(1)
+        self._config_sequence = None
+        self._config = None
+        self._cameras = None
+        self.fast_presets = _RemotePresets(self)
+        threading.Thread(target=self._receive_replies, daemon=True, name='api-replies').start()
+
+    def live(self):
+        return self._live.read()
+
+    # Config -----------------------------------------------------------------
+
+    def _refresh_config(self):
+        sequence = self._config_block.sequence()
+        if sequence != self._config_sequence:
+            self._config_sequence = sequence
+            self._config = self._config_block.read()
+            self._cameras = self._config['cameras']
+
+    @property
+    def config(self):
+        self._refresh_config()
+        return self._config
+
+    @config.setter
+    def config(self, config):
+        self._refresh_config()
+        self._config = config
+
+    @property
+    def cameras(self):
+        self._refresh_config()
+        return self._cameras
+
+    @cameras.setter
+    def cameras(self, cameras):
+        self._refresh_config()
+        self._cameras = cameras
+
+    @property
+    def config_version(self):
+        return self.live()['config_version']
+
+    def mark_config_changed(self):
+        self.push(('config', self._config))
+
+    # Live state -------------------------------------------------------------
+
+    @property
+    def current_camera_index(self):
+        return self.live()['current_camera_index']
+
+    @property
+    def auto_tracking_commands(self):
+        return self.live()['auto_tracking_commands']
+
+    @property
+    def health(self):
+        return _Telemetry(self, 'health') if self.live()['health'] is not None else None
+
+    @property
+    def detection_service(self):
+        return _Telemetry(self, 'detection') if self.live()['detection'] is not None else None
+
+    @property
+    def macros(self):
+        return _RemoteMacros(self) if self.live()['macros'] is not None else None
+
+    def get_keyboards(self):
+        return self.live()['keyboards']
+
+    def get_motion_stats(self):
+        return self.live()['motion']
+
+    def get_link_stats(self):
+        return self.live()['link']
+
+    def get_poses(self):
+        return self.live()['poses']
+
+    def get_mixer(self, camera_index):
+        return _RemoteMixer(self, camera_index)
+
+    # Commands ---------------------------------------------------------------
+
+    def update_auto_tracking_command(self, camera_index, pan_speed, tilt_speed):
+        self.push(('autotrack', camera_index, pan_speed, tilt_speed))
+
+    def update_leds(self):
+        self.push(('update_leds',))
+
+    def broadcast(self, action, args=(), camera_indices=None, timeout=10.0):
+        return self.call('broadcast', action, args, camera_indices)
+
+    def save_fast_preset(self, preset_num, camera_index=None):
+        return self.call('save_fast_preset', preset_num, camera_index)
+
+    def recall_fast_preset(self, preset_num, camera_index=None, timeout=10.0):
+        return self.call('recall_fast_preset', preset_num, camera_index, timeout)
+
+    def move_camera(self, camera_index, pan=None, tilt=None, zoom=None, lease=0.5):
+        return self.call('move_camera', camera_index, pan, tilt, zoom, lease)
+
+    def release_camera(self, camera_index):
+        return self.call('release_camera', camera_index)
+
+    def push(self, message, timeout=1.0):
+        """Sends a message to the control process, waiting up to `timeout` for room on the ring.
+        :raises RuntimeError: if the ring stays full
+        """
+        deadline = time.monotonic() + timeout
+        with self._push_lock:
+            while not self._commands.put(message):
+                if time.monotonic() >= deadline:
+                    raise RuntimeError("The control process is not taking commands")
+                time.sleep(0.001)
+        try:
+            self._wake.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass  # a wakeup is already pending
+
+    def call(self, method, *args, timeout=60.0):
+        """Runs one of APIProcess's _call_ methods in the control process and returns its result,
+        raising what it raised."""
+        call_id = next(self._ids)
+        pending = [threading.Event(), None, None]
+        self._calls[call_id] = pending
+        try:
+            self.push(('call', call_id, method, args))
+            if not pending[0].wait(timeout):
+                raise TimeoutError(f"No reply from the control process to {method}")
+        finally:
+            self._calls.pop(call_id, None)
+        if not pending[1]:
+            raise _rebuild_error(*pending[2])
+        return pending[2]
+
+    def _receive_replies(self):
+        while True:
+            select.select([self._replied], [], [], 1.0)
+            try:
+                while True:
+                    if not self._replied.recv(4096):
+                        # The control process closed its end: it has gone, and so should the API
+                        logging.error("The control process has exited, stopping the API process")
+                        os._exit(1)
+            except (BlockingIOError, OSError):
+                pass
+            while True:
+                try:
+                    reply = self._replies.get()
+                    if reply is None:
+                        break
+                    call_id, ok, result = reply
+                except Exception as e:
+                    # get() has already moved past it, so one bad message costs only its own call
+                    logging.error(f"Error reading a reply from the control process: {e}")
+                    continue
+                pending = self._calls.get(call_id)
+                if pending is not None:
+                    pending[1], pending[2] = ok, result
+                    pending[0].set()
+
+
+class _RemoteInputs:
+    def __init__(self, remote):
+        self.remote = remote
+        self.auto_tracking_changed = False  # the control process sets its own
+
+    @property
+    def auto_tracking_active(self):
+        return self.remote.live()['auto_tracking_active']
+
+    @auto_tracking_active.setter
+    def auto_tracking_active(self, active):
+        self.remote.call('set_auto_tracking', active)
+
+
+class RemoteController:
+    """Stands in for the keyboard Controller: just the auto-tracking flag the API reads and toggles."""
+
+    def __init__(self, remote):
+        self.inputCtrl = _RemoteInputs(remote)
+
+
+def main():
+    """Entry point of the API process, started by APIProcess."""
+    parser = argparse.ArgumentParser(description='The API process, see APIProcess')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--live', required=True, help='shared memory name of the live state block')
+    parser.add_argument('--config', required=True, help='shared memory name of the config block')
+    parser.add_argument('--commands', required=True, help='shared memory name of the command ring')
+    parser.add_argument('--replies', required=True, help='shared memory name of the reply ring')
+    parser.add_argument('--wake-fd', type=int, required=True, help='socket to wake the control process on')
+    parser.add_argument('--replied-fd', type=int, required=True, help='socket the control process wakes us on')
+    args = parser.parse_args()
+
+    from api.api import API
+
+    remote = RemoteState(SeqlockBlock(args.live), SeqlockBlock(args.config), ByteRing(args.commands),
+                         ByteRing(args.replies), socket.socket(fileno=args.wake_fd),
+                         socket.socket(fileno=args.replied_fd))
+    API(host=args.host, port=args.port, controller=RemoteController(remote), shared_state=remote).run()
+
+
+if __name__ == '__main__':
+    main()
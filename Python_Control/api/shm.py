@@ -0,0 +1,156 @@
+"""
+Shared-memory channels between the control process and the API process (see api/process.py).
+
+SeqlockBlock holds one value that a single writer replaces now and then and readers copy out
+without ever blocking the writer: the writer makes the sequence number odd, writes, and makes it
+even again, and a reader retries if the number was odd or changed while it copied.
+
+ByteRing is a single-producer, single-consumer queue of messages: the producer only ever advances
+`head` and the consumer only `tail`, so neither needs a lock. Messages are stored as a 4 byte length
+and the bytes, and one that doesn't fit before the end of the buffer starts again at the front.
+
+Both rely on aligned 8 byte stores of the counters being atomic, and both leave the data alone
+while it can still be read. Values are pickled; both ends are our own processes.
+"""
+import pickle
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+SEQLOCK_HEADER = struct.Struct('<QI4x')  # sequence number, payload length
+RING_HEADER = struct.Struct('<QQ')  # head (bytes ever written), tail (bytes ever read)
+LENGTH = struct.Struct('<I')
+WRAP = 0xFFFFFFFF  # length of the filler at the end of the buffer when a message starts again at the front
+
+
+def _attach(name):
+    shm = shared_memory.SharedMemory(name=name)
+    # Only the process that created the block removes it: before Python 3.13 attaching also registers it
+    # with this process's resource tracker, which would remove it when this process exits
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+class SeqlockBlock:
+    def __init__(self, name=None, size=1 << 16):
+        """:param name: the shared memory block to attach to; a new one is created if None
+        :param size: bytes of payload, for a new block
+        """
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=SEQLOCK_HEADER.size + size)
+            SEQLOCK_HEADER.pack_into(self.shm.buf, 0, 0, 0)
+        else:
+            self.shm = _attach(name)
+        self.name = self.shm.name
+        self.capacity = self.shm.size - SEQLOCK_HEADER.size
+        self._cached = (None, None)  # (sequence number, value) of the last read
+
+    def write(self, value):
+        """Publishes `value`. One writer at a time.
+        :raises ValueError: if it doesn't fit
+        """
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.capacity:
+            raise ValueError(f'{len(data)} bytes do not fit in a {self.capacity} byte block')
+        buf = self.shm.buf
+        sequence = SEQLOCK_HEADER.unpack_from(buf, 0)[0]
+        SEQLOCK_HEADER.pack_into(buf, 0, sequence + 1, len(data))
+        buf[SEQLOCK_HEADER.size:SEQLOCK_HEADER.size + len(data)] = data
+        SEQLOCK_HEADER.pack_into(buf, 0, sequence + 2, len(data))
+
+    def sequence(self) -> int:
+        return SEQLOCK_HEADER.unpack_from(self.shm.buf, 0)[0]
+
+    def read(self):
+        """The last published value, or None before the first. Unpickled only when it changed."""
+        buf = self.shm.buf
+        while True:
+            sequence, length = SEQLOCK_HEADER.unpack_from(buf, 0)
+            if sequence == self._cached[0]:
+                return self._cached[1]
+            if sequence & 1:
+                time.sleep(0)  # a write is under way
+                continue
+            data = bytes(buf[SEQLOCK_HEADER.size:SEQLOCK_HEADER.size + length])
+            if SEQLOCK_HEADER.unpack_from(buf, 0)[0] == sequence:
+                break
+        value = pickle.loads(data) if sequence else None
+        self._cached = (sequence, value)
+        return value
+
+    def close(self, unlink=False):
+        self._cached = (None, None)
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class ByteRing:
+    def __init__(self, name=None, size=1 << 20):
+        """:param name: the shared memory block to attach to; a new one is created if None
+        :param size: bytes of buffer, for a new ring
+        """
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=RING_HEADER.size + size)
+            RING_HEADER.pack_into(self.shm.buf, 0, 0, 0)
+        else:
+            self.shm = _attach(name)
+        self.name = self.shm.name
+        self.capacity = self.shm.size - RING_HEADER.size
+        self.dropped = 0  # messages `put` found no room for
+
+    def _counters(self):
+        return RING_HEADER.unpack_from(self.shm.buf, 0)
+
+    def put(self, value) -> bool:
+        """Appends a message. Producer side only. :return: False if the ring is full"""
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        need = LENGTH.size + len(data)
+        if need + LENGTH.size > self.capacity:
+            raise ValueError(f'{len(data)} bytes do not fit in a {self.capacity} byte ring')
+        head, tail = self._counters()
+        offset = head % self.capacity
+        filler = 0
+        if offset + need > self.capacity:
+            filler = self.capacity - offset  # start again at the front
+        if head + filler + need - tail > self.capacity:
+            self.dropped += 1
+            return False
+        buf = self.shm.buf
+        start = RING_HEADER.size
+        if filler:
+            if filler >= LENGTH.size:
+                LENGTH.pack_into(buf, start + offset, WRAP)
+            offset = 0
+        LENGTH.pack_into(buf, start + offset, len(data))
+        buf[start + offset + LENGTH.size:start + offset + need] = data
+        struct.pack_into('<Q', buf, 0, head + filler + need)  # publish after the data
+        return True
+
+    def get(self):
+        """Takes the oldest message. Consumer side only. :return: the message, or None if empty
+        :raises Exception: what unpickling it raised; the message is gone either way
+        """
+        head, tail = self._counters()
+        if tail == head:
+            return None
+        buf = self.shm.buf
+        start = RING_HEADER.size
+        offset = tail % self.capacity
+        if self.capacity - offset < LENGTH.size or LENGTH.unpack_from(buf, start + offset)[0] == WRAP:
+            tail += self.capacity - offset
+            offset = 0
+        length = LENGTH.unpack_from(buf, start + offset)[0]
+        data = bytes(buf[start + offset + LENGTH.size:start + offset + LENGTH.size + length])
+        struct.pack_into('<Q', buf, 8, tail + LENGTH.size + length)  # free it once copied out
+        return pickle.loads(data)  # a message that won't unpickle is dropped, not stuck at the front
+
+    def __len__(self):
+        """Bytes waiting to be read."""
+        head, tail = self._counters()
+        return head - tail
+
+    def close(self, unlink=False):
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
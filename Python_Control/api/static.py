@@ -0,0 +1,138 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+
+# Brotli is optional; without it only gzip variants are produced and served
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_SUFFIXES = {'.html', '.js', '.css', '.svg', '.json', '.map', '.txt'}
+MIN_COMPRESS_SIZE = 256
+
+# Vite emits content-hashed files under assets/, so they never change once served
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+
+def default_cache_dir(directory: str) -> str:
+    """Where compressed copies of `directory` go: under the user's cache directory, so the served
+    directory itself (checked in, possibly read-only) is never written to."""
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    key = hashlib.sha1(os.path.abspath(directory).encode()).hexdigest()[:12]
+    return os.path.join(root, 'autotracker', 'static', key)
+
+
+def precompress_directory(directory: str, cache_dir: str) -> int:
+    """Writes .gz (and .br when brotli is installed) copies of every compressible file in `directory`
+    into the same relative place under `cache_dir`, unless an up to date one is there already.
+
+    :return: the number of compressed files written
+    """
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if os.path.splitext(name)[1] not in COMPRESSIBLE_SUFFIXES:
+                continue
+            source = os.path.join(root, name)
+            cached = os.path.join(cache_dir, os.path.relpath(source, directory))
+            source_stat = os.stat(source)
+            if source_stat.st_size < MIN_COMPRESS_SIZE:
+                continue
+
+            encoders = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                encoders.append(('.br', lambda data: brotli.compress(data, quality=11)))
+
+            data = None
+            for suffix, encode in encoders:
+                target = cached + suffix
+                if os.path.exists(target) and os.stat(target).st_mtime >= source_stat.st_mtime:
+                    continue
+                if data is None:
+                    with open(source, 'rb') as f:
+                        data = f.read()
+                partial = f'{target}.{os.getpid()}.tmp'  # another server may be filling the same cache
+                try:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with open(partial, 'wb') as f:
+                        f.write(encode(data))
+                    os.replace(partial, target)
+                    written += 1
+                except OSError as e:
+                    logging.warning(f"Could not write {target}: {e}")
+    return written
+
+
+def accepted_encodings(header: str) -> set:
+    """Parses an Accept-Encoding header, ignoring encodings refused with q=0."""
+    encodings = set()
+    for part in header.split(','):
+        name, _, params = part.partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves a pre-compressed .br or .gz copy when the client accepts it,
+    marks hashed build assets as immutable and makes everything else revalidate.
+    The copies are made at startup in a cache directory, see default_cache_dir.
+    """
+
+    def __init__(self, *args, immutable_prefix='assets', cache_dir=None, **kwargs):
+        """:param cache_dir: where to keep the compressed copies, by default under the user's cache"""
+        super().__init__(*args, **kwargs)
+        self.immutable_prefix = immutable_prefix + os.sep
+        self.cache_dir = None
+        if self.directory is not None and os.path.isdir(self.directory):
+            self.cache_dir = cache_dir or default_cache_dir(self.directory)
+            written = precompress_directory(self.directory, self.cache_dir)
+            if written:
+                logging.info(f"Pre-compressed {written} static files from {self.directory} into {self.cache_dir}")
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        relative_path = os.path.relpath(full_path, self.directory) if self.directory else ''
+        headers = {
+            'cache-control': IMMUTABLE_CACHE if relative_path.startswith(self.immutable_prefix) else REVALIDATE_CACHE,
+            'vary': 'Accept-Encoding',
+        }
+        media_type = mimetypes.guess_type(str(full_path))[0] or 'text/plain'
+
+        response = None
+        accepted = accepted_encodings(request_headers.get('accept-encoding', ''))
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if encoding not in accepted or self.cache_dir is None:
+                continue
+            compressed = os.path.join(self.cache_dir, relative_path + suffix)
+            try:
+                compressed_stat = os.stat(compressed)
+            except OSError:
+                continue
+            if compressed_stat.st_mtime < stat_result.st_mtime:
+                continue  # the file changed since it was compressed
+            response = FileResponse(
+                compressed, status_code=status_code, stat_result=compressed_stat,
+                media_type=media_type, headers={**headers, 'content-encoding': encoding},
+            )
+            break
+
+        if response is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result,
+                                    media_type=media_type, headers=headers)
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
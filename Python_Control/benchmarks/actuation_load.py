@@ -0,0 +1,117 @@
+"""
+Throughput test for concurrent auto tracking (actuation.py).
+
+Starts simulated cameras, an ActuationPool driving all of them and feeds every camera auto-tracking
+commands at a fixed rate, the way an external tracker posting to /api/autotrack/commands would.
+Reports, per camera, the VISCA commands the simulator received, what the mixer sent and suppressed,
+worker overruns, and the process CPU time spent.
+
+Run from Python_Control:
+    python -m benchmarks.actuation_load --cameras 15 --rate 30
+"""
+import argparse
+import json
+import math
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from actuation import ActuationPool
+from shared_state import SharedState
+from ViscaOverIP.simulator import start_simulators
+
+
+def build_state(num_cameras, base_ip):
+    simulators = start_simulators(num_cameras, base_ip)
+    config = {'cameras': [{'ip': sim.address[0], 'color': [255, 0, 0]} for sim in simulators]}
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(config, f)
+    try:
+        state = SharedState(config_file=f.name)
+    finally:
+        os.unlink(f.name)
+    state.set_controller(SimpleNamespace(inputCtrl=SimpleNamespace(auto_tracking_active=True)))
+    state.connect_to_camera(0)
+    return state, simulators
+
+
+def run(num_cameras, rate, duration, tick_rate, base_ip):
+    state, simulators = build_state(num_cameras, base_ip)
+    pool = ActuationPool(state, rate=tick_rate)
+    pool.start()
+    state.set_actuation(pool)
+
+    interval = 1.0 / rate
+    fed = 0
+    cpu_started = time.process_time()
+    started = time.monotonic()
+    tick = 0
+    while time.monotonic() - started < duration:
+        t = tick * interval
+        for index in range(num_cameras):
+            # Smooth, fractional speeds with a per-camera phase, like a tracker following a person
+            pan = 6.0 * math.sin(t * 0.8 + index)
+            tilt = 2.5 * math.sin(t * 0.5 + index * 0.7)
+            state.update_auto_tracking_command(index, pan, tilt)
+            fed += 1
+        tick += 1
+        time.sleep(max(0.0, started + tick * interval - time.monotonic()))
+    elapsed = time.monotonic() - started
+    cpu = time.process_time() - cpu_started
+
+    stats = pool.stats()
+    pool.stop()
+    state.camera_pool.close_all()
+    for sim in simulators:
+        sim.stop()
+
+    cameras = []
+    for index, sim in enumerate(simulators):
+        s = stats.get(index, {})
+        cameras.append({
+            'index': index,
+            'received': sim.commands,
+            'buffer_full': sim.buffer_full,
+            'sent': s.get('commands_sent', 0),
+            'suppressed': s.get('commands_suppressed', 0),
+            'errors': s.get('send_errors', 0),
+            'ticks': s.get('ticks', 0),
+            'overruns': s.get('overruns', 0),
+        })
+    return {
+        'cameras': num_cameras,
+        'rate_hz': rate,
+        'tick_rate_hz': tick_rate,
+        'duration_s': elapsed,
+        'commands_fed': fed,
+        'cpu_s': cpu,
+        'cpu_percent': cpu / elapsed * 100,
+        'per_camera': cameras,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cameras', type=int, default=15)
+    parser.add_argument('--rate', type=float, default=30.0, help='auto-tracking commands per second per camera')
+    parser.add_argument('--tick-rate', type=float, default=100.0, help='actuation ticks per second per camera')
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--base-ip', default='127.0.0.2', help='first loopback address for simulated cameras')
+    parser.add_argument('--output', help='write machine-readable results to this JSON file')
+    args = parser.parse_args()
+
+    result = run(args.cameras, args.rate, args.duration, args.tick_rate, args.base_ip)
+    print(f"{result['cameras']} cameras at {result['rate_hz']:g} Hz for {result['duration_s']:.1f} s: "
+          f"{result['commands_fed']} commands fed, CPU {result['cpu_s']:.2f} s ({result['cpu_percent']:.1f}%)")
+    print(f"{'cam':>4} {'received':>9} {'sent':>6} {'suppr':>6} {'errors':>6} {'busy':>5} {'ticks':>6} {'overrun':>7}")
+    for c in result['per_camera']:
+        print(f"{c['index']:>4} {c['received']:>9} {c['sent']:>6} {c['suppressed']:>6} {c['errors']:>6} "
+              f"{c['buffer_full']:>5} {c['ticks']:>6} {c['overruns']:>7}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
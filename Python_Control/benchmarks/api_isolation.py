@@ -0,0 +1,211 @@
+"""
+Joystick latency while the API is busy, with the API in a thread of the control process (as it
+always was) and in a process of its own (api/process.py, config "api": {"process": true}).
+
+Each run puts the threaded control stack of main.py (see reactor_vs_threads.build) in a fresh
+process, driven by a keyboard emulator (keyboard_emulator.py) on a pty and talking to simulated
+cameras (ViscaOverIP/simulator.py), and serves the API from it. With --clients above 0 a load
+generator process keeps that many keep-alive connections busy with a mix of requests: config and
+telemetry reads, the frontend's index.html and auto-tracking command posts for the cameras the
+joystick isn't on.
+
+Reports latency from a joystick frame being parsed to the first motion command it caused leaving
+for the camera, the control process's CPU time, and requests the API answered per second.
+
+Run from Python_Control:
+    python -m benchmarks.api_isolation --duration 10 --clients 8
+"""
+import argparse
+import http.client
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from api.api import API
+from api.process import APIProcess
+from benchmarks.reactor_vs_threads import FrameHook, build, process_controls
+from benchmarks.session_replay import WireProbe
+
+PORT = 9100
+
+
+class SelectedCameraProbe(WireProbe):
+    """Only the joystick's camera decides whether an input was a duplicate; auto-tracking posts keep
+    the other cameras' mixers busy."""
+
+    def _suppressed(self):
+        return self.state.get_mixer(self.state.current_camera_index).commands_suppressed
+
+
+def run_design(design, device, args) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        state, controller, health, actuation = build(directory, device, args, None)
+        probe = SelectedCameraProbe(state)
+        state.camera_pool.set_recorder(probe)
+        hook = FrameHook(probe, controller.inputCtrl)
+        controller.inputCtrl.recorder = hook
+        if design == 'process':
+            api = APIProcess(state, host='127.0.0.1', port=args.port)
+        else:
+            api = API(host='127.0.0.1', port=args.port, controller=controller, shared_state=state)
+        api.start()
+
+        stop = threading.Event()
+
+        def loop():
+            while not stop.is_set():
+                process_controls(state, controller.inputCtrl, lambda function, *a: function(*a))
+                time.sleep(0.005)
+
+        threading.Thread(target=loop, daemon=True, name='main-loop').start()
+
+        time.sleep(args.warmup)
+        probe.latencies.clear()
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_before = time.process_time()
+        started = time.monotonic()
+        time.sleep(args.duration)
+        elapsed = time.monotonic() - started
+        cpu = time.process_time() - cpu_before
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        latencies = sorted(probe.latencies)
+        stop.set()
+        api.stop()
+
+    def percentile(q):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000 if latencies else None
+
+    return {
+        'design': design,
+        'duration_s': elapsed,
+        'cpu_percent': cpu / elapsed * 100,
+        'involuntary_switches': usage.ru_nivcsw - usage_before.ru_nivcsw,
+        'latency_samples': len(latencies),
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'p99_ms': percentile(0.99),
+        'max_ms': latencies[-1] * 1000 if latencies else None,
+    }
+
+
+def generate_load(args):
+    """Keeps `args.clients` connections busy until killed, printing requests answered per second."""
+    autotrack = json.dumps({'commands': [{'camera_index': index, 'pan_speed': 3.0, 'tilt_speed': -1.5}
+                                         for index in range(1, args.cameras)]})
+    requests = [('GET', '/api/config', None), ('GET', '/api/link/stats', None), ('GET', '/api/motion/stats', None),
+                ('GET', '/', None), ('POST', '/api/autotrack/commands', autotrack)]
+    answered = [0]
+    lock = threading.Lock()
+
+    def client(offset):
+        connection = None
+        n = offset
+        while True:
+            method, path, body = requests[n % len(requests)]
+            n += 1
+            try:
+                if connection is None:
+                    connection = http.client.HTTPConnection('127.0.0.1', args.port, timeout=10)
+                headers = {'Content-Type': 'application/json'} if body else {}
+                connection.request(method, path, body, headers)
+                connection.getresponse().read()
+                with lock:
+                    answered[0] += 1
+            except (OSError, http.client.HTTPException):
+                connection = None
+                time.sleep(0.1)
+
+    for offset in range(args.clients):
+        threading.Thread(target=client, args=(offset,), daemon=True).start()
+    while True:
+        before = answered[0]
+        time.sleep(1.0)
+        print(answered[0] - before, flush=True)
+
+
+def run_child(design, args) -> dict:
+    """Runs one design in a fresh process against a fresh emulator, cameras and load."""
+    simulators = subprocess.Popen([sys.executable, '-m', 'ViscaOverIP.simulator', '--count', str(args.cameras),
+                                   '--latency', str(args.latency)],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    emulator = subprocess.Popen([sys.executable, '-m', 'keyboard_emulator', '--profile', 'random',
+                                 '--rate', str(args.rate), '--seed', str(args.seed), '--cameras', str(args.cameras),
+                                 '--camera-every', '0'],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    load = None
+    try:
+        device = emulator.stdout.readline().split()[-1]
+        time.sleep(0.5)  # let the simulators bind
+        child = subprocess.Popen([sys.executable, '-m', 'benchmarks.api_isolation', '--design', design,
+                                  '--device', device, '--cameras', str(args.cameras), '--duration', str(args.duration),
+                                  '--warmup', str(args.warmup), '--port', str(args.port)],
+                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        rates = []
+        if args.clients:
+            load = subprocess.Popen([sys.executable, '-m', 'benchmarks.api_isolation', '--load', '--clients',
+                                     str(args.clients), '--cameras', str(args.cameras), '--port', str(args.port)],
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            threading.Thread(target=lambda: rates.extend(int(line) for line in load.stdout), daemon=True).start()
+        out, err = child.communicate()
+        if child.returncode != 0:
+            raise RuntimeError(f'{design} run failed:\n{err[-2000:]}')
+        result = json.loads(out.strip().splitlines()[-1])
+        measured = rates[int(args.warmup):int(args.warmup + args.duration)]
+        result['clients'] = args.clients
+        result['requests_per_s'] = statistics.mean(measured) if measured else 0.0
+        return result
+    finally:
+        for process in (load, emulator, simulators):
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds measured per run')
+    parser.add_argument('--warmup', type=float, default=3.0, help='seconds run before measuring')
+    parser.add_argument('--cameras', type=int, default=3)
+    parser.add_argument('--clients', type=int, default=8, help='concurrent API connections, 0 for no load')
+    parser.add_argument('--rate', type=float, default=500.0, help='emulated firmware loops per second')
+    parser.add_argument('--latency', type=float, default=0.001, help='simulated camera reply latency in seconds')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--port', type=int, default=PORT, help='port to serve the API on')
+    parser.add_argument('--output', help='write machine-readable results to this JSON file')
+    parser.add_argument('--design', choices=['thread', 'process'], help=argparse.SUPPRESS)  # child process
+    parser.add_argument('--device', help=argparse.SUPPRESS)
+    parser.add_argument('--load', action='store_true', help=argparse.SUPPRESS)  # load generator process
+    args = parser.parse_args()
+
+    if args.load:
+        generate_load(args)
+        return
+    if args.design:
+        print(json.dumps(run_design(args.design, args.device, args)), flush=True)
+        os._exit(0)  # the API and the LED animation threads never end
+
+    loads = sorted({0, args.clients})
+    results = []
+    for clients in loads:
+        for design in ('thread', 'process'):
+            results.append(run_child(design, argparse.Namespace(**{**vars(args), 'clients': clients})))
+    print(f"{args.duration:g} s per run, {args.cameras} cameras, keyboard at {args.rate:g} loops/s")
+    print(f"{'API in':>8} {'clients':>7} {'req/s':>7} {'CPU %':>6} {'invol cs':>8} {'p50 ms':>7} {'p99 ms':>7} "
+          f"{'max ms':>7}")
+    for r in results:
+        def ms(value):
+            return f"{value:>7.2f}" if value is not None else f"{'n/a':>7}"
+        print(f"{r['design']:>8} {r['clients']:>7} {r['requests_per_s']:>7.0f} {r['cpu_percent']:>6.1f} "
+              f"{r['involuntary_switches']:>8} {ms(r['p50_ms'])} {ms(r['p99_ms'])} {ms(r['max_ms'])}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
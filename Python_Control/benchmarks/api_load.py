@@ -0,0 +1,172 @@
+"""
+In-process load test for the FastAPI app in api/api.py.
+
+Drives the app through httpx's ASGI transport (no sockets, no uvicorn) with a stub keyboard
+controller and a real SharedState connected to simulated cameras. Each scenario sends requests to
+one endpoint at a fixed rate and reports p50/p99 latency and achieved throughput.
+
+Run from Python_Control:
+    python -m benchmarks.api_load --output results.json
+    python -m benchmarks.api_load --compare results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from types import SimpleNamespace
+
+import httpx
+
+from api.api import API
+from shared_state import SharedState
+from ViscaOverIP.simulator import start_simulators
+
+ENDPOINTS = ('autotrack_commands', 'autotrack_status', 'config', 'cameras')
+
+
+def make_stub_controller():
+    """Just enough of AutotrackerKeyboard.Controller for the API and SharedState."""
+    return SimpleNamespace(
+        inputCtrl=SimpleNamespace(auto_tracking_active=True, auto_tracking_changed=False),
+    )
+
+
+def build_state(num_cameras, base_ip):
+    simulators = start_simulators(num_cameras, base_ip)
+    config = {'cameras': [{'ip': sim.address[0], 'color': [255, 0, 0]} for sim in simulators]}
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(config, f)
+    try:
+        state = SharedState(config_file=f.name)
+    finally:
+        os.unlink(f.name)
+    state.set_controller(make_stub_controller())
+    state.connect_to_camera(0)
+    return state, simulators
+
+
+def make_request(endpoint, num_cameras, tick):
+    if endpoint == 'autotrack_commands':
+        commands = [{'camera_index': i, 'pan_speed': (tick % 48) / 2 - 12, 'tilt_speed': 1.5}
+                    for i in range(num_cameras)]
+        return 'POST', '/api/autotrack/commands', {'json': {'commands': commands}}
+    if endpoint == 'autotrack_status':
+        return 'GET', '/api/autotrack/status', {}
+    if endpoint == 'config':
+        return 'GET', '/api/config', {}
+    return 'GET', '/api/cameras', {}
+
+
+async def run_scenario(client, endpoint, rate, num_cameras, duration):
+    """Issues requests open-loop at `rate` Hz for `duration` seconds."""
+    latencies = []
+    errors = 0
+    interval = 1.0 / rate
+
+    async def one(tick):
+        nonlocal errors
+        method, url, kwargs = make_request(endpoint, num_cameras, tick)
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            errors += 1
+
+    tasks = []
+    started = time.perf_counter()
+    tick = 0
+    while time.perf_counter() - started < duration:
+        tasks.append(asyncio.create_task(one(tick)))
+        tick += 1
+        await asyncio.sleep(max(0.0, started + tick * interval - time.perf_counter()))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'endpoint': endpoint,
+        'rate_hz': rate,
+        'cameras': num_cameras,
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'max_ms': latencies[-1] * 1000,
+    }
+
+
+async def run_all(args):
+    results = []
+    for num_cameras in args.cameras:
+        state, simulators = build_state(num_cameras, args.base_ip)
+        api = API(controller=state.controller, shared_state=state)
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            for endpoint in args.endpoints:
+                for rate in args.rates:
+                    result = await run_scenario(client, endpoint, rate, num_cameras, args.duration)
+                    results.append(result)
+                    print(f"{endpoint:>20} {rate:>4} Hz {num_cameras:>3} cams  "
+                          f"p50 {result['p50_ms']:7.3f} ms  p99 {result['p99_ms']:7.3f} ms  "
+                          f"{result['throughput_rps']:7.1f} req/s  errors {result['errors']}")
+        state.camera_pool.close_all()
+        for sim in simulators:
+            sim.stop()
+    return results
+
+
+def describe_environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r['endpoint'], r['rate_hz'], r['cameras']): r for r in json.load(f)['results']}
+    print(f"\nCompared with {baseline_path}:")
+    for r in results:
+        before = baseline.get((r['endpoint'], r['rate_hz'], r['cameras']))
+        if before is None:
+            continue
+        print(f"{r['endpoint']:>20} {r['rate_hz']:>4} Hz {r['cameras']:>3} cams  "
+              f"p50 {r['p50_ms'] - before['p50_ms']:+7.3f} ms  p99 {r['p99_ms'] - before['p99_ms']:+7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rates', type=int, nargs='+', default=[30, 60, 120])
+    parser.add_argument('--cameras', type=int, nargs='+', default=[1, 5, 15])
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--duration', type=float, default=3.0, help='seconds per scenario')
+    parser.add_argument('--base-ip', default='127.0.0.2', help='first loopback address for simulated cameras')
+    parser.add_argument('--output', help='write machine-readable results to this JSON file')
+    parser.add_argument('--compare', help='a previous --output file to compare against')
+    args = parser.parse_args()
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    results = asyncio.run(run_all(args))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': describe_environment(), 'results': results}, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
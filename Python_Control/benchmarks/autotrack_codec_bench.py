@@ -0,0 +1,103 @@
+"""
+Compares decode throughput of auto-tracking command batches: the JSON body validated with pydantic
+against the binary batch format from api.autotrack_codec.
+
+Run from Python_Control:  python -m benchmarks.autotrack_codec_bench [--json]
+"""
+import argparse
+import json
+import random
+import time
+
+from api.api import AutoTrackingCommands
+from api.autotrack_codec import decode_batch, encode_batch
+
+
+def make_commands(count):
+    return [
+        {
+            'camera_index': i % 15,
+            'pan_speed': random.uniform(-24, 24),
+            'tilt_speed': random.uniform(-24, 24),
+        }
+        for i in range(count)
+    ]
+
+
+def decode_json(body: bytes):
+    return AutoTrackingCommands.model_validate_json(body)
+
+
+def decode_binary(body: bytes):
+    return decode_batch(body)
+
+
+def apply_json(body: bytes):
+    """Decode plus the per-camera lookup the API performs when applying a batch"""
+    commands = decode_json(body)
+    return {cmd.camera_index: (cmd.pan_speed, cmd.tilt_speed) for cmd in commands.commands}
+
+
+def apply_binary(body: bytes):
+    records = decode_binary(body)
+    return dict(zip(records['camera_index'].tolist(),
+                    zip(records['pan_speed'].tolist(), records['tilt_speed'].tolist())))
+
+
+def measure(fn, body, min_time=0.5):
+    iterations = 0
+    started = time.perf_counter()
+    while True:
+        for _ in range(100):
+            fn(body)
+        iterations += 100
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            return iterations / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 15, 100, 1000])
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        commands = make_commands(size)
+        json_body = json.dumps({'commands': commands}).encode()
+        binary_body = encode_batch(
+            [c['camera_index'] for c in commands],
+            [c['pan_speed'] for c in commands],
+            [c['tilt_speed'] for c in commands],
+        )
+        json_rate = measure(decode_json, json_body)
+        binary_rate = measure(decode_binary, binary_body)
+        json_apply_rate = measure(apply_json, json_body)
+        binary_apply_rate = measure(apply_binary, binary_body)
+        results.append({
+            'records': size,
+            'json_bytes': len(json_body),
+            'binary_bytes': len(binary_body),
+            'json_decode_per_s': json_rate,
+            'binary_decode_per_s': binary_rate,
+            'decode_speedup': binary_rate / json_rate,
+            'json_apply_per_s': json_apply_rate,
+            'binary_apply_per_s': binary_apply_rate,
+            'apply_speedup': binary_apply_rate / json_apply_rate,
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'records':>8} {'json B':>8} {'bin B':>8} {'json dec/s':>12} {'bin dec/s':>12} {'speedup':>8} "
+          f"{'json app/s':>12} {'bin app/s':>12} {'speedup':>8}")
+    for r in results:
+        print(f"{r['records']:>8} {r['json_bytes']:>8} {r['binary_bytes']:>8} "
+              f"{r['json_decode_per_s']:>12.0f} {r['binary_decode_per_s']:>12.0f} {r['decode_speedup']:>7.1f}x "
+              f"{r['json_apply_per_s']:>12.0f} {r['binary_apply_per_s']:>12.0f} {r['apply_speedup']:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Throughput test for windowed command pipelining (ViscaOverIP/window.py).
+
+Starts one simulated camera and sends it a burst of pan/tilt and zoom drive commands, first one at a
+time through the normal send path (each command waits for its ACK), then through
+Camera.send_pipelined, which keeps an AIMD-sized window of commands in flight. Reports achieved
+commands per second, p50/p99/max latency from first send to completion, buffer-full refusals and
+where the window settled. The transport's per-lane rate caps are lifted so the transport itself
+is measured.
+
+Run from Python_Control:
+    python -m benchmarks.pipeline_throughput --commands 2000 --latency 0.002 --sockets 2
+"""
+import argparse
+import json
+import statistics
+import time
+
+from ViscaOverIP.camera import Camera
+from ViscaOverIP.command_handle import wait_all
+from ViscaOverIP.simulator import SimulatedCamera
+
+UNCAPPED = {'motion': None, 'configuration': None, 'inquiry': None}
+
+
+def commands(count):
+    """Alternating pan/tilt and zoom drives, like a busy operator."""
+    for i in range(count):
+        speed = i % 7 + 1
+        if i % 2:
+            yield f'06 01 {speed:02x} {speed:02x} 0{1 + i % 2} 03'
+        else:
+            yield f'04 07 2{speed:x}'
+
+
+def summarise(mode, handles, elapsed, camera, simulator):
+    latencies = sorted(h.completed_at - h.sent_at for h in handles if h.ok)
+    window = camera.window.stats()
+    return {
+        'mode': mode,
+        'commands': len(handles),
+        'completed': len(latencies),
+        'elapsed_s': elapsed,
+        'commands_per_s': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else None,
+        'max_ms': latencies[-1] * 1000 if latencies else None,
+        'buffer_full': simulator.buffer_full,
+        'window_size': window['size'] if mode == 'pipelined' else 1,
+    }
+
+
+def run_mode(mode, count, args):
+    simulator = SimulatedCamera(args.ip, latency=args.latency, loss=args.loss, sockets=args.sockets).start()
+    camera = Camera(args.ip, local_port=0, rate_caps=UNCAPPED)
+    camera.window.maximum = args.max_window
+    try:
+        started = time.monotonic()
+        handles = []
+        for command in commands(count):
+            if mode == 'serial':
+                handles.append(camera._send_command(command))
+            else:
+                handles.append(camera.send_pipelined(command))
+        if mode == 'serial':
+            wait_all(handles, timeout=1.0)
+        else:
+            camera.window.drain(timeout=1.0)
+        # Up to the last completion, so commands whose replies were lost don't count the wait for them
+        finished = [h.completed_at for h in handles if h.ok]
+        elapsed = (max(finished) if finished else time.monotonic()) - started
+        return summarise(mode, handles, elapsed, camera, simulator)
+    finally:
+        camera.close_connection()
+        simulator.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--commands', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.002, help='simulated reply latency in seconds')
+    parser.add_argument('--loss', type=float, default=0.0, help='probability of the simulator dropping a packet')
+    parser.add_argument('--sockets', type=int, default=2, help='command sockets in the simulated camera')
+    parser.add_argument('--max-window', type=float, default=16.0)
+    parser.add_argument('--ip', default='127.0.0.2')
+    parser.add_argument('--output', help='write machine-readable results to this JSON file')
+    args = parser.parse_args()
+
+    results = [run_mode(mode, args.commands, args) for mode in ('serial', 'pipelined')]
+    print(f"{args.commands} commands, {args.latency * 1000:g} ms latency, {args.sockets} sockets")
+    print(f"{'mode':>10} {'cmd/s':>8} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7} {'full':>5} {'window':>6}")
+    for r in results:
+        print(f"{r['mode']:>10} {r['commands_per_s']:>8.0f} {r['p50_ms']:>7.2f} {r['p99_ms']:>7.2f} "
+              f"{r['max_ms']:>7.2f} {r['buffer_full']:>5} {r['window_size']:>6}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+Compares the thread-per-task control stack with the single I/O reactor (io_reactor.py).
+
+Both designs run the same thing for the same time: a keyboard emulator (keyboard_emulator.py) on a
+pty playing a seeded random joystick profile, simulated cameras (ViscaOverIP/simulator.py), LED
+frames, the health monitor, actuation for every camera and main.py's control pass. The emulator and
+the cameras run in processes of their own and each design in a fresh process, so the CPU time and
+context switches reported are the control stack's alone.
+
+Reports CPU time, voluntary and involuntary context switches, threads, serial frames handled and
+latency from a frame moving an axis being parsed to the first motion command it caused leaving for
+the camera.
+
+Run from Python_Control:
+    python -m benchmarks.reactor_vs_threads --duration 10 --cameras 3 --rate 500
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import AutotrackerKeyboard
+from actuation import ActuationPool
+from benchmarks.session_replay import WireProbe
+from health_monitor import HealthMonitor
+from io_reactor import Reactor
+from led_state_manager import LedStateManager
+from shared_state import SharedState
+
+
+class FrameHook:
+    """Stands in for a SessionRecorder on the inputController: counts frames and starts timing the
+    ones that move an axis. The firmware's "ok" for each LED frame doesn't count, and frames that
+    leave pan, tilt and zoom as they were (resends, the dead zone, buttons) aren't timed, as nothing
+    on the wire follows them."""
+
+    def __init__(self, probe, controls):
+        self.probe = probe
+        self.controls = controls
+        self.frames = 0
+        self.oks = 0
+        self._timed = None  # pan, tilt and zoom before the frame this started timing
+
+    def _axes(self):
+        return self.controls.pan, self.controls.tilt, self.controls.zoom
+
+    def serial_frame(self, fields, keyboard=0):
+        if fields == [b'ok']:
+            self.oks += 1
+            return
+        self.frames += 1
+        # The previous frame has been processed by now
+        if self._timed is not None and self._axes() == self._timed:
+            self.probe.forget()
+        self._timed = None
+        self.probe.settle()
+        if len(fields) == 2 and self.probe.input():
+            self._timed = self._axes()
+
+
+def build(directory, device, args, reactor):
+    """The control stack of main.py, on `reactor` or on threads if it is None."""
+    config_file = os.path.join(directory, 'config.json')
+    cameras = [{'ip': f'127.0.0.{2 + index}', 'color': [255, 0, 0]} for index in range(args.cameras)]
+    with open(config_file, 'w') as f:
+        json.dump({'cameras': cameras}, f)
+    state = SharedState(config_file=config_file)
+
+    cwd = os.getcwd()
+    os.chdir(directory)  # inputController reads ./config.json
+    try:
+        if reactor:
+            controller = AutotrackerKeyboard.ReactorController(device, reactor)
+        else:
+            controller = AutotrackerKeyboard.Controller(device)
+    finally:
+        os.chdir(cwd)
+    state.set_controller(controller)
+    led_manager = LedStateManager(controller.LED, state, controller.inputCtrl)
+    state.set_led_manager(led_manager)
+
+    health = HealthMonitor(state)
+    if reactor:
+        health.attach(reactor)
+    else:
+        health.start()
+    state.set_health_monitor(health)
+    state.connect_to_camera(0)
+    actuation = ActuationPool(state, reactor=reactor)
+    actuation.start()
+    state.set_actuation(actuation)
+    return state, controller, health, actuation
+
+
+def process_controls(state, controls, blocking):
+    """The part of main.py's control pass the keyboard exercises."""
+    if controls.camera_changed:
+        blocking(state.connect_to_camera, controls.selected_camera)
+        controls.camera_changed = False
+    state.update_joystick(controls.pan, controls.tilt, controls.zoom)
+    if controls.auto_tracking_changed or controls.vertical_lock_changed:
+        state.update_leds()
+        controls.auto_tracking_changed = controls.vertical_lock_changed = False
+
+
+def run_design(design, device, args) -> dict:
+    reactor = Reactor() if design == 'reactor' else None
+    with tempfile.TemporaryDirectory() as directory:
+        state, controller, health, actuation = build(directory, device, args, reactor)
+        probe = WireProbe(state)
+        state.camera_pool.set_recorder(probe)
+        hook = FrameHook(probe, controller.inputCtrl)
+        controller.inputCtrl.recorder = hook
+        stop = threading.Event()
+
+        if reactor:
+            def blocking(function, *a):
+                reactor.run_in_executor(function, *a)
+
+            controller.on_input = lambda: process_controls(state, controller.inputCtrl, blocking)
+            reactor.call_every(0.02, controller.on_input)
+            reactor.start()
+        else:
+            def loop():
+                while not stop.is_set():
+                    process_controls(state, controller.inputCtrl, lambda function, *a: function(*a))
+                    time.sleep(0.005)
+
+            threading.Thread(target=loop, daemon=True, name='main-loop').start()
+
+        time.sleep(args.warmup)
+        probe.latencies.clear()
+        frames_before, oks_before = hook.frames, hook.oks
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_before = time.process_time()
+        started = time.monotonic()
+        time.sleep(args.duration)
+        elapsed = time.monotonic() - started
+        cpu = time.process_time() - cpu_before
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        threads = threading.active_count()
+        latencies = sorted(probe.latencies)
+        frames = hook.frames - frames_before
+        led_frames = hook.oks - oks_before
+        motion = probe.motion
+        reactor_stats = reactor.stats() if reactor else None
+        stop.set()
+
+    def percentile(q):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000 if latencies else None
+
+    return {
+        'design': design,
+        'duration_s': elapsed,
+        'cpu_s': cpu,
+        'cpu_percent': cpu / elapsed * 100,
+        'voluntary_switches': usage.ru_nvcsw - usage_before.ru_nvcsw,
+        'involuntary_switches': usage.ru_nivcsw - usage_before.ru_nivcsw,
+        'threads': threads,
+        'serial_frames': frames,
+        'led_frames': led_frames,
+        'motion_commands': motion,
+        'latency_samples': len(latencies),
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'p99_ms': percentile(0.99),
+        'max_ms': latencies[-1] * 1000 if latencies else None,
+        'reactor': reactor_stats,
+    }
+
+
+def run_child(design, args) -> dict:
+    """Runs one design in a fresh process against a fresh emulator and cameras."""
+    simulators = subprocess.Popen([sys.executable, '-m', 'ViscaOverIP.simulator', '--count', str(args.cameras),
+                                   '--latency', str(args.latency)],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    emulator = subprocess.Popen([sys.executable, '-m', 'keyboard_emulator', '--profile', 'random',
+                                 '--rate', str(args.rate), '--seed', str(args.seed), '--cameras', str(args.cameras),
+                                 '--camera-every', str(args.camera_every)],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        device = emulator.stdout.readline().split()[-1]
+        time.sleep(0.5)  # let the simulators bind
+        child = subprocess.run([sys.executable, '-m', 'benchmarks.reactor_vs_threads', '--design', design,
+                                '--device', device, '--cameras', str(args.cameras), '--duration', str(args.duration),
+                                '--warmup', str(args.warmup)],
+                               capture_output=True, text=True)
+        if child.returncode != 0:
+            raise RuntimeError(f'{design} run failed:\n{child.stderr[-2000:]}')
+        return json.loads(child.stdout.strip().splitlines()[-1])
+    finally:
+        emulator.terminate()
+        simulators.terminate()
+        emulator.wait()
+        simulators.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds measured per design')
+    parser.add_argument('--warmup', type=float, default=2.0, help='seconds run before measuring')
+    parser.add_argument('--cameras', type=int, default=3)
+    parser.add_argument('--rate', type=float, default=500.0, help='emulated firmware loops per second')
+    parser.add_argument('--camera-every', type=float, default=3.0, help='mean seconds between camera switches')
+    parser.add_argument('--latency', type=float, default=0.001, help='simulated camera reply latency in seconds')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write machine-readable results to this JSON file')
+    parser.add_argument('--design', choices=['threads', 'reactor'], help=argparse.SUPPRESS)  # child process
+    parser.add_argument('--device', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.design:
+        print(json.dumps(run_design(args.design, args.device, args)), flush=True)
+        os._exit(0)  # LedController's animation thread never ends
+
+    results = [run_child(design, args) for design in ('threads', 'reactor')]
+    print(f"{args.duration:g} s per design, {args.cameras} cameras, keyboard at {args.rate:g} loops/s")
+    print(f"{'design':>8} {'CPU %':>6} {'vol cs':>7} {'invol cs':>8} {'threads':>7} {'frames':>7} {'LED':>6} "
+          f"{'p50 ms':>7} {'p99 ms':>7} {'max ms':>7}")
+    for r in results:
+        def ms(value):
+            return f"{value:>7.2f}" if value is not None else f"{'n/a':>7}"
+        print(f"{r['design']:>8} {r['cpu_percent']:>6.1f} {r['voluntary_switches']:>7} {r['involuntary_switches']:>8} "
+              f"{r['threads']:>7} {r['serial_frames']:>7} {r['led_frames']:>6} {ms(r['p50_ms'])} {ms(r['p99_ms'])} {ms(r['max_ms'])}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
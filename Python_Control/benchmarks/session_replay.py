@@ -0,0 +1,289 @@
+"""
+Replays a recorded session (session_recorder.py) through the real control stack.
+
+Serial frames go into inputController.processPacket and auto-tracking commands into
+SharedState.update_auto_tracking_command, in recorded order and at the recorded pace (or
+--speed times faster, or as fast as possible with --speed 0). Between them the main loop's work
+from main.py runs every --loop-interval of recorded time, so the same log always produces the same
+sequence of inputs. Every camera is a simulated one; joystick motion goes out the way main.py sends
+it, through SharedState.tick_motion, or through an ActuationPool with --actuation.
+
+Reports VISCA commands put on the wire, commands the mixers suppressed as duplicates, latency from
+an input to the first motion command it caused, and the process CPU time spent.
+
+Run from Python_Control:
+    python -m benchmarks.session_replay recordings/session.atrec --speed 4
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+from actuation import ActuationPool
+from inputControl import inputController
+from session_recorder import (AUTOTRACK, AUTOTRACK_COMMAND, SERIAL_FRAME, VISCA_RECEIVED, VISCA_SENT,
+                             log_files, read_records)
+from shared_state import SharedState
+from ViscaOverIP.lanes import lane_for
+from ViscaOverIP.simulator import start_simulators
+
+
+def load_session(path):
+    """The inputs of a session log, including the files it was rotated into, as (monotonic_ns, kind,
+    value) sorted by time, and how many cameras it involved. A file whose clock starts before the
+    previous one ended (an earlier session, e.g. before a reboot) is shifted to follow on from it."""
+    inputs = []
+    addresses = set()
+    cameras = 1
+    last = None
+    files = log_files(path)
+    if not files:
+        raise FileNotFoundError(path)
+    for record in (record for name in files for record in read_records(name)):
+        if record[0] == 'header':
+            shift = max(0, last - record[2]) if last is not None else 0
+            continue
+        timestamp, kind, aux, payload = record
+        timestamp += shift
+        last = timestamp if last is None else max(last, timestamp)
+        if kind == SERIAL_FRAME:
+            if aux == 0:  # the replay drives one keyboard, the main one
+                inputs.append((timestamp, kind, payload.split(b',')))
+        elif kind == AUTOTRACK_COMMAND:
+            inputs.append((timestamp, kind, (aux, *AUTOTRACK.unpack(payload))))
+            cameras = max(cameras, aux + 1)
+        elif kind in (VISCA_SENT, VISCA_RECEIVED):
+            addresses.add(payload[:4])
+    inputs.sort(key=lambda event: event[0])
+    return inputs, max(cameras, len(addresses))
+
+
+def is_motion(datagram: bytes) -> bool:
+    """Whether a datagram on the wire is a pan/tilt, zoom or focus drive, stop or preset recall."""
+    if datagram[:2] != b'\x01\x00' or datagram[9:10] != b'\x01':
+        return False
+    body = datagram[10:-1].hex()
+    return body != '0001' and lane_for(body) in ('stop', 'motion')
+
+
+class WireProbe:
+    """
+    Stands in for a SessionRecorder on every camera connection and times each input to the first
+    motion command that follows it. An input the mixers evaluate without sending anything was a
+    duplicate, and stops being timed.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.commands = 0
+        self.inquiries = 0
+        self.motion = 0
+        self.latencies = []
+        self._pending = None  # (perf_counter of the oldest untimed input, mixers' suppressed count then)
+        self._lock = threading.Lock()
+
+    def _suppressed(self):
+        return sum(mixer.commands_suppressed for mixer in list(self.state.mixers.values()))
+
+    def input(self) -> bool:
+        """Starts timing an input, unless an earlier one still is. :return: whether it started"""
+        with self._lock:
+            if self._pending is None:
+                self._pending = (time.perf_counter(), self._suppressed())
+                return True
+            return False
+
+    def settle(self):
+        """Forgets the pending input if the mixers have since dropped it as a duplicate."""
+        with self._lock:
+            if self._pending is not None and self._suppressed() != self._pending[1]:
+                self._pending = None
+
+    def forget(self):
+        """Stops timing the pending input, e.g. one that turned out not to change anything."""
+        with self._lock:
+            self._pending = None
+
+    def visca(self, sent, ip, datagram):
+        if not sent:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            if datagram[9:10] == b'\x09':
+                self.inquiries += 1
+            elif datagram[:2] == b'\x01\x00':
+                self.commands += 1
+            if is_motion(datagram):
+                self.motion += 1
+                if self._pending is not None:
+                    self.latencies.append(now - self._pending[0])
+                    self._pending = None
+
+
+class SessionReplay:
+    def __init__(self, path, cameras=None, speed=1.0, loop_interval=0.005, actuation=False, latency=0.0,
+                 base_ip='127.0.0.2'):
+        """:param path: a session log file
+        :param cameras: simulated cameras to start, by default as many as the session used
+        :param speed: replay speed relative to the recording; 0 replays as fast as possible
+        :param loop_interval: seconds of recorded time between runs of the main loop's work
+        :param actuation: drive the cameras through an ActuationPool instead of the main loop
+        :param latency: simulated camera reply latency in seconds
+        """
+        self.inputs, recorded_cameras = load_session(path)
+        self.cameras = cameras or recorded_cameras
+        self.speed = speed
+        self.loop_interval = loop_interval
+        self.actuation = actuation
+        self.latency = latency
+        self.base_ip = base_ip
+
+    def _build(self, directory):
+        simulators = start_simulators(self.cameras, self.base_ip, latency=self.latency)
+        config = {'cameras': [{'ip': sim.address[0], 'color': [255, 0, 0]} for sim in simulators]}
+        config_file = os.path.join(directory, 'config.json')
+        with open(config_file, 'w') as f:
+            json.dump(config, f)
+        state = SharedState(config_file=config_file)
+        cwd = os.getcwd()
+        os.chdir(directory)  # inputController reads ./config.json
+        try:
+            controls = inputController(None)
+        finally:
+            os.chdir(cwd)
+        state.set_controller(SimpleNamespace(inputCtrl=controls))
+        return state, controls, simulators
+
+    @staticmethod
+    def _main_loop(state, controls):
+        """The part of main.py's loop that turns keyboard state into camera commands."""
+        if controls.camera_changed:
+            state.connect_to_camera(controls.selected_camera)
+            controls.camera_changed = False
+        state.update_joystick(controls.pan, controls.tilt, controls.zoom)
+        if controls.home_short_release:
+            state.home_camera()
+            controls.home_short_release = False
+
+    def run(self) -> dict:
+        with tempfile.TemporaryDirectory() as directory:
+            state, controls, simulators = self._build(directory)
+            probe = WireProbe(state)
+            state.camera_pool.set_recorder(probe)
+            state.connect_to_camera(0)
+            pool = None
+            if self.actuation:
+                pool = ActuationPool(state)
+                pool.start()
+                state.set_actuation(pool)
+            try:
+                return self._replay(state, controls, probe, simulators)
+            finally:
+                if pool:
+                    pool.stop()
+                state.camera_pool.close_all()
+                for sim in simulators:
+                    sim.stop()
+
+    def _replay(self, state, controls, probe, simulators):
+        origin = self.inputs[0][0] if self.inputs else 0
+        end = self.inputs[-1][0] if self.inputs else 0
+        step = int(self.loop_interval * 1e9)
+        next_loop = origin
+        fed = {SERIAL_FRAME: 0, AUTOTRACK_COMMAND: 0}
+
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+
+        def wait_for(timestamp):
+            if self.speed:
+                delay = started + (timestamp - origin) / 1e9 / self.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+        for timestamp, kind, value in self.inputs:
+            while next_loop < timestamp:  # main loop runs due before this input
+                wait_for(next_loop)
+                self._main_loop(state, controls)
+                probe.settle()
+                next_loop += step
+            wait_for(timestamp)
+            probe.input()
+            if kind == SERIAL_FRAME:
+                controls.processPacket(value, None)
+            else:
+                state.update_auto_tracking_command(*value)
+            fed[kind] += 1
+        while next_loop <= end + step:  # let the last input reach the wire
+            wait_for(next_loop)
+            self._main_loop(state, controls)
+            probe.settle()
+            next_loop += step
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+
+        mixers = [mixer.stats() for mixer in state.mixers.values()]
+        latencies = sorted(probe.latencies)
+
+        def percentile(q):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000 if latencies else None
+
+        return {
+            'speed': self.speed,
+            'cameras': self.cameras,
+            'actuation': self.actuation,
+            'recorded_s': (end - origin) / 1e9,
+            'elapsed_s': elapsed,
+            'serial_frames': fed[SERIAL_FRAME],
+            'autotrack_commands': fed[AUTOTRACK_COMMAND],
+            'commands_sent': probe.commands,
+            'motion_commands_sent': probe.motion,
+            'inquiries_sent': probe.inquiries,
+            'received_by_cameras': sum(sim.commands for sim in simulators),
+            'duplicates_suppressed': sum(m['commands_suppressed'] for m in mixers),
+            'latency_samples': len(latencies),
+            'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+            'p90_ms': percentile(0.9),
+            'p99_ms': percentile(0.99),
+            'max_ms': latencies[-1] * 1000 if latencies else None,
+            'cpu_s': cpu,
+            'cpu_percent': cpu / elapsed * 100 if elapsed else None,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='a session log file, e.g. recordings/session.atrec')
+    parser.add_argument('--speed', type=float, default=1.0, help='times the recorded pace, 0 for flat out')
+    parser.add_argument('--cameras', type=int, help='simulated cameras, by default as many as were recorded')
+    parser.add_argument('--loop-interval', type=float, default=0.005, help="main loop period in seconds")
+    parser.add_argument('--actuation', action='store_true', help='drive the cameras through an ActuationPool')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated reply latency in seconds')
+    parser.add_argument('--base-ip', default='127.0.0.2', help='first loopback address for simulated cameras')
+    parser.add_argument('--output', help='write machine-readable results to this JSON file')
+    args = parser.parse_args()
+
+    result = SessionReplay(args.path, args.cameras, args.speed, args.loop_interval, args.actuation, args.latency,
+                           args.base_ip).run()
+
+    def ms(value):
+        return 'n/a' if value is None else f'{value:.2f}'
+
+    print(f"{result['serial_frames']} serial frames and {result['autotrack_commands']} auto-tracking commands, "
+          f"{result['recorded_s']:.1f} s recorded, replayed in {result['elapsed_s']:.1f} s")
+    print(f"commands sent {result['commands_sent']} ({result['motion_commands_sent']} motion), "
+          f"inquiries {result['inquiries_sent']}, duplicates suppressed {result['duplicates_suppressed']}")
+    print(f"input to wire: p50 {ms(result['p50_ms'])} ms, p90 {ms(result['p90_ms'])} ms, "
+          f"p99 {ms(result['p99_ms'])} ms, max {ms(result['max_ms'])} ms ({result['latency_samples']} samples)")
+    print(f"CPU {result['cpu_s']:.2f} s ({result['cpu_percent']:.1f}%)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import inspect
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock
+from typing import Callable, Dict, Optional
+
+from ViscaOverIP.camera import Camera
+
+# Commands that can be fanned out to several cameras at once. Each takes the camera and the
+# request's positional arguments.
+BROADCAST_ACTIONS: Dict[str, Callable] = {
+    'recall_preset': lambda cam, preset_num: cam.recall_preset(int(preset_num)),
+    'save_preset': lambda cam, preset_num: cam.save_preset(int(preset_num)),
+    'home': lambda cam: cam.home(),
+    'pantilt_home': lambda cam: cam.pantilt_home(),
+    'zoom_to': lambda cam, position: cam.zoom_to(float(position)),
+    'stop': lambda cam: (cam.pantilt(0, 0), cam.zoom(0)),
+    'power': lambda cam, power_state: cam.set_power(bool(power_state)),
+}
+
+
+class CameraPool:
+    """
+    Keeps one VISCA connection per camera so several cameras can be driven at the same time.
+    Connections bind an ephemeral local port, so they don't compete for 52381 like a lone Camera does.
+    """
+
+    def __init__(self, max_workers=15):
+        self._cameras: Dict[str, Camera] = {}
+        self._connect_locks: Dict[str, Lock] = {}
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='camera-pool')
+        self.recorder = None  # handed to every connection, see set_recorder()
+
+    def get(self, ip: str) -> Camera:
+        """Returns the connection to the camera at `ip`, connecting first if necessary."""
+        with self._lock:
+            camera = self._cameras.get(ip)
+            if camera is not None:
+                return camera
+            connect_lock = self._connect_locks.setdefault(ip, Lock())
+
+        # Connect outside the pool lock so a slow camera doesn't hold up the others
+        with connect_lock:
+            with self._lock:
+                camera = self._cameras.get(ip)
+            if camera is None:
+                camera = Camera(ip, local_port=0, recorder=self.recorder)
+                with self._lock:
+                    self._cameras[ip] = camera
+            return camera
+
+    def discard(self, ip: str):
+        """Closes and forgets the connection to a camera, e.g. after it stopped responding."""
+        with self._lock:
+            camera = self._cameras.pop(ip, None)
+        if camera is not None:
+            camera.close_connection()
+
+    def connected(self) -> Dict[str, Camera]:
+        """The cameras connected right now, by IP. Never connects to anything."""
+        with self._lock:
+            return dict(self._cameras)
+
+    def set_recorder(self, recorder):
+        """Records the VISCA traffic of every connection, current and future, with `recorder` (None to stop)."""
+        with self._lock:
+            self.recorder = recorder
+            for camera in self._cameras.values():
+                camera.recorder = recorder
+
+    def close_all(self):
+        with self._lock:
+            cameras = list(self._cameras.values())
+            self._cameras.clear()
+        for camera in cameras:
+            camera.close_connection()
+
+    def broadcast(self, targets: Dict[int, str], action: str, args=(), timeout: Optional[float] = 10.0) -> dict:
+        """Runs one action on several cameras concurrently.
+
+        :param targets: {camera_index: ip} of the cameras to act on
+        :param action: one of BROADCAST_ACTIONS
+        :param args: positional arguments for the action
+        :param timeout: seconds to wait for the slowest camera
+        :return: {camera_index: {'ip', 'ok', 'error', 'elapsed_ms'}}
+        :raises ValueError: if the action is unknown or doesn't take these arguments
+        """
+        if action not in BROADCAST_ACTIONS:
+            raise ValueError(f'"{action}" is not a valid action. Valid actions: {", ".join(BROADCAST_ACTIONS)}')
+        run = BROADCAST_ACTIONS[action]
+        # Check the arguments once here, rather than have every camera fail with the same TypeError
+        signature = inspect.signature(run)
+        try:
+            signature.bind(None, *args)
+        except TypeError:
+            parameters = list(signature.parameters)[1:]
+            raise ValueError(f'"{action}" takes {len(parameters)} argument(s) ({", ".join(parameters) or "none"}), '
+                             f'got {len(args)}')
+
+        def execute(ip):
+            started = time.perf_counter()
+            run(self.get(ip), *args)
+            return (time.perf_counter() - started) * 1000
+
+        futures = {index: self._executor.submit(execute, ip) for index, ip in targets.items()}
+        wait(futures.values(), timeout=timeout)
+
+        results = {}
+        for index, future in futures.items():
+            outcome = {'ip': targets[index], 'ok': False, 'error': None, 'elapsed_ms': None}
+            if not future.done():
+                outcome['error'] = 'Timed out'
+            elif future.exception() is not None:
+                outcome['error'] = str(future.exception())
+                logging.error(f"Broadcast {action} failed on camera {index} ({targets[index]}): {outcome['error']}")
+            else:
+                outcome['ok'] = True
+                outcome['elapsed_ms'] = future.result()
+            results[index] = outcome
+        return results
@@ -1,5 +1,6 @@
 from AutotrackerKeyboard import Controller
 from ViscaOverIP.camera import Camera
+from camera_pool import CameraPool
 import json
 
 class SystemState:
@@ -8,6 +9,7 @@ class SystemState:
         self.current_camera_index = 0
         self.cameras = []
         self.cam = None
+        self.camera_pool = CameraPool()
         self.load_config()
 
     def load_config(self):
@@ -49,6 +51,16 @@ class SystemState:
         if self.cam:
             self.cam.save_preset(preset_number)
 
+    def broadcast(self, action, args=(), camera_indices=None):
+        """Run one command on several cameras (all of them by default) at the same time"""
+        if camera_indices is None:
+            camera_indices = range(len(self.cameras))
+        invalid = [index for index in camera_indices if not 0 <= index < len(self.cameras)]
+        if invalid:
+            raise ValueError(f'Unknown camera indices: {invalid}')
+        targets = {index: self.cameras[index]['ip'] for index in camera_indices}
+        return self.camera_pool.broadcast(targets, action, args)
+
     def get_current_camera(self):
         """Get the current camera information"""
         if self.cam:
@@ -64,5 +76,4 @@ class SystemState:
 
     def update_led(self, x, y, rgb):
         """Update a specific LED's color"""
-        self.controller.LED.update(x, y, rgb)
-        self.controller.LED.show()  # Apply the change
+        self.controller.LED.update(x, y, rgb)  # the LED thread sends it
@@ -0,0 +1,328 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+# OpenCV is only needed when the server-side detector is enabled
+try:
+    import cv2
+except ImportError:  # pragma: no cover - optional dependency
+    cv2 = None
+
+Box = Tuple[int, int, int, int, float]  # x, y, width, height, confidence
+
+_hog = None
+
+
+def _init_worker():
+    """Builds the person detector once per worker process."""
+    global _hog
+    cv2.setNumThreads(1)  # parallelism comes from the pool, not from OpenCV
+    _hog = cv2.HOGDescriptor()
+    _hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+
+def _detect_people(frame) -> List[Box]:
+    """Runs the HOG person detector on a (downscaled) frame inside a worker process."""
+    rects, weights = _hog.detectMultiScale(frame, winStride=(8, 8), padding=(8, 8), scale=1.05)
+    return [
+        (int(x), int(y), int(w), int(h), float(score))
+        for (x, y, w, h), score in zip(rects, weights.ravel() if len(weights) else [])
+    ]
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.processed = 0
+        self.dropped = 0
+        self.total_latency = 0.0
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+
+    def record(self, latency=0.0):
+        with self._lock:
+            self.processed += 1
+            self.total_latency += latency
+
+    def drop(self):
+        with self._lock:
+            self.dropped += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            elapsed = max(time.monotonic() - self._started, 1e-9)
+            return {
+                'processed': self.processed,
+                'dropped': self.dropped,
+                'fps': self.processed / elapsed,
+                'avg_latency_ms': (self.total_latency / self.processed * 1000) if self.processed else 0.0,
+            }
+
+
+class PersonTracker:
+    """Turns person boxes into pan/tilt speeds, using the same sign conventions as the dashboard tracker:
+    positive pan_speed when the subject is right of centre, positive tilt_speed when it is below centre.
+    """
+
+    def __init__(self, dead_zone=0.15, gain=1.5, max_speed=24, hold_time=0.4):
+        self.dead_zone = dead_zone
+        self.gain = gain
+        self.max_speed = max_speed
+        self.hold_time = hold_time
+        self.last_center = None
+        self.last_seen = None
+
+    def _select(self, boxes: List[Box]) -> Tuple[float, float]:
+        centers = [(x + w / 2, y + h * 0.3) for x, y, w, h, _ in boxes]  # aim at the upper body
+        if self.last_center is None:
+            best = max(range(len(boxes)), key=lambda i: boxes[i][4])
+        else:
+            lx, ly = self.last_center
+            best = min(range(len(centers)), key=lambda i: (centers[i][0] - lx) ** 2 + (centers[i][1] - ly) ** 2)
+        return centers[best]
+
+    def _axis_speed(self, error: float) -> float:
+        if abs(error) <= self.dead_zone:
+            return 0.0
+        error -= self.dead_zone if error > 0 else -self.dead_zone
+        speed = error / (1 - self.dead_zone) * self.gain * self.max_speed
+        return max(-self.max_speed, min(self.max_speed, speed))
+
+    def update(self, boxes: List[Box], width: int, height: int, now: float) -> Optional[Tuple[float, float]]:
+        """:return: (pan_speed, tilt_speed), or None while holding position after losing the subject"""
+        if not boxes:
+            if self.last_seen is not None and now - self.last_seen < self.hold_time:
+                return None
+            self.last_center = None
+            return 0.0, 0.0
+
+        cx, cy = self._select(boxes)
+        self.last_center = (cx, cy)
+        self.last_seen = now
+        return self._axis_speed(cx / width * 2 - 1), self._axis_speed(cy / height * 2 - 1)
+
+
+class DetectionService:
+    """
+    Reads frames from a capture device or video file, runs a CPU person detector in a process pool
+    and feeds the resulting speeds into SharedState's auto-tracking commands.
+
+    Frames flow capture -> detect -> track through bounded queues. When detection falls behind, the
+    oldest queued frame is dropped so tracking always works on the most recent picture.
+    """
+
+    def __init__(self, source, shared_state=None, camera_index=0, workers=2, detect_width=320,
+                 queue_size=2, realtime=None):
+        """:param source: a capture device index (or a string of digits) or a path to a video file
+        :param shared_state: the SharedState to feed. If None, detections are only counted.
+        :param camera_index: the configured camera the detections steer
+        :param workers: number of detector processes
+        :param detect_width: frames are downscaled to this width before detection
+        :param queue_size: maximum number of frames waiting for a detector
+        :param realtime: pace video files at their native frame rate. Defaults to True for files;
+            capture devices are always real time.
+        """
+        if cv2 is None:
+            raise RuntimeError('opencv-python-headless is required for server-side detection')
+
+        if isinstance(source, str) and source.isdigit():
+            source = int(source)
+        self.source = source
+        self.shared_state = shared_state
+        self.camera_index = camera_index
+        self.workers = workers
+        self.detect_width = detect_width
+        self.realtime = (not isinstance(source, int)) if realtime is None else realtime
+
+        self.tracker = PersonTracker()
+        self.stats = {name: StageStats(name) for name in ('capture', 'detect', 'track')}
+        self.last_detections: List[Box] = []
+        self.frame_size = (0, 0)
+
+        self._frames = queue.Queue(maxsize=queue_size)
+        self._results = queue.Queue(maxsize=workers * 2)
+        self._in_flight = threading.Semaphore(workers)
+        self._stop = threading.Event()
+        self._pool = None
+        self._threads = []
+
+    def start(self):
+        self._stop.clear()
+        # Fresh queues and permits: a previous run may have left its end of stream or stopped mid-drain
+        self._frames = queue.Queue(maxsize=self._frames.maxsize)
+        self._results = queue.Queue(maxsize=self._results.maxsize)
+        self._in_flight = threading.Semaphore(self.workers)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        self._threads = [
+            threading.Thread(target=self._capture_loop, daemon=True),
+            threading.Thread(target=self._dispatch_loop, daemon=True),
+            threading.Thread(target=self._track_loop, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        if self._pool:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def is_running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def get_stats(self) -> dict:
+        return {
+            'source': str(self.source),
+            'camera_index': self.camera_index,
+            'running': self.is_running(),
+            'stages': {name: stage.snapshot() for name, stage in self.stats.items()},
+            'detections': len(self.last_detections),
+        }
+
+    # Pipeline stages --------------------------------------------------------
+
+    def _capture_loop(self):
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            logging.error(f"Could not open video source {self.source}")
+            self._offer(self._frames, None, self.stats['capture'])
+            return
+
+        frame_interval = 1.0 / (capture.get(cv2.CAP_PROP_FPS) or 30)
+        next_frame_time = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                started = time.monotonic()
+
+                height, width = frame.shape[:2]
+                if width > self.detect_width:
+                    height = round(height * self.detect_width / width)
+                    width = self.detect_width
+                    frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+                self.frame_size = (width, height)
+
+                self._offer(self._frames, (started, frame), self.stats['capture'])
+                self.stats['capture'].record(time.monotonic() - started)
+
+                if self.realtime:
+                    next_frame_time += frame_interval
+                    delay = next_frame_time - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_frame_time = time.monotonic()
+        finally:
+            capture.release()
+            self._offer(self._frames, None, self.stats['capture'])  # end of stream
+
+    def _dispatch_loop(self):
+        while not self._stop.is_set():
+            try:
+                item = self._frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+
+            captured_at, frame = item
+            self._in_flight.acquire()
+            try:
+                future = self._pool.submit(_detect_people, frame)
+            except Exception as e:  # e.g. BrokenProcessPool after a worker was killed
+                self._in_flight.release()
+                logging.error(f"Person detection stopped: {e}")
+                self._stop.set()  # and capture with it
+                break
+            future.add_done_callback(lambda f, t=captured_at, size=frame.shape[:2]: self._on_detected(f, t, size))
+
+        # Wait for outstanding detections before signalling the end of the stream
+        for _ in range(self.workers):
+            self._in_flight.acquire()
+        for _ in range(self.workers):
+            self._in_flight.release()
+        self._offer(self._results, None, self.stats['detect'])
+
+    def _on_detected(self, future, captured_at, size):
+        self._in_flight.release()
+        try:
+            boxes = future.result()
+        except Exception as e:
+            logging.error(f"Person detection failed: {e}")
+            self.stats['detect'].drop()
+            return
+        self.stats['detect'].record(time.monotonic() - captured_at)
+        self._offer(self._results, (captured_at, size, boxes), self.stats['detect'])
+
+    def _track_loop(self):
+        last_captured_at = 0.0
+        while not self._stop.is_set():
+            try:
+                item = self._results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+
+            captured_at, (height, width), boxes = item
+            if captured_at < last_captured_at:  # a slower worker finished an older frame
+                self.stats['track'].drop()
+                continue
+            last_captured_at = captured_at
+
+            self.last_detections = boxes
+            speeds = self.tracker.update(boxes, width, height, time.monotonic())
+            if speeds is not None and self.shared_state is not None:
+                self.shared_state.update_auto_tracking_command(self.camera_index, *speeds)
+            self.stats['track'].record(time.monotonic() - captured_at)
+
+        if self.shared_state is not None:
+            self.shared_state.update_auto_tracking_command(self.camera_index, 0.0, 0.0)
+
+    @staticmethod
+    def _offer(target: queue.Queue, item, stats: StageStats):
+        """Puts an item on a bounded queue, dropping the oldest entry when it is full."""
+        while True:
+            try:
+                target.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    target.get_nowait()
+                    stats.drop()
+                except queue.Empty:
+                    pass
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Run the person detector against a capture device or video file')
+    parser.add_argument('source', help='capture device index or path to a video file (e.g. a recorded .mp4)')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--width', type=int, default=320, help='detection width in pixels')
+    parser.add_argument('--fast', action='store_true', help='read video files as fast as possible')
+    args = parser.parse_args()
+
+    service = DetectionService(args.source, workers=args.workers, detect_width=args.width,
+                               realtime=False if args.fast else None)
+    service.start()
+    try:
+        while service.is_running():
+            time.sleep(1)
+            print(json.dumps(service.get_stats()['stages']))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        print(json.dumps(service.get_stats(), indent=2))
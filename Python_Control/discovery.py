@@ -0,0 +1,172 @@
+"""
+Finds VISCA-over-IP cameras on the network.
+
+Every address in a range is probed concurrently with asyncio: a sequence number reset, then a
+version inquiry, each with a short timeout and a bounded number of probes in flight, so a /24
+sweep takes about (254 / concurrency) * timeout seconds. Cameras already under control only get the
+version inquiry, so their sequence numbers are left alone.
+
+Run from Python_Control:  python -m discovery 192.168.0.0/24
+"""
+import argparse
+import asyncio
+import ipaddress
+import socket
+import time
+
+from pose_estimator import SPEED_TABLES
+
+RESET_SEQUENCE = bytes.fromhex('02 00 00 01 00 00 00 00 01')
+VERSION_INQUIRY = bytes.fromhex('01 10 00 05 00 00 00 01 81 09 00 02 FF')
+
+VENDORS = {0x0001: 'Sony'}
+
+# Keyboard colours handed to cameras added from a scan, in order
+PALETTE = [[255, 0, 0], [0, 255, 0], [0, 0, 255], [255, 255, 0], [255, 0, 255], [0, 255, 255],
+           [255, 128, 0], [128, 0, 255], [255, 255, 255]]
+
+
+def parse_range(spec: str, limit=65536) -> list:
+    """Addresses to probe, from a network ("192.168.0.0/24"), a range ("192.168.0.10-192.168.0.50")
+    or a single address.
+
+    :param limit: most addresses allowed, a /16 by default
+    :raises ValueError: if the range isn't valid or is larger than `limit`
+    """
+    if '-' in spec:
+        first, last = (ipaddress.IPv4Address(part.strip()) for part in spec.split('-', 1))
+        if last < first:
+            raise ValueError(f'Empty address range "{spec}"')
+        if int(last) - int(first) >= limit:
+            raise ValueError(f'Refusing to scan more than {limit} addresses')
+        addresses = [str(ipaddress.IPv4Address(value)) for value in range(int(first), int(last) + 1)]
+    else:
+        network = ipaddress.IPv4Network(spec.strip(), strict=False)
+        if network.num_addresses > limit + 2:  # the network and broadcast addresses aren't probed
+            raise ValueError(f'Refusing to scan more than {limit} addresses')
+        addresses = [str(address) for address in (network.hosts() if network.num_addresses > 1 else network)]
+    if len(addresses) > limit:
+        raise ValueError(f'Refusing to scan more than {limit} addresses')
+    return addresses
+
+
+def local_network() -> str:
+    """The /24 this machine's default route goes out on, e.g. "192.168.0.0/24". No packet is sent."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.connect(('192.0.2.1', 9))  # TEST-NET-1, only used to pick an interface
+        address = sock.getsockname()[0]
+    return str(ipaddress.IPv4Network(f'{address}/24', strict=False))
+
+
+def next_colour(cameras) -> list:
+    """The first palette colour no configured camera uses yet."""
+    used = [camera.get('color') for camera in cameras]
+    return next((colour for colour in PALETTE if colour not in used), PALETTE[len(cameras) % len(PALETTE)])
+
+
+class _Probe(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.replies = asyncio.Queue()
+
+    def datagram_received(self, data, addr):
+        self.replies.put_nowait(data)
+
+    def error_received(self, exc):
+        self.replies.put_nowait(None)  # e.g. ICMP port unreachable: nothing is listening
+
+
+async def _exchange(transport, protocol, message, reply_type, timeout):
+    transport.sendto(message)
+    deadline = time.monotonic() + timeout
+    while True:
+        reply = await asyncio.wait_for(protocol.replies.get(), max(0.0, deadline - time.monotonic()))
+        if reply is None:
+            raise ConnectionRefusedError
+        if reply[:2] == reply_type:  # ignore stray replies to anything else
+            return reply
+
+
+async def probe(ip: str, port=52381, timeout=0.3, reset=True):
+    """Checks one address for a VISCA-over-IP camera.
+
+    :param reset: reset the camera's sequence number first; leave False for a camera under control
+    :return: a dict describing the camera, or None if nothing answered
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        transport, protocol = await loop.create_datagram_endpoint(_Probe, remote_addr=(ip, port))
+    except OSError:
+        return None
+    try:
+        started = time.monotonic()
+        if reset:
+            await _exchange(transport, protocol, RESET_SEQUENCE, b'\x02\x01', timeout)
+        reply = await _exchange(transport, protocol, VERSION_INQUIRY, b'\x01\x11', timeout)
+        rtt = time.monotonic() - started
+    except (asyncio.TimeoutError, ConnectionRefusedError, OSError):
+        return None
+    finally:
+        transport.close()
+
+    payload = reply[8:]
+    if len(payload) < 10 or payload[1] >> 4 != 5:
+        return None
+    vendor = int.from_bytes(payload[2:4], 'big')
+    model = int.from_bytes(payload[4:6], 'big')
+    return {
+        'ip': ip,
+        'port': port,
+        'vendor': vendor,
+        'vendor_name': VENDORS.get(vendor),
+        'model': model,
+        'rom': int.from_bytes(payload[6:8], 'big'),
+        'sockets': payload[8],
+        'speed_table': model in SPEED_TABLES,  # whether the pose estimator knows how fast it moves
+        'rtt_ms': round(rtt * 1000, 2),
+    }
+
+
+async def discover(spec: str, port=52381, timeout=0.3, concurrency=64, known=(), limit=65536) -> list:
+    """Probes every address in `spec` (see `parse_range`) and returns the cameras that answered,
+    in address order.
+
+    :param concurrency: most probes in flight at once
+    :param known: addresses of cameras already under control, which are not sent a sequence number reset
+    :param limit: most addresses to probe
+    :raises ValueError: if the range, timeout or concurrency isn't valid
+    """
+    if concurrency < 1:
+        raise ValueError('Concurrency must be at least 1')
+    if timeout <= 0:
+        raise ValueError('Timeout must be positive')
+    addresses = parse_range(spec, limit)
+    known = set(known)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(ip):
+        async with semaphore:
+            return await probe(ip, port, timeout, reset=ip not in known)
+
+    results = await asyncio.gather(*(bounded(ip) for ip in addresses))
+    return [result for result in results if result is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('range', nargs='?', help='e.g. 192.168.0.0/24 or 192.168.0.10-192.168.0.50, '
+                                                 'by default the local /24')
+    parser.add_argument('--port', type=int, default=52381)
+    parser.add_argument('--timeout', type=float, default=0.3)
+    parser.add_argument('--concurrency', type=int, default=64)
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    cameras = asyncio.run(discover(args.range or local_network(), args.port, args.timeout, args.concurrency))
+    for camera in cameras:
+        print(f"{camera['ip']:>15}  vendor {camera['vendor']:04x} model {camera['model']:04x} "
+              f"rom {camera['rom']:04x}  {camera['sockets']} sockets  {camera['rtt_ms']} ms")
+    print(f"{len(cameras)} camera(s) found in {time.monotonic() - started:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
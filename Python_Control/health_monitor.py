@@ -0,0 +1,281 @@
+import ipaddress
+import logging
+import select
+import socket
+import threading
+import time
+from collections import deque
+
+# VISCA power inquiry (81 09 04 00 FF) sent as a VISCA inquiry datagram. Every camera answers it and
+# it doesn't touch the camera's command sockets.
+PROBE_PAYLOAD = bytes.fromhex('81 09 04 00 FF')
+
+# How often an unhealthy camera's LED flashes
+FLASH_INTERVAL = 0.5
+
+
+class CameraHealth:
+    """What the monitor knows about one camera."""
+
+    def __init__(self, ip, history=10):
+        self.ip = ip
+        self.state = 'unknown'  # 'up', 'degraded' or 'down' once probed
+        self.results = deque(maxlen=history)  # True for answered probes, most recent last
+        self.probes = 0
+        self.answered = 0
+        self.rtt = None  # seconds, of the last answered probe
+        self.last_seen = None  # time.time() of the last answer
+        self.changed_at = time.time()
+
+    @property
+    def loss(self) -> float:
+        """Fraction of recent probes that went unanswered."""
+        if not self.results:
+            return 0.0
+        return 1.0 - sum(self.results) / len(self.results)
+
+    def describe(self) -> dict:
+        return {
+            'ip': self.ip,
+            'state': self.state,
+            'loss': round(self.loss, 3),
+            'rtt_ms': None if self.rtt is None else round(self.rtt * 1000, 2),
+            'probes': self.probes,
+            'answered': self.answered,
+            'last_seen': self.last_seen,
+            'since': self.changed_at,
+        }
+
+
+class HealthMonitor:
+    """
+    Probes every configured camera in the background so failures are noticed before anyone switches
+    to the camera or drives it.
+
+    Each round sends one power inquiry to every camera from a single socket and collects the answers
+    with `select`, so a round costs one datagram per camera however many are dead. A camera is
+    "down" after `down_after` unanswered probes in a row, "degraded" while it loses at least
+    `degraded_loss` of its recent probes or answers slower than `degraded_rtt`, and "up" otherwise.
+    State changes refresh the keyboard LEDs, and unhealthy cameras flash. Configured with
+    "health": {"interval": 1.0, "timeout": 0.3, "down_after": 3, "degraded_loss": 0.2, "degraded_rtt": 0.1}
+    """
+
+    def __init__(self, shared_state, interval=1.0, timeout=0.3, down_after=3, degraded_loss=0.2,
+                 degraded_rtt=0.1, port=52381):
+        """:param shared_state: the SharedState whose cameras to watch
+        :param interval: seconds between probe rounds
+        :param timeout: seconds to wait for the answers to a round
+        :param down_after: consecutive unanswered probes before a camera counts as down
+        :param degraded_loss: recent probe loss at which a camera counts as degraded
+        :param degraded_rtt: probe round trip, in seconds, above which a camera counts as degraded
+        :param port: the cameras' VISCA-over-IP port
+        """
+        self.state = shared_state
+        self.interval = interval
+        self.timeout = min(timeout, interval)
+        self.down_after = down_after
+        self.degraded_loss = degraded_loss
+        self.degraded_rtt = degraded_rtt
+        self.port = port
+
+        self.cameras = {}  # ip -> CameraHealth
+        self.flash_on = True  # phase of the flashing LEDs, toggled every FLASH_INTERVAL
+        self.rounds = 0
+        self._sequence = 0
+        self._addresses = {}  # configured ip or hostname -> resolved address
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._reactor = None  # set by attach()
+        self._sock = None
+        self._timers = []
+        self._round = None  # (ips, pending) of the round in progress on the reactor
+
+    @classmethod
+    def from_config(cls, shared_state):
+        return cls(shared_state, **shared_state.config.get('health', {}))
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='health-monitor')
+        self._thread.start()
+        return self
+
+    def attach(self, reactor):
+        """Probes from an io_reactor.Reactor's timers and reads the answers there, instead of on a
+        thread of its own."""
+        self._reactor = reactor
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind(('', 0))
+        self._sock.setblocking(False)
+        reactor.add_reader(self._sock, self._on_readable)
+        self._timers = [reactor.call_every(self.interval, self._start_round, delay=0.0),
+                        reactor.call_every(FLASH_INTERVAL, self._flash)]
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self._reactor:
+            for timer in self._timers:
+                timer.cancel()
+            self._reactor.remove_reader(self._sock)
+            self._sock.close()
+
+    # Queries ----------------------------------------------------------------
+
+    def state_of(self, ip) -> str:
+        with self._lock:
+            health = self.cameras.get(ip)
+            return health.state if health else 'unknown'
+
+    def is_down(self, ip) -> bool:
+        return self.state_of(ip) == 'down'
+
+    def status(self) -> dict:
+        """Health of every configured camera, by camera index."""
+        with self._lock:
+            return {index: (self.cameras[camera['ip']].describe() if camera['ip'] in self.cameras
+                            else CameraHealth(camera['ip']).describe())
+                    for index, camera in enumerate(self.state.cameras)}
+
+    # Probing ----------------------------------------------------------------
+
+    def _run(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('', 0))
+        sock.setblocking(False)
+        next_round = time.monotonic()
+        next_flash = next_round + FLASH_INTERVAL
+        try:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                if now >= next_round:
+                    self._probe_round(sock)
+                    next_round = max(next_round + self.interval, time.monotonic())
+                if now >= next_flash:
+                    self._flash()
+                    next_flash = now + FLASH_INTERVAL
+                self._stop.wait(max(0.0, min(next_round, next_flash) - time.monotonic()))
+        finally:
+            sock.close()
+
+    def _probe_round(self, sock):
+        ips, pending = self._send_probes(sock)
+        deadline = time.monotonic() + self.timeout
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([sock], [], [], remaining)
+            if readable:
+                self._receive(sock, pending)
+        self._finish_round(ips, pending)
+
+    def _send_probes(self, sock):
+        """Sends one round of probes. :return: the probed ips and {sequence number: (ip, address, sent at)}"""
+        ips = list(dict.fromkeys(camera['ip'] for camera in self.state.cameras))
+        pending = {}
+        for ip in ips:
+            address = self._resolve(ip)
+            if address is None:
+                self._record(ip, None)
+                continue
+            self._sequence = (self._sequence + 1) % 2 ** 32
+            header = b'\x01\x10' + len(PROBE_PAYLOAD).to_bytes(2, 'big') + self._sequence.to_bytes(4, 'big')
+            try:
+                sock.sendto(header + PROBE_PAYLOAD, (address, self.port))
+                pending[self._sequence] = (ip, address, time.monotonic())
+            except OSError:
+                self._record(ip, None)
+        return ips, pending
+
+    def _receive(self, sock, pending):
+        """Matches the answers waiting on the socket to their probes."""
+        while True:
+            try:
+                reply, source = sock.recvfrom(64)
+            except OSError:  # nothing more to read
+                return
+            sequence_number = int.from_bytes(reply[4:8], 'big')
+            probe = pending.get(sequence_number)
+            if probe is not None and source[0] == probe[1]:
+                del pending[sequence_number]
+                self._record(probe[0], time.monotonic() - probe[2])
+
+    def _finish_round(self, ips, pending):
+        for ip, _, _ in pending.values():
+            self._record(ip, None)
+        with self._lock:
+            for ip in set(self.cameras) - set(ips):  # removed from the config
+                del self.cameras[ip]
+        self.rounds += 1
+
+    # On a reactor -----------------------------------------------------------
+
+    def _start_round(self):
+        if self._round is not None:
+            self._finish_round(*self._round)
+        self._round = self._send_probes(self._sock)
+        round_ = self._round
+        self._reactor.call_later(self.timeout, lambda: self._end_round(round_))
+
+    def _on_readable(self):
+        if self._round is not None:
+            self._receive(self._sock, self._round[1])
+        else:
+            self._receive(self._sock, {})  # drain late answers
+
+    def _end_round(self, round_):
+        if self._round is round_:
+            self._round = None
+            self._finish_round(*round_)
+
+    def _resolve(self, ip):
+        if ip not in self._addresses:
+            try:
+                ipaddress.ip_address(ip)
+                self._addresses[ip] = ip
+            except ValueError:
+                try:
+                    self._addresses[ip] = socket.gethostbyname(ip)
+                except OSError:
+                    return None  # try again next round
+        return self._addresses[ip]
+
+    def _record(self, ip, rtt):
+        """Feeds one probe result (`rtt` None if unanswered) and re-evaluates the camera's state."""
+        with self._lock:
+            health = self.cameras.setdefault(ip, CameraHealth(ip))
+            health.probes += 1
+            health.results.append(rtt is not None)
+            if rtt is not None:
+                health.answered += 1
+                health.rtt = rtt
+                health.last_seen = time.time()
+
+            recent = list(health.results)[-self.down_after:]
+            if len(recent) == self.down_after and not any(recent):
+                new_state = 'down'
+            elif health.loss >= self.degraded_loss or (health.rtt or 0) > self.degraded_rtt:
+                new_state = 'degraded'
+            elif rtt is not None:
+                new_state = 'up'
+            else:
+                new_state = health.state if health.state != 'unknown' else 'degraded'
+            old_state, health.state = health.state, new_state
+            if new_state != old_state:
+                health.changed_at = time.time()
+
+        if new_state != old_state:
+            log = logging.warning if new_state in ('down', 'degraded') else logging.info
+            log(f"Camera {ip} is {new_state} (was {old_state}, {health.loss:.0%} probe loss)")
+            self.state.update_leds()
+
+    def _flash(self):
+        with self._lock:
+            unhealthy = any(health.state in ('down', 'degraded') for health in self.cameras.values())
+        if unhealthy or not self.flash_on:
+            self.flash_on = not self.flash_on
+            self.state.update_leds()
@@ -1,6 +1,10 @@
 import json
 import time
 
+# Grid positions (x, y) of the "macro_buttons" slots: slot 0 is row 9, slot 1 row 8 of column 5.
+# Row 10 of that column is the home button, so it can't carry a macro.
+MACRO_BUTTONS = ((3, 1), (3, 2))
+
 class inputController:
     def __init__(self, ser):
         self.ser = ser
@@ -38,6 +42,13 @@ class inputController:
         self.auto_tracking_active = False
         self.auto_tracking_changed = False # Flag to indicate state change for LED update
 
+        self.recorder = None # Optional SessionRecorder, given every parsed frame
+        self.keyboard = 0 # Which keyboard this is in the session log, 0 for the main one
+
+        # Macro buttons (the three spare buttons in the last column)
+        self.macro_button = None
+        self.macro_button_pressed = False
+
         # Long‑press (home button) handling
         self.home_pressed_time = None     # Start‑time of current press
         self.restart_requested = False    # Flag set after ≥5 s hold
@@ -78,6 +89,8 @@ class inputController:
             self.zoom = value
 
     def processPacket(self, case, LED):
+        if self.recorder is not None:
+            self.recorder.serial_frame(case, self.keyboard)
         if case[0] == b'0':
             self.updateTilt(int(case[1]))
         elif case[0] == b'1':
@@ -120,6 +133,10 @@ class inputController:
                         # Force tilt update in case lock was just engaged
                         if self.vertical_lock_active:
                             self.updateTilt(self.tilt) # This will force tilt to 0
+                elif (xloc, yloc) in MACRO_BUTTONS:  # Macro buttons
+                    if value:
+                        self.macro_button = MACRO_BUTTONS.index((xloc, yloc))
+                        self.macro_button_pressed = True
                 elif xloc <= 2:  # first 15 buttons (used for camera selection)
                     self.process_camera_select(xloc, yloc, value)
 
@@ -0,0 +1,190 @@
+import heapq
+import logging
+import selectors
+import socket
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Scheduled:
+    __slots__ = ('due', 'interval', 'callback', 'cancelled')
+
+    def __init__(self, due, interval, callback):
+        self.due = due
+        self.interval = interval  # None for a one-shot timer
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def __lt__(self, other):
+        return self.due < other.due
+
+
+class Reactor:
+    """
+    One thread that waits on every file descriptor and timer at once, instead of a thread per job
+    polling with sleeps. The keyboard's serial port, the health monitor's UDP socket, LED frames and
+    actuation ticks all run as callbacks here (see main.py's "reactor" setting), so the process
+    wakes up only when something is readable or due.
+
+    Callbacks run on the reactor thread and must not block. Work that does, like a VISCA round
+    trip, goes to `run_in_executor`; other threads hand work in with `call_soon_threadsafe`.
+    """
+
+    def __init__(self, blocking_workers=1):
+        """:param blocking_workers: threads for `run_in_executor`; with one, blocking jobs run in order"""
+        self._selector = selectors.DefaultSelector()
+        self._timers = []  # heap of Scheduled
+        self._ready = deque()  # callbacks handed in from other threads
+        self._lock = threading.Lock()
+        self._wake_receive, self._wake_send = socket.socketpair()
+        self._wake_receive.setblocking(False)
+        self._wake_send.setblocking(False)
+        self._selector.register(self._wake_receive, selectors.EVENT_READ, self._drain_wakeups)
+        self._executor = ThreadPoolExecutor(max_workers=blocking_workers, thread_name_prefix='reactor-blocking')
+        self._stopping = False
+        self._thread_id = None
+        self._thread = None
+
+        self.iterations = 0
+        self.callbacks = 0
+        self.busy = 0.0  # seconds spent in callbacks
+        self._lateness = deque(maxlen=2000)  # how late timers fired, seconds
+
+    # Registration -----------------------------------------------------------
+
+    def add_reader(self, fileobj, callback):
+        """Calls `callback()` whenever `fileobj` (a file descriptor or object with fileno()) is readable."""
+        self._selector.register(fileobj, selectors.EVENT_READ, callback)
+        self._wake()
+
+    def remove_reader(self, fileobj):
+        try:
+            self._selector.unregister(fileobj)
+        except (KeyError, ValueError):
+            pass
+
+    def call_later(self, delay, callback) -> Scheduled:
+        return self._schedule(Scheduled(time.monotonic() + delay, None, callback))
+
+    def call_every(self, interval, callback, delay=None) -> Scheduled:
+        """Calls `callback()` every `interval` seconds, skipping runs it fell behind on rather than
+        bunching them up. Cancel the returned timer to stop."""
+        return self._schedule(Scheduled(time.monotonic() + (interval if delay is None else delay), interval,
+                                        callback))
+
+    def call_soon_threadsafe(self, callback):
+        self._ready.append(callback)
+        self._wake()
+
+    def run_in_executor(self, function, *args, callback=None):
+        """Runs `function(*args)` off the reactor thread; `callback(future)`, if given, runs back on it."""
+        future = self._executor.submit(function, *args)
+        if callback is not None:
+            future.add_done_callback(lambda done: self.call_soon_threadsafe(lambda: callback(done)))
+        return future
+
+    def _schedule(self, timer):
+        with self._lock:
+            heapq.heappush(self._timers, timer)
+        if threading.get_ident() != self._thread_id:
+            self._wake()
+        return timer
+
+    def _wake(self):
+        try:
+            self._wake_send.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass  # a wakeup is already pending, or the reactor is closed
+
+    def _drain_wakeups(self):
+        try:
+            while self._wake_receive.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    # Running ----------------------------------------------------------------
+
+    def start(self):
+        """Runs the reactor on a thread of its own."""
+        self._thread = threading.Thread(target=self.run, daemon=True, name='reactor')
+        self._thread.start()
+        return self
+
+    def run(self):
+        """Runs the reactor on the calling thread until `stop`."""
+        self._thread_id = threading.get_ident()
+        try:
+            while not self._stopping:
+                self._run_once()
+        finally:
+            self._thread_id = None
+
+    def stop(self):
+        self._stopping = True
+        self._wake()
+        if self._thread is not None and self._thread.ident != threading.get_ident():
+            self._thread.join()
+        self._executor.shutdown(wait=False)
+
+    def is_running(self) -> bool:
+        return self._thread_id is not None
+
+    def _run_once(self):
+        with self._lock:
+            while self._timers and self._timers[0].cancelled:
+                heapq.heappop(self._timers)
+            timeout = max(0.0, self._timers[0].due - time.monotonic()) if self._timers else None
+        if self._ready:
+            timeout = 0.0
+        events = self._selector.select(timeout)
+        self.iterations += 1
+
+        for key, _ in events:
+            self._invoke(key.data)
+
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._timers and self._timers[0].due <= now:
+                due.append(heapq.heappop(self._timers))
+        for timer in due:
+            if timer.cancelled:
+                continue
+            self._lateness.append(now - timer.due)
+            self._invoke(timer.callback)
+            if timer.interval is not None and not timer.cancelled:
+                timer.due += timer.interval
+                if timer.due <= now:  # fell behind: skip ahead instead of firing in a burst
+                    timer.due = now + timer.interval
+                with self._lock:
+                    heapq.heappush(self._timers, timer)
+
+        while self._ready:
+            self._invoke(self._ready.popleft())
+
+    def _invoke(self, callback):
+        started = time.perf_counter()
+        try:
+            callback()
+        except Exception as e:
+            logging.error(f"Error in reactor callback: {e}")
+        self.busy += time.perf_counter() - started
+        self.callbacks += 1
+
+    def stats(self) -> dict:
+        lateness = sorted(self._lateness.copy())
+        return {
+            'iterations': self.iterations,
+            'callbacks': self.callbacks,
+            'busy_s': round(self.busy, 3),
+            'timers': len(self._timers),
+            'timer_lateness_p50_ms': round(statistics.median(lateness) * 1000, 3) if lateness else None,
+            'timer_lateness_p99_ms': round(lateness[int(len(lateness) * 0.99)] * 1000, 3) if lateness else None,
+        }
@@ -0,0 +1,316 @@
+"""
+Emulates the Autotracker keyboard on a pseudo-terminal, so main.py and the serial reader, LED
+writer and control loop can run (and be load-tested) without the hardware.
+
+Speaks the firmware's serial protocol (Autotracker_firmware): lines ending in \\r\\n of
+    0,<value> / 1,<value>   joystick axes, -24..24 (inputController reads 0 as tilt, 1 as pan)
+    2,<value>               zoom rocker, -7..7
+    <row>,<col>,<0|1>       a button of the matrix changing state, rows 6-10, columns 2-5
+    10,5,<0|1>              the home button
+and reads 54 byte LED frames (red, green and blue for each of the 18 LEDs), answering each with
+"ok". Like the firmware, each loop sends an axis when it changes and, 1 time in 100, again when it
+hasn't.
+
+Run from Python_Control, then point main.py at the printed device:
+    python -m keyboard_emulator --profile random --rate 500
+    AUTOTRACKER_SERIAL=/dev/pts/5 python main.py
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import pty
+import random
+import select
+import signal
+import sys
+import threading
+import time
+import tty
+
+LED_FRAME_SIZE = 54
+NUM_LEDS = 18
+AXIS_LIMITS = (24, 24, 7)  # fields 0, 1 and 2
+HOME = (10, 5)
+
+
+def button_for_camera(index):
+    """(row, col) of the camera select button inputController maps to camera `index` (0-14)."""
+    return 10 - index % 5, index // 5 + 2
+
+
+# Other buttons in the last column, as inputController reads them
+AUTO_TRACKING_BUTTON = (7, 5)
+VERTICAL_LOCK_BUTTON = (6, 5)
+MACRO_BUTTONS = ((9, 5), (8, 5))  # "macro_buttons" slots 0 and 1; (10, 5) is home
+
+
+class ScriptedProfile:
+    """
+    Plays back a timed script: a list of steps such as
+        {"at": 0.5, "axes": [0, 12, 0]}          hold the stick there from 0.5 s on
+        {"at": 1.0, "camera": 2}                 tap camera 2's select button
+        {"at": 2.0, "button": [7, 5], "state": 1}  press (state 0: release) any matrix button
+        {"at": 3.0, "home": 0.2}                 hold home for 0.2 s
+    Times are seconds from the start; with `loop` the script repeats after its last step.
+    """
+
+    def __init__(self, steps, loop=False, tap=0.05):
+        """:param steps: the script, see above
+        :param loop: start over after the last step
+        :param tap: seconds a tapped button is held
+        """
+        self.loop = loop
+        self.events = []  # (time, 'axes' or 'button', value), sorted
+        for step in steps:
+            at = float(step['at'])
+            if 'axes' in step:
+                self.events.append((at, 'axes', tuple(int(v) for v in step['axes'])))
+            if 'camera' in step:
+                self._tap(at, button_for_camera(int(step['camera'])), tap)
+            if 'button' in step:
+                self.events.append((at, 'button', (tuple(step['button']), int(step.get('state', 1)))))
+            if 'home' in step:
+                self._tap(at, HOME, float(step['home']))
+        self.events.sort(key=lambda event: event[0])
+        self.length = self.events[-1][0] + tap if self.events else 0.0
+
+    def _tap(self, at, button, hold):
+        self.events.append((at, 'button', (button, 1)))
+        self.events.append((at + hold, 'button', (button, 0)))
+
+    @classmethod
+    def from_file(cls, path, loop=False):
+        with open(path) as f:
+            return cls(json.load(f), loop)
+
+    def run(self, keyboard, seconds):
+        started = time.monotonic()
+        offset = 0.0
+        while self.events:
+            for at, kind, value in self.events:
+                if not keyboard.wait_until(started + offset + at, started + seconds):
+                    return
+                if kind == 'axes':
+                    keyboard.axes = list(value)
+                else:
+                    keyboard.set_button(*value)
+            if not self.loop:
+                return
+            offset += self.length
+
+
+class RandomProfile:
+    """
+    A restless operator: the stick and zoom rocker head for a new random position every so often
+    (sometimes letting go to the centre), moving there at a limited speed, and camera buttons are
+    tapped every few seconds. Seeded, so a run can be repeated.
+    """
+
+    def __init__(self, seed=None, cameras=4, camera_every=5.0, move_every=0.5, centre=0.3, slew=4.0):
+        """:param cameras: how many camera select buttons to tap between
+        :param camera_every: mean seconds between camera switches, 0 to never switch
+        :param move_every: mean seconds between new stick positions
+        :param centre: chance that a new position is letting go of the stick
+        :param slew: full deflections per second the stick moves at
+        """
+        self.random = random.Random(seed)
+        self.cameras = cameras
+        self.camera_every = camera_every
+        self.move_every = move_every
+        self.centre = centre
+        self.slew = slew
+
+    def run(self, keyboard, seconds):
+        started = time.monotonic()
+        step = 1.0 / keyboard.rate
+        position = [0.0, 0.0, 0.0]
+        target = [0.0, 0.0, 0.0]
+        next_move = 0.0
+        next_switch = self._next(self.camera_every)
+        t = 0.0
+        while keyboard.wait_until(started + t, started + seconds):
+            if t >= next_move:
+                if self.random.random() < self.centre:
+                    target = [0.0, 0.0, 0.0]
+                else:
+                    target = [self.random.uniform(-1, 1) for _ in range(3)]
+                next_move = t + self._next(self.move_every)
+            for axis in range(3):
+                position[axis] += max(-self.slew * step, min(self.slew * step, target[axis] - position[axis]))
+            keyboard.axes = [round(position[axis] * AXIS_LIMITS[axis]) for axis in range(3)]
+            if t >= next_switch:
+                button = button_for_camera(self.random.randrange(self.cameras))
+                keyboard.set_button(button, 1)
+                keyboard.set_button(button, 0)
+                next_switch = t + self._next(self.camera_every)
+            t += step
+
+    def _next(self, mean):
+        return self.random.expovariate(1.0 / mean) if mean else math.inf
+
+
+class KeyboardEmulator:
+    """
+    The keyboard end of a pseudo-terminal. A profile moves the stick and presses buttons; a sender
+    thread turns that into frames at `rate` loops per second, like the firmware's main loop, and a
+    reader thread takes the LED frames the host writes.
+    """
+
+    def __init__(self, rate=200.0, seed=None):
+        """:param rate: firmware loop iterations per second, the most frames per axis per second
+        :param seed: seed for the firmware's random resends
+        """
+        self.rate = rate
+        self.axes = [0, 0, 0]
+        self.leds = [(0, 0, 0)] * NUM_LEDS  # the last LED frame, in strip order
+        self.frames_sent = {'axis': 0, 'button': 0}
+        self.led_frames = 0
+        self.led_bytes = 0
+        self._random = random.Random(seed)
+        self._sent_axes = [None, None, None]
+        self._buttons = []  # (row, col, state) waiting to be sent, in order
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)  # no echo or newline translation until the host configures the port
+        self.device = os.ttyname(self._slave)
+
+    def set_button(self, button, state):
+        with self._lock:
+            self._buttons.append((*button, state))
+
+    def wait_until(self, when, deadline) -> bool:
+        """Sleeps until `when` (time.monotonic()); False once stopped or past `deadline`."""
+        if when >= deadline:
+            return False
+        return not self._stop.wait(max(0.0, when - time.monotonic()))
+
+    # Threads ----------------------------------------------------------------
+
+    def start(self, profile=None, seconds=math.inf):
+        """Starts sending and receiving, with `profile` (if any) driving the controls for `seconds`."""
+        self._threads = [threading.Thread(target=self._send_loop, daemon=True, name='keyboard-send'),
+                         threading.Thread(target=self._receive_loop, daemon=True, name='keyboard-receive')]
+        if profile is not None:
+            self._threads.append(threading.Thread(target=profile.run, args=(self, seconds), daemon=True,
+                                                  name='keyboard-profile'))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        os.close(self._master)
+        os.close(self._slave)
+
+    def _send_loop(self):
+        interval = 1.0 / self.rate
+        next_loop = time.monotonic()
+        while not self._stop.is_set():
+            lines = []
+            with self._lock:
+                for row, col, state in self._buttons:
+                    lines.append(f'{row},{col},{state}')
+                self.frames_sent['button'] += len(self._buttons)
+                self._buttons.clear()
+                for axis, value in enumerate(self.axes):
+                    if value != self._sent_axes[axis] or self._random.randrange(100) == 1:
+                        lines.append(f'{axis},{value}')
+                        self._sent_axes[axis] = value
+                        self.frames_sent['axis'] += 1
+            if lines:
+                try:
+                    os.write(self._master, ''.join(line + '\r\n' for line in lines).encode())
+                except OSError:
+                    return
+            next_loop += interval
+            delay = next_loop - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                next_loop = time.monotonic()
+
+    def _receive_loop(self):
+        pending = bytearray()
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._master], [], [], 0.1)
+            if not readable:
+                continue
+            try:
+                pending += os.read(self._master, 4096)
+            except OSError:
+                return
+            while len(pending) >= LED_FRAME_SIZE:
+                frame, pending = pending[:LED_FRAME_SIZE], pending[LED_FRAME_SIZE:]
+                self.leds = [tuple(frame[i:i + 3]) for i in range(0, LED_FRAME_SIZE, 3)]
+                self.led_frames += 1
+                self.led_bytes += LED_FRAME_SIZE
+                try:
+                    os.write(self._master, b'ok\r\n')
+                except OSError:
+                    return
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'device': self.device, 'axes': list(self.axes), 'frames_sent': dict(self.frames_sent),
+                    'led_frames': self.led_frames, 'led_bytes': self.led_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profile', choices=['idle', 'random', 'script'], default='random')
+    parser.add_argument('--script', help='JSON script for --profile script, see ScriptedProfile')
+    parser.add_argument('--loop', action='store_true', help='repeat the script')
+    parser.add_argument('--rate', type=float, default=200.0, help='firmware loops per second')
+    parser.add_argument('--cameras', type=int, default=4, help='camera buttons the random profile taps')
+    parser.add_argument('--camera-every', type=float, default=5.0, help='mean seconds between camera switches')
+    parser.add_argument('--move-every', type=float, default=0.5, help='mean seconds between new stick positions')
+    parser.add_argument('--slew', type=float, default=4.0, help='full stick deflections per second')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--duration', type=float, default=math.inf, help='seconds to run the profile for')
+    parser.add_argument('--link', help='also make this path a symlink to the device, e.g. /tmp/autotracker')
+    args = parser.parse_args()
+
+    if args.profile == 'script':
+        if not args.script:
+            parser.error('--profile script needs --script')
+        profile = ScriptedProfile.from_file(args.script, args.loop)
+    elif args.profile == 'random':
+        profile = RandomProfile(args.seed, args.cameras, args.camera_every, args.move_every, slew=args.slew)
+    else:
+        profile = None
+
+    keyboard = KeyboardEmulator(args.rate, args.seed)
+    if args.link:
+        if os.path.islink(args.link):
+            os.remove(args.link)
+        os.symlink(keyboard.device, args.link)
+    print(f"Keyboard emulator on {keyboard.device}", flush=True)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))  # clean up the link when killed too
+    keyboard.start(profile, args.duration)
+    try:
+        last_leds = 0
+        while True:
+            time.sleep(2.0)
+            stats = keyboard.stats()
+            logging.info(f"axes {stats['axes']}, sent {stats['frames_sent']['axis']} axis and "
+                         f"{stats['frames_sent']['button']} button frames, "
+                         f"{(stats['led_frames'] - last_leds) / 2.0:.0f} LED frames/s")
+            last_leds = stats['led_frames']
+    except KeyboardInterrupt:
+        pass
+    finally:
+        keyboard.stop()
+        if args.link and os.path.islink(args.link):
+            os.remove(args.link)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    main()
@@ -0,0 +1,30 @@
+import time
+
+
+class KeyboardStation:
+    """
+    An extra operator position: a keyboard, the camera it has selected, its own LEDs and its own
+    joystick on that camera's mixer. The main keyboard's station is the SharedState itself (it has
+    the same attributes), so a single-keyboard setup works as it always has.
+
+    Every station selects cameras through SharedState.connect_to_camera, which keeps one keyboard
+    per camera: see SharedState.camera_owners.
+    """
+
+    def __init__(self, controller, name):
+        """:param controller: the keyboard, an AutotrackerKeyboard.ReactorController
+        :param name: how to refer to it in messages and the API, e.g. "keyboard 2 (/dev/ttyUSB1)"
+        """
+        self.controller = controller
+        self.name = name
+        self.current_camera_index = None
+        self.cam = None
+        self.led_manager = None
+
+        self.currentPan = 0
+        self.currentTilt = 0
+        self.currentZoom = 0
+        self.last_moved = time.monotonic()  # when the stick or zoom rocker was last off centre
+
+    def set_led_manager(self, led_manager):
+        self.led_manager = led_manager
@@ -2,7 +2,8 @@ import time
 import threading
 
 class LedController:
-    def __init__(self, ser):
+    def __init__(self, ser, animate=True):
+        """:param animate: run animations on a thread of their own; otherwise call step_animations()"""
         self.ser = ser
         self.LED_LUT = [
             [4, 3, 2, 1, 0],
@@ -22,35 +23,74 @@ class LedController:
         self.animations = []
         self.animation_lock = threading.Lock()  # Lock for thread-safe operations
         self.led_state_lock = threading.Lock()  # Lock for LED_STATE
-        self.animation_thread = threading.Thread(target=self.run_animations)
-        self.animation_thread.start()
+        self.version = 0  # bumped by every commit, so writers only send frames that changed
+        self.committed = threading.Condition(self.led_state_lock)
+        if animate:
+            self.animation_thread = threading.Thread(target=self.run_animations)
+            self.animation_thread.start()
 
-    def show(self):
+    def frame(self):
+        """The bytes show() writes: red, green and blue for each of the 18 LEDs in strip order."""
         with self.led_state_lock:  # Protect access to LED_STATE
             for x in range(5):
                 for y in range(4):
                     if self.LED_LUT[y][x] != None:
                         self.LED_TEMP[self.LED_LUT[y][x]] = self.LED_STATE[y][x]
-        # Convert the list of lists into a flat list
-        temp_list = [item for sublist in self.LED_TEMP for item in sublist]
+            # Convert the list of lists into a flat list
+            temp_list = [item for sublist in self.LED_TEMP for item in sublist]
         binary_data = bytes(temp_list)
-        self.ser.write(binary_data[:-6]) #idk why -6 bytes????
+        return binary_data[:-6] #idk why -6 bytes???? (the firmware reads 54: 18 LEDs)
+
+    def show(self):
+        self.ser.write(self.frame())
+
+    def begin_frame(self, clear=True):
+        """Starts drawing the next frame off to the side; nothing reaches the keyboard until commit().
+        :param clear: start from all black; otherwise from a copy of what is showing now
+        """
+        if clear:
+            return LedFrame(self, [[[0, 0, 0] for _ in range(5)] for _ in range(4)])
+        with self.led_state_lock:
+            return LedFrame(self, [list(row) for row in self.LED_STATE])
+
+    def commit(self, frame):
+        """Swaps a frame from begin_frame() in for the one showing, in one go."""
+        with self.led_state_lock:
+            self.LED_STATE = frame.state
+            self._committed()
+
+    def _committed(self):
+        # with led_state_lock held
+        self.version += 1
+        self.committed.notify_all()
+
+    def wait_for_commit(self, version, timeout=None):
+        """Blocks until the frame is newer than `version`, or for `timeout` seconds.
+        :return: the current version
+        """
+        with self.led_state_lock:
+            self.committed.wait_for(lambda: self.version != version, timeout)
+            return self.version
 
     def clear_presets(self):
         with self.led_state_lock:
             for x in range(3):
                 for y in range(5):
                     self.LED_STATE[x][y] = [0, 0, 0]
+            self._committed()
 
     def clear_all(self):
         with self.led_state_lock:
             for x in range(4):
                 for y in range(5):
                     self.LED_STATE[x][y] = [0, 0, 0]
+            self._committed()
     
     def update(self, x, y, rgb):
+        """Sets one LED and commits it; to change several at once, use begin_frame()."""
         with self.led_state_lock:
             self.LED_STATE[x][y] = rgb
+            self._committed()
 
     def fade_to_black(self, x, y, duration=1.0):
         """Fade the LED at (x, y) to black over `duration` seconds."""
@@ -90,17 +130,21 @@ class LedController:
 
         return animation_step
     
+    def step_animations(self):
+        """Advance every running animation by one step."""
+        with self.animation_lock:
+            completed_animations = []
+            for animation in self.animations:
+                if animation():  # If animation is complete
+                    completed_animations.append(animation)
+            # Remove completed animations
+            for animation in completed_animations:
+                self.animations.remove(animation)
+
     def run_animations(self):
         """Continuously run animations in a separate thread."""
         while True:
-            with self.animation_lock:
-                completed_animations = []
-                for animation in self.animations:
-                    if animation():  # If animation is complete
-                        completed_animations.append(animation)
-                # Remove completed animations
-                for animation in completed_animations:
-                    self.animations.remove(animation)
+            self.step_animations()
             time.sleep(0.01)  # Control loop speed
 
     def add_fade_to_black_animation(self, x, y, duration=1.0):
@@ -112,3 +156,33 @@ class LedController:
         """Add a fade-to-color animation for the LED at (x, y)."""
         with self.animation_lock:
             self.animations.append(self.fade_to_color(x, y, color, duration))
+
+
+class LedFrame:
+    """
+    The next LED frame, drawn with the same update() and clear_all() as LedController but into a
+    buffer of its own. LedController.commit() swaps it in whole, so the keyboard never gets a frame
+    that is half drawn. Also a context manager that commits on leaving the block without an error.
+    """
+
+    def __init__(self, controller, state):
+        self.controller = controller
+        self.state = state
+
+    def update(self, x, y, rgb):
+        self.state[x][y] = rgb
+
+    def clear_all(self):
+        for row in self.state:
+            for y in range(len(row)):
+                row[y] = [0, 0, 0]
+
+    def commit(self):
+        self.controller.commit(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
@@ -1,48 +1,73 @@
 import logging
 from typing import List
 
+from inputControl import MACRO_BUTTONS
+
 
 class LedStateManager:
     """
     Centralised manager that converts high‑level application state into the
     low‑level RGB array consumed by `LedController`.  Call `update()` whenever
-    SharedState or InputController flags change.
+    SharedState or InputController flags change.  With several keyboards each
+    has its own manager, rendering its own station (see KeyboardStation).
     """
 
-    def __init__(self, led_controller, shared_state, input_controller):
+    def __init__(self, led_controller, shared_state, input_controller, station=None):
         self.led = led_controller
         self.state = shared_state
         self.input = input_controller
+        self.station = station or shared_state
 
     # Public API -------------------------------------------------------------
 
     def update(self) -> None:
-        """Recompute every LED based on the latest application state."""
-        self._render_camera_select()
+        """Recompute every LED based on the latest application state. The frame is drawn off to the
+        side and committed in one go, so the keyboard never shows it half drawn."""
+        with self.led.begin_frame() as frame:
+            self._render_camera_select(frame)
 
-        # Always‑present indicators
-        self._render_vertical_lock()
-        self._render_auto_tracking()
+            # Always‑present indicators
+            self._render_vertical_lock(frame)
+            self._render_auto_tracking(frame)
+            self._render_macro_buttons(frame)
 
     # Internal helpers -------------------------------------------------------
 
-    def _render_camera_select(self) -> None:
-        """Palette of cameras with the current one highlighted."""
-        self.led.clear_all()
+    def _render_camera_select(self, frame) -> None:
+        """Palette of cameras with the current one highlighted. Cameras another keyboard has are dimmed
+        further. With a health monitor attached, dead cameras go almost dark (the selected one flashes)
+        and degraded ones flash."""
+        health = self.state.health
         for idx, cam in enumerate(self.state.cameras):
             y, x = idx % 5, idx // 5
             colour: List[int] = cam["color"]
-            if idx == self.state.current_camera_index:
-                self.led.update(x, y, colour)
-            else:
-                self.led.update(x, y, [int(c * 0.3) for c in colour])
+            selected = idx == self.station.current_camera_index
+            owner = self.state.camera_owners.get(idx)
+            brightness = 1.0 if selected else 0.3
+            if owner is not None and owner is not self.station:
+                brightness = 0.1
+            condition = health.state_of(cam["ip"]) if health is not None else "up"
+            if condition == "down":
+                brightness = 1.0 if selected and health.flash_on else 0.05
+            elif condition == "degraded" and not health.flash_on:
+                brightness *= 0.3
+            frame.update(x, y, [int(c * brightness) for c in colour])
 
     # Preset setting rendering removed
 
-    def _render_vertical_lock(self) -> None:
+    def _render_vertical_lock(self, frame) -> None:
         colour = [255, 0, 0] if self.input.vertical_lock_active else [0, 255, 0]
-        self.led.update(3, 4, colour)
+        frame.update(3, 4, colour)
 
-    def _render_auto_tracking(self) -> None:
+    def _render_auto_tracking(self, frame) -> None:
         colour = [255, 0, 0] if self.input.auto_tracking_active else [0, 0, 0]
-        self.led.update(3, 3, colour)
\ No newline at end of file
+        frame.update(3, 3, colour)
+
+    def _render_macro_buttons(self, frame) -> None:
+        """Bound macro buttons that have an LED glow dim blue, and bright while their macro runs."""
+        buttons = self.state.config.get("macro_buttons", [])
+        for name, (x, y) in zip(buttons, MACRO_BUTTONS):
+            if not name or self.led.LED_LUT[x][y] is None:
+                continue
+            running = self.state.macros is not None and self.state.macros.is_running(name)
+            frame.update(x, y, [0, 0, 255] if running else [0, 0, 60])
\ No newline at end of file
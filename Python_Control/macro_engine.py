@@ -0,0 +1,330 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from camera_pool import BROADCAST_ACTIONS
+from timer_wheel import TimerWheel
+
+# How long a macro waits for a command to complete before giving up on it
+DEFAULT_COMPLETION_TIMEOUT = 10.0
+
+
+def validate_steps(steps):
+    """Checks a macro's steps and raises ValueError describing the first problem.
+
+    Steps are dicts of one of these forms:
+      {"command": "recall_preset", "args": [2], "wait": true, "timeout": 10}
+      {"delay": 1.5}
+      {"loop": 3, "steps": [...]}                      (null loops forever)
+      {"tour": [1, 2, 3], "dwell": 5, "fast": false, "loops": null}
+    """
+    if not isinstance(steps, list) or not steps:
+        raise ValueError('A macro needs a non-empty list of steps')
+    for step in steps:
+        if not isinstance(step, dict):
+            raise ValueError(f'Invalid step: {step!r}')
+        if 'command' in step:
+            if step['command'] not in MACRO_COMMANDS:
+                raise ValueError(f'Unknown command "{step["command"]}". Valid commands: {", ".join(MACRO_COMMANDS)}')
+            if not isinstance(step.get('args', []), list):
+                raise ValueError('A command\'s args must be a list')
+        elif 'delay' in step:
+            if not isinstance(step['delay'], (int, float)) or step['delay'] < 0:
+                raise ValueError('A delay must be a non-negative number of seconds')
+        elif 'loop' in step:
+            if step['loop'] is not None and (not isinstance(step['loop'], int) or step['loop'] < 1):
+                raise ValueError('A loop count must be a positive integer or null')
+            validate_steps(step.get('steps'))
+        elif 'tour' in step:
+            if not isinstance(step['tour'], list) or not step['tour']:
+                raise ValueError('A tour needs a non-empty list of presets')
+            if not isinstance(step.get('dwell', 0), (int, float)) or step.get('dwell', 0) < 0:
+                raise ValueError('A tour dwell must be a non-negative number of seconds')
+        else:
+            raise ValueError(f'Invalid step: {step!r}')
+
+
+def validate_cameras(cameras):
+    """Checks a macro's "cameras" value, which may be a list of indices, "all" or None, and raises ValueError if not."""
+    if cameras is None or cameras == 'all':
+        return
+    if not isinstance(cameras, list) or not all(isinstance(index, int) and not isinstance(index, bool) for index in cameras):
+        raise ValueError(f'Invalid cameras {cameras!r}: expected a list of camera indices, "all" or null')
+
+
+def _recall_fast_preset(cam, store, preset_num):
+    position = store.get(cam.ip, preset_num)
+    if position is None:
+        raise KeyError(f'No fast preset {preset_num} for camera {cam.ip}')
+    cam.pantilt(24, 23, position['pan'], position['tilt'])
+    cam.zoom_to(position['zoom'] / 16384)
+
+
+# Commands a macro step can send. Each takes the camera, the fast preset store and the step's args.
+MACRO_COMMANDS = {
+    **{name: (lambda action: lambda cam, store, *args: action(cam, *args))(action)
+       for name, action in BROADCAST_ACTIONS.items()},
+    'pantilt': lambda cam, store, pan_speed, tilt_speed: cam.pantilt(int(pan_speed), int(tilt_speed)),
+    'zoom': lambda cam, store, speed: cam.zoom(int(speed)),
+    'recall_fast_preset': lambda cam, store, preset_num: _recall_fast_preset(cam, store, int(preset_num)),
+}
+
+
+def _expand(steps):
+    """Yields ('command', step) and ('delay', seconds) in execution order, unrolling loops and tours."""
+    for step in steps:
+        if 'command' in step:
+            yield 'command', step
+        elif 'delay' in step:
+            yield 'delay', step['delay']
+        elif 'loop' in step:
+            count = 0
+            while step['loop'] is None or count < step['loop']:
+                yield from _expand(step['steps'])
+                count += 1
+        elif 'tour' in step:
+            command = 'recall_fast_preset' if step.get('fast') else 'recall_preset'
+            tour = []
+            for preset in step['tour']:
+                tour.append({'command': command, 'args': [preset], 'wait': True})
+                if step.get('dwell'):
+                    tour.append({'delay': step['dwell']})
+            yield from _expand([{'loop': step.get('loops'), 'steps': tour}])
+
+
+class MacroRun:
+    """One macro running on one camera. Driven entirely by the engine's timer wheel and worker pool."""
+
+    def __init__(self, engine, name, camera_index, ip, steps):
+        self.engine = engine
+        self.name = name
+        self.camera_index = camera_index
+        self.ip = ip
+        self.status = 'running'
+        self.error = None
+        self.steps_done = 0
+        self.started = time.time()
+
+        self._program = _expand(steps)
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._timer = None
+        self._busy = False  # a command is in flight on the worker pool
+        self._moves = []  # CommandHandles of position moves the macro sent that may still be running
+
+    def start(self):
+        self._timer = self.engine.wheel.schedule(0, self._advance)
+
+    def stop(self):
+        """Pre-empts the macro: a pending delay is dropped and an in-flight command is abandoned as soon
+        as its current round trip returns."""
+        self._cancel.set()
+        if self._timer:
+            self._timer.cancel()
+        self.engine.wheel.schedule(0, self._advance)
+
+    def _advance(self):
+        with self._lock:
+            if self.status != 'running' or self._busy:
+                return
+            if self._cancel.is_set():
+                self._finish('stopped')
+                return
+            try:
+                kind, step = next(self._program)
+            except StopIteration:
+                self._finish('finished')
+                return
+            if kind == 'delay':
+                self.steps_done += 1
+                self._timer = self.engine.wheel.schedule(step, self._advance)
+            else:
+                self._busy = True
+                self.engine.executor.submit(self._run_command, step)
+
+    def _claim_motion(self, step) -> bool:
+        """Speed commands go through the camera's MotionMixer as the 'macro' source, so the keyboard, API
+        and tracker keep priority over them. Returns False for commands that go straight to the camera."""
+        mixer = self.engine.state.get_mixer(self.camera_index)
+        args = step.get('args', [])
+        if step['command'] == 'pantilt':
+            # Mixer speeds use the joystick's sign convention, the opposite of Camera.pantilt
+            mixer.claim('macro', pan=-float(args[0]), tilt=-float(args[1]))
+        elif step['command'] == 'zoom':
+            mixer.claim('macro', zoom=int(args[0]))
+        elif step['command'] == 'stop':
+            # Only the macro's own motion: the axes go back to whichever source claims them next
+            mixer.release('macro')
+            self._cancel_moves()
+        else:
+            return False
+        return True
+
+    def _run_command(self, step):
+        try:
+            if not self._claim_motion(step):
+                self._send(step)
+            self.steps_done += 1
+        except Exception as e:
+            logging.error(f"Macro {self.name} failed on camera {self.camera_index}: {e}")
+            with self._lock:
+                self.error = str(e)
+                self._finish('error')
+        finally:
+            with self._lock:
+                self._busy = False
+        self._timer = self.engine.wheel.schedule(0, self._advance)
+
+    def _send(self, step):
+        cam = self.engine.state.camera_pool.get(self.ip)
+        with cam.track_completions() as sent:
+            MACRO_COMMANDS[step['command']](cam, self.engine.state.fast_presets, *step.get('args', []))
+        self._moves = [handle for handle in self._moves if not handle.done] + list(sent)
+        if step.get('wait'):
+            timeout = step.get('timeout', DEFAULT_COMPLETION_TIMEOUT)
+            completed = cam.wait_for_completion(sent, timeout, cancel=self._cancel)
+            if not completed and self._cancel.is_set():
+                for handle in sent:  # the macro was stopped mid-move
+                    handle.cancel()
+            elif not completed:
+                logging.warning(f"Macro {self.name}: {step['command']} on camera {self.camera_index} "
+                                f"did not complete within {timeout} s")
+
+    def _finish(self, status):
+        """Called with the lock held."""
+        if self.status != 'running':
+            return
+        self.status = status
+        # The next mixer tick sends whatever the remaining claims resolve to
+        self.engine.state.get_mixer(self.camera_index).release('macro')
+        if status == 'stopped' and self._moves:
+            # Abandon the position moves the macro left running
+            self.engine.executor.submit(self._cancel_moves)
+        self.engine._run_finished(self)
+
+    def _cancel_moves(self):
+        moves, self._moves = self._moves, []
+        for handle in moves:
+            try:
+                handle.cancel()
+            except Exception as e:
+                logging.error(f"Could not cancel {handle} on camera {self.camera_index} after macro {self.name}: {e}")
+
+    def describe(self) -> dict:
+        return {
+            'macro': self.name,
+            'status': self.status,
+            'steps_done': self.steps_done,
+            'started': self.started,
+            'error': self.error,
+        }
+
+
+class MacroEngine:
+    """
+    Runs named macros from the "macros" section of config.json on one or many cameras at once:
+      "macros": {"stage_tour": {"cameras": [0, 1], "steps": [{"tour": [1, 2, 3], "dwell": 5}]}}
+    "cameras" may be a list of indices, "all", or left out to use the selected camera.
+    A camera runs one macro at a time; starting another on it stops the first.
+    Keyboard buttons can be bound with "macro_buttons": ["stage_tour", "wide"]. Slot 0 is the button at
+    row 9 and slot 1 the one at row 8 of the last column, above auto tracking; only slot 1 has an LED.
+    """
+
+    def __init__(self, shared_state, max_workers=16):
+        self.state = shared_state
+        self.wheel = TimerWheel()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='macro')
+        self.runs = {}  # camera index -> MacroRun
+        self.last_runs = {}  # camera index -> the most recent finished MacroRun
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.wheel.start()
+        return self
+
+    def stop(self):
+        self.stop_macro()
+        deadline = time.monotonic() + 1.0
+        while self.runs and time.monotonic() < deadline:  # let stopped macros halt their cameras
+            time.sleep(0.01)
+        self.wheel.stop()
+        self.executor.shutdown(wait=True)
+
+    @property
+    def macros(self) -> dict:
+        return self.state.config.get('macros', {})
+
+    def run(self, name, camera_indices=None):
+        """Starts a macro and returns the camera indices it is running on.
+
+        :raises KeyError: if there is no macro with that name
+        :raises ValueError: if the macro or camera indices are invalid
+        """
+        macro = self.macros[name]
+        validate_steps(macro.get('steps'))
+        if camera_indices is None:
+            camera_indices = macro.get('cameras')
+        validate_cameras(camera_indices)
+        if camera_indices is None:
+            camera_indices = [self.state.current_camera_index]
+        elif camera_indices == 'all':
+            camera_indices = list(range(len(self.state.cameras)))
+        invalid = [index for index in camera_indices if not 0 <= index < len(self.state.cameras)]
+        if invalid:
+            raise ValueError(f'Unknown camera indices: {invalid}')
+
+        self.stop_macro(camera_indices=camera_indices)
+        with self._lock:
+            for index in camera_indices:
+                run = MacroRun(self, name, index, self.state.cameras[index]['ip'], macro['steps'])
+                self.runs[index] = run
+                run.start()
+        self.state.update_leds()
+        return list(camera_indices)
+
+    def stop_macro(self, name=None, camera_indices=None):
+        """Stops running macros, optionally only those with this name or on these cameras."""
+        with self._lock:
+            runs = [run for index, run in self.runs.items()
+                    if (name is None or run.name == name) and (camera_indices is None or index in camera_indices)]
+        for run in runs:
+            run.stop()
+        return [run.camera_index for run in runs]
+
+    def is_running(self, name=None, camera_index=None) -> bool:
+        with self._lock:
+            return any((name is None or run.name == name) and (camera_index is None or index == camera_index)
+                       for index, run in self.runs.items())
+
+    def trigger_button(self, slot, camera_index=None):
+        """Toggles the macro bound to a keyboard button: starts it, or stops it if it is running.
+        :param camera_index: the camera of the keyboard pressing it, for macros that don't name their cameras
+        """
+        buttons = self.state.config.get('macro_buttons', [])
+        name = buttons[slot] if slot < len(buttons) else None
+        if not name:
+            return
+        if self.is_running(name):
+            self.stop_macro(name)
+        else:
+            camera_indices = None
+            if camera_index is not None and self.macros.get(name, {}).get('cameras') is None:
+                camera_indices = [camera_index]
+            try:
+                self.run(name, camera_indices)
+            except (KeyError, ValueError) as e:
+                logging.error(f"Could not start macro {name}: {e}")
+
+    def status(self) -> dict:
+        with self._lock:
+            status = {index: run.describe() for index, run in self.last_runs.items()}
+            status.update({index: run.describe() for index, run in self.runs.items()})
+        return status
+
+    def _run_finished(self, run):
+        with self._lock:
+            if self.runs.get(run.camera_index) is run:
+                del self.runs[run.camera_index]
+            self.last_runs[run.camera_index] = run
+        self.state.update_leds()
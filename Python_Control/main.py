@@ -5,8 +5,16 @@ import AutotrackerKeyboard
 from shared_state import SharedState
 import logging
 from api.api import API  # Import the API class
+from api.process import APIProcess
 import sys
 from led_state_manager import LedStateManager
+from detection_service import DetectionService
+from actuation import ActuationPool
+from macro_engine import MacroEngine
+from health_monitor import HealthMonitor
+from session_recorder import SessionRecorder
+from io_reactor import Reactor
+from keyboard_station import KeyboardStation
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -36,16 +44,42 @@ def find_usb_device():
     # No suitable device found
     return None
 
-usb_device = find_usb_device()
+def keyboard_devices():
+    """The serial device of every keyboard, the main one first. Just the one find_usb_device finds
+    unless config.json lists several, e.g. "keyboards": {"devices": ["/dev/ttyUSB0", "/dev/ttyUSB1"]},
+    or has "devices": "auto" for every USB serial device."""
+    # Explicit devices, e.g. the ptys of keyboard_emulator.py, separated by os.pathsep
+    if os.environ.get('AUTOTRACKER_SERIAL'):
+        return os.environ['AUTOTRACKER_SERIAL'].split(os.pathsep)
 
-if usb_device is None:
+    devices = state.config.get('keyboards', {}).get('devices')
+    if devices == 'auto':
+        return sorted(glob.glob('/dev/ttyUSB*')) + sorted(glob.glob('/dev/cu.usbserial*')) + \
+            sorted(glob.glob('/dev/ttyACM*'))
+    if devices:
+        return list(devices)
+    device = find_usb_device()
+    return [device] if device else []
+
+devices = keyboard_devices()
+
+if not devices:
     print("No suitable USB device found. Please check your connections.")
     print("Available tty devices:")
     os.system('ls -l /dev/tty*')
     sys.exit(1)
+usb_device = devices[0]
+
+# With "reactor": true the keyboard, LEDs, health probes and actuation ticks share one I/O thread
+# (io_reactor.py) instead of a thread each, and keyboard input is acted on as soon as it arrives.
+# Extra keyboards always run on it.
+reactor = Reactor() if state.config.get('reactor') or len(devices) > 1 else None
 
 try:
-    Controller = AutotrackerKeyboard.Controller(usb_device)
+    if reactor:
+        Controller = AutotrackerKeyboard.ReactorController(usb_device, reactor)
+    else:
+        Controller = AutotrackerKeyboard.Controller(usb_device)
     state.set_controller(Controller)
 except Exception as e:
     print(f"Error initializing controller with device {usb_device}: {e}")
@@ -60,6 +94,32 @@ led_manager = LedStateManager(Controller.LED, state, Controller.inputCtrl)
 state.set_led_manager(led_manager)
 led_manager.update()
 
+# Extra keyboards, each with its own selected camera, LEDs and joystick
+for number, device in enumerate(devices[1:], start=2):
+    try:
+        keyboard = AutotrackerKeyboard.ReactorController(device, reactor)
+    except Exception as e:
+        print(f"Error initializing keyboard {number} with device {device}: {e}")
+        continue
+    station = KeyboardStation(keyboard, f"keyboard {number} ({device})")
+    station.set_led_manager(LedStateManager(keyboard.LED, state, keyboard.inputCtrl, station))
+    state.add_station(station)
+    print(f"Successfully connected to {device}")
+
+# Probe every camera in the background, so dead ones are skipped and shown on the keyboard
+health = HealthMonitor.from_config(state)
+if reactor:
+    health.attach(reactor)
+else:
+    health.start()
+state.set_health_monitor(health)
+
+# Record joystick input and camera traffic if "recording" is configured
+recorder = SessionRecorder.from_config(state)
+if recorder:
+    state.set_recorder(recorder)
+    print(f"Recording the session to {recorder.path}")
+
 # Attempt to connect to the first available camera
 for i in range(len(state.cameras)):
     if state.connect_to_camera(i):
@@ -68,79 +128,207 @@ for i in range(len(state.cameras)):
 if state.cam is None:
     print("No cameras available. Please check your camera IP addresses.")
 
-# Initialize the API server
-api_server = API(host='0.0.0.0', port=9000, controller=Controller, shared_state=state)
+# Every extra keyboard starts on the first camera no other keyboard has
+for station in state.stations[1:]:
+    for i in range(len(state.cameras)):
+        if i not in state.camera_owners and state.connect_to_camera(i, station):
+            break
+    if station.cam is None:
+        print(f"No free camera for {station.name}")
+state.update_leds()
+
+# Drive every camera's motion (auto tracking on all cameras, joystick on the selected one)
+actuation = ActuationPool(state, reactor=reactor)
+actuation.start()
+state.set_actuation(actuation)
+
+# Timed macros and preset tours, triggered from the macro buttons or the API
+macros = MacroEngine(state).start()
+state.set_macro_engine(macros)
+
+# Initialize the API server, in a process of its own with "api": {"process": true}
+if state.config.get('api', {}).get('process'):
+    api_server = APIProcess(state, host='0.0.0.0', port=9000)
+else:
+    api_server = API(host='0.0.0.0', port=9000, controller=Controller, shared_state=state)
 api_server.start()
 
-try:
-    while True:
-        if state.cam is None:
-            time.sleep(1)
-            continue
+# Optional server-side person detection, e.g. "detection": {"source": "0", "camera_index": 0}
+detection_service = None
+detection_config = state.config.get('detection')
+if detection_config:
+    try:
+        detection_service = DetectionService(
+            detection_config['source'],
+            shared_state=state,
+            camera_index=detection_config.get('camera_index', 0),
+            workers=detection_config.get('workers', 2),
+            detect_width=detection_config.get('detect_width', 320),
+        )
+        detection_service.start()
+        state.set_detection_service(detection_service)
+    except Exception as e:
+        logging.error(f"Could not start person detection: {e}")
+        detection_service = None
 
-        if not Controller.are_threads_alive():
-            print("One or more threads have crashed. Shutting down...")
-            break
+def blocking(function, *args):
+    """Runs something that waits on a camera: in line in the threaded loop, off the reactor thread
+    (in order) with the reactor."""
+    if reactor:
+        reactor.run_in_executor(function, *args)
+    else:
+        function(*args)
 
-        # Auto Tracking LED update
-        if Controller.inputCtrl.auto_tracking_changed:
-            state.update_leds()
-            Controller.inputCtrl.auto_tracking_changed = False
-        
-
-        # Camera change handling
-        if Controller.inputCtrl.camera_changed:
-            new_camera_index = Controller.inputCtrl.selected_camera
-            logging.info(f"Attempting to switch to camera {new_camera_index}")
-            if state.connect_to_camera(new_camera_index):
-                logging.info(f"Successfully switched to camera at {state.cameras[state.current_camera_index]['ip']}")
-                state.update_leds()
-            else:
-                logging.error(f"Failed to switch to camera at index {new_camera_index}")
-            Controller.inputCtrl.camera_changed = False
-
-
-        # Pan/tilt updates
-        if Controller.inputCtrl.pan != state.currentPan or Controller.inputCtrl.tilt != state.currentTilt:
-            state.update_pan_tilt(Controller.inputCtrl.pan, Controller.inputCtrl.tilt)
-
-        # Zoom updates
-        if Controller.inputCtrl.zoom != state.currentZoom:
-            state.update_zoom(Controller.inputCtrl.zoom)
-
-        # Vertical Lock LED update
-        if Controller.inputCtrl.vertical_lock_changed:
+
+def switch_camera(new_camera_index, station=state):
+    logging.info(f"Attempting to switch {station.name} to camera {new_camera_index}")
+    if state.connect_to_camera(new_camera_index, station):
+        logging.info(f"Successfully switched to camera at {state.cameras[station.current_camera_index]['ip']}")
+        state.update_leds()
+    else:
+        logging.error(f"Failed to switch to camera at index {new_camera_index}")
+
+
+def restart():
+    logging.info("Long press detected (>5 s). Restarting script…")
+
+    # Best‑effort cleanup
+    try:
+        api_server.stop()
+    except Exception:
+        pass
+    try:
+        if detection_service:
+            detection_service.stop()
+    except Exception:
+        pass
+    try:
+        macros.stop()
+    except Exception:
+        pass
+    try:
+        actuation.stop()
+    except Exception:
+        pass
+    try:
+        health.stop()
+    except Exception:
+        pass
+    try:
+        if recorder:
+            recorder.close()
+    except Exception:
+        pass
+    try:
+        Controller.close()
+    except Exception:
+        pass
+    for station in state.stations[1:]:
+        try:
+            station.controller.close()
+        except Exception:
+            pass
+
+    # Re‑exec the current Python program
+    os.execv(sys.executable, ['python'] + sys.argv)
+
+
+def process_controls(station=state):
+    """Acts on whatever a keyboard (or the API) changed since the last pass.
+    :param station: the keyboard's KeyboardStation, or `state` for the main keyboard
+    :return: False if the program should shut down
+    """
+    if station is state and state.cam is None:
+        return True
+    inputs = station.controller.inputCtrl
+
+    if not station.controller.are_threads_alive():
+        if station is not state:
+            # An extra keyboard going away leaves the others running
+            print(f"Lost {station.name}, releasing its camera")
+            state.remove_station(station)
+            station.controller.close()
             state.update_leds()
-            Controller.inputCtrl.vertical_lock_changed = False
-
-        # Home camera on short press release (long press restart handled elsewhere)
-        if Controller.inputCtrl.home_short_release:
-            state.home_camera()
-            Controller.inputCtrl.home_short_release = False
-
-        # Restart the script when a ≥5 s long‑press on the home button is detected
-        if Controller.inputCtrl.restart_requested:
-            logging.info("Long press detected (>5 s). Restarting script…")
-
-            # Best‑effort cleanup
-            try:
-                api_server.stop()
-            except Exception:
-                pass
-            try:
-                Controller.close()
-            except Exception:
-                pass
-
-            # Re‑exec the current Python program
-            os.execv(sys.executable, ['python'] + sys.argv)
-
-        time.sleep(0.005)
+            return True
+        print("One or more threads have crashed. Shutting down...")
+        return False
+
+    # Auto Tracking LED update
+    if inputs.auto_tracking_changed:
+        state.update_leds()
+        inputs.auto_tracking_changed = False
+
+    # Camera change handling
+    if inputs.camera_changed:
+        blocking(switch_camera, inputs.selected_camera, station)
+        inputs.camera_changed = False
+
+    # Pan/tilt/zoom updates: the mixer recombines joystick and auto tracking whenever either
+    # changes and only sends VISCA when the quantised output differs
+    state.update_joystick(inputs.pan, inputs.tilt, inputs.zoom, station)
+
+    # Vertical Lock LED update
+    if inputs.vertical_lock_changed:
+        state.update_leds()
+        inputs.vertical_lock_changed = False
+
+    # Macro buttons toggle the macro bound to them in config.json
+    if inputs.macro_button_pressed:
+        inputs.macro_button_pressed = False
+        macros.trigger_button(inputs.macro_button, station.current_camera_index)
+
+    # Home camera on short press release (long press restart handled elsewhere)
+    if inputs.home_short_release:
+        blocking(state.home_camera, station)
+        inputs.home_short_release = False
+
+    # Restart the script when a ≥5 s long‑press on the home button is detected
+    if inputs.restart_requested:
+        restart()
+    return True
+
+
+def process_controls_on_reactor(station=state):
+    if not process_controls(station):
+        reactor.stop()
+
+
+def process_all_controls_on_reactor():
+    for station in list(state.stations):
+        process_controls_on_reactor(station)
+
+
+try:
+    if reactor:
+        # Straight after each batch of keyboard input, and regularly for changes made elsewhere (the API)
+        for station in state.stations:
+            station.controller.on_input = lambda station=station: process_controls_on_reactor(station)
+        reactor.call_every(0.02, process_all_controls_on_reactor)
+        reactor.run()
+    else:
+        while True:
+            if state.cam is None:
+                time.sleep(1)
+                continue
+            if not process_controls():
+                break
+            time.sleep(0.005)
 except Exception as e:
     print(f"An error occurred in the main loop: {e}")
 finally:
     print("Shutting down...")
     api_server.stop()
+    if detection_service:
+        detection_service.stop()
+    macros.stop()
+    actuation.stop()
+    health.stop()
+    if recorder:
+        recorder.close()
     Controller.close()
+    for station in state.stations[1:]:
+        station.controller.close()
+    if reactor:
+        reactor.stop()
     print('Closed')
     os._exit(0)
\ No newline at end of file
@@ -0,0 +1,256 @@
+import logging
+import time
+from threading import Lock
+
+from speed_synth import SpeedSynthesizer
+
+# Motion sources, highest priority first. A higher-priority claim pre-empts lower ones at once.
+SOURCE_PRIORITIES = {
+    'keyboard': 40,
+    'api': 30,
+    'tracker': 20,
+    'macro': 10,
+}
+
+# How long a tracker command stays in force without being renewed
+TRACKER_LEASE = 1.0
+
+
+class _Claim:
+    __slots__ = ('pan', 'tilt', 'zoom', 'expires')
+
+    def __init__(self, pan, tilt, zoom, expires):
+        self.pan = pan
+        self.tilt = tilt
+        self.zoom = zoom
+        self.expires = expires
+
+
+class MotionMixer:
+    """
+    Owns the final pan/tilt/zoom output for one camera.
+
+    Each motion source (keyboard, API, auto-tracking, macros) claims the axes it wants to move,
+    optionally with a lease that lapses unless renewed. Pan/tilt and zoom are arbitrated separately:
+    each goes to the highest-priority source currently claiming it, so an operator zooming doesn't
+    stop the tracker panning. `tick()` runs at a fixed rate, dithers pan/tilt through
+    SpeedSynthesizers and sends at most one VISCA command per tick, only when the output changes.
+    """
+
+    def __init__(self, camera=None, rate=20.0):
+        """:param camera: the Camera to drive, may be attached later with `set_camera`
+        :param rate: maximum pan/tilt re-quantisations per second while dithering
+        """
+        self.camera = camera
+        self.pan_synth = SpeedSynthesizer(rate=rate)
+        self.tilt_synth = SpeedSynthesizer(rate=rate)
+
+        self.pan_tilt_claims = {}  # source -> _Claim
+        self.zoom_claims = {}  # source -> _Claim
+        self.auto_enabled = False
+        self.pan_tilt_owner = None
+        self.zoom_owner = None
+
+        self.zoom_output = 0
+        self.pan_tilt_sent = (0, 0)
+
+        self.commands_sent = 0
+        self.commands_suppressed = 0
+        self.send_errors = 0
+        self.preemptions = 0
+        self.lease_expiries = 0
+
+        self._dirty = False
+        self._next_expiry = None
+        self._lock = Lock()  # guards inputs, which may be set from any thread
+        self._tick_lock = Lock()  # one tick at a time, so an output is never sent twice
+
+    # Inputs -----------------------------------------------------------------
+
+    def set_camera(self, camera):
+        with self._lock:
+            self.camera = camera
+            self.pan_synth.reset()
+            self.tilt_synth.reset()
+            self.zoom_output = 0
+            self.pan_tilt_sent = (0, 0)
+            self._dirty = True
+
+    def claim(self, source, pan=None, tilt=None, zoom=None, lease=None):
+        """Sets a source's requested speeds. Pan/tilt and zoom are claimed independently: pass None to
+        leave an axis group alone, or 0 to actively hold it still.
+
+        :param source: one of SOURCE_PRIORITIES
+        :param lease: seconds until the claim lapses unless renewed, None for no expiry
+        """
+        if source not in SOURCE_PRIORITIES:
+            raise ValueError(f'Unknown motion source "{source}"')
+        expires = None if lease is None else time.monotonic() + lease
+        with self._lock:
+            if pan is not None or tilt is not None:
+                self._set_claim(self.pan_tilt_claims, source, _Claim(pan or 0.0, tilt or 0.0, None, expires))
+            if zoom is not None:
+                self._set_claim(self.zoom_claims, source, _Claim(None, None, zoom, expires))
+            if expires is not None and (self._next_expiry is None or expires < self._next_expiry):
+                self._next_expiry = expires
+
+    def release(self, source, pan_tilt=True, zoom=True):
+        """Withdraws a source's claims, handing the axes back to the next source in line."""
+        with self._lock:
+            if pan_tilt and self.pan_tilt_claims.pop(source, None) is not None:
+                self._dirty = True
+            if zoom and self.zoom_claims.pop(source, None) is not None:
+                self._dirty = True
+
+    def _set_claim(self, claims, source, new):
+        old = claims.get(source)
+        claims[source] = new
+        if old is None or (old.pan, old.tilt, old.zoom) != (new.pan, new.tilt, new.zoom):
+            self._dirty = True
+
+    def set_joystick(self, pan, tilt, zoom):
+        """The keyboard holds an axis group only while its stick is off centre."""
+        with self._lock:
+            if pan or tilt:
+                self._set_claim(self.pan_tilt_claims, 'keyboard', _Claim(pan, tilt, None, None))
+            elif self.pan_tilt_claims.pop('keyboard', None) is not None:
+                self._dirty = True
+            if zoom:
+                self._set_claim(self.zoom_claims, 'keyboard', _Claim(None, None, zoom, None))
+            elif self.zoom_claims.pop('keyboard', None) is not None:
+                self._dirty = True
+
+    def set_auto(self, pan_speed, tilt_speed):
+        """Auto-tracking commands hold pan/tilt for TRACKER_LEASE seconds; a silent tracker lets go."""
+        self.claim('tracker', pan_speed, tilt_speed, lease=TRACKER_LEASE)
+
+    def set_auto_enabled(self, enabled):
+        with self._lock:
+            if enabled != self.auto_enabled:
+                self.auto_enabled = enabled
+                self._dirty = True
+
+    # Arbitration ------------------------------------------------------------
+
+    def _expire(self, now):
+        """Drops lapsed claims. Called with the lock held."""
+        if self._next_expiry is None or now < self._next_expiry:
+            return
+        self._next_expiry = None
+        for claims in (self.pan_tilt_claims, self.zoom_claims):
+            for source, claim in list(claims.items()):
+                if claim.expires is None:
+                    continue
+                if claim.expires <= now:
+                    del claims[source]
+                    self.lease_expiries += 1
+                    self._dirty = True
+                elif self._next_expiry is None or claim.expires < self._next_expiry:
+                    self._next_expiry = claim.expires
+
+    def _winner(self, claims):
+        candidates = [source for source in claims if source != 'tracker' or self.auto_enabled]
+        if not candidates:
+            return None
+        return max(candidates, key=SOURCE_PRIORITIES.__getitem__)
+
+    # Output -----------------------------------------------------------------
+
+    def tick(self, now=None):
+        """Re-arbitrates if any claim changed or lapsed, advances dithering and sends at most one
+        command. Call at a fixed rate."""
+        with self._tick_lock:
+            self._send_planned(self._plan(time.monotonic() if now is None else now))
+
+    def plan(self, now=None):
+        """The first half of a tick, for callers that send somewhere else (e.g. off an event loop):
+        re-arbitrates and returns the command the tick would send, or None. Pass it to `send_planned`
+        and don't plan again until that returns."""
+        with self._tick_lock:
+            return self._plan(time.monotonic() if now is None else now)
+
+    def send_planned(self, planned):
+        """The second half of a tick: sends what `plan` returned. Blocks for the VISCA round trip."""
+        with self._tick_lock:
+            self._send_planned(planned)
+
+    def _plan(self, now):
+        with self._lock:
+            self._expire(now)
+            recomputed = self._dirty
+            if self._dirty:
+                self._dirty = False
+                pan_tilt_owner = self._winner(self.pan_tilt_claims)
+                zoom_owner = self._winner(self.zoom_claims)
+                if self._preempted(self.pan_tilt_owner, pan_tilt_owner):
+                    self.preemptions += 1
+                if self._preempted(self.zoom_owner, zoom_owner):
+                    self.preemptions += 1
+                self.pan_tilt_owner, self.zoom_owner = pan_tilt_owner, zoom_owner
+
+                claim = self.pan_tilt_claims.get(pan_tilt_owner)
+                self.pan_synth.set_target(claim.pan if claim else 0.0)
+                self.tilt_synth.set_target(claim.tilt if claim else 0.0)
+            self.pan_synth.update(now)
+            self.tilt_synth.update(now)
+            pan_tilt = (self.pan_synth.output, self.tilt_synth.output)
+            zoom_claim = self.zoom_claims.get(self.zoom_owner)
+            zoom = max(-7, min(7, int(zoom_claim.zoom))) if zoom_claim else 0
+            camera = self.camera
+
+        # One command per tick: a pending zoom change goes out on the next tick
+        if pan_tilt != self.pan_tilt_sent:
+            return camera, 'pan_tilt', pan_tilt
+        if zoom != self.zoom_output:
+            return camera, 'zoom', zoom
+        if recomputed:
+            self.commands_suppressed += 1
+        return None
+
+    def _send_planned(self, planned):
+        if planned is None:
+            return
+        camera, axis, value = planned
+        if axis == 'pan_tilt':
+            if self._send(camera, lambda: camera.pantilt(pan_speed=-value[0], tilt_speed=-value[1])):
+                self.pan_tilt_sent = value
+        elif self._send(camera, lambda: camera.zoom(speed=value)):
+            self.zoom_output = value
+
+    @staticmethod
+    def _preempted(old, new):
+        return old is not None and new is not None and SOURCE_PRIORITIES[new] > SOURCE_PRIORITIES[old]
+
+    def stop(self):
+        """Drops every claim and sends the resulting stop."""
+        with self._lock:
+            self.pan_tilt_claims.clear()
+            self.zoom_claims.clear()
+            self._dirty = True
+        self.tick()
+        self.tick()  # the zoom stop, if pan/tilt took the first tick
+
+    def _send(self, camera, command) -> bool:
+        if camera is None:
+            return False
+        try:
+            command()
+            self.commands_sent += 1
+            return True
+        except Exception as e:
+            self.send_errors += 1
+            logging.error(f"Error sending motion command: {e}")
+            return False
+
+    def stats(self) -> dict:
+        return {
+            'pan_tilt': list(self.pan_tilt_sent),
+            'zoom': self.zoom_output,
+            'pan_tilt_owner': self.pan_tilt_owner,
+            'zoom_owner': self.zoom_owner,
+            'commands_sent': self.commands_sent,
+            'commands_suppressed': self.commands_suppressed,
+            'send_errors': self.send_errors,
+            'preemptions': self.preemptions,
+            'lease_expiries': self.lease_expiries,
+        }
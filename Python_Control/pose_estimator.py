@@ -0,0 +1,218 @@
+import logging
+import math
+import time
+from threading import Lock
+
+from ViscaOverIP.positions import PAN_LIMIT, TILT_MAX, TILT_MIN, ZOOM_MAX, decode_nibbles
+
+# How fast each model moves, in position units per second. "pan"/"tilt" are per VISCA speed step
+# (a number for a linear response, or a list indexed by step), "zoom" per zoom speed step.
+# "zoom_ratio" is the optical zoom at ZOOM_MAX, used to turn zoom position into magnification.
+# A camera's "speed_table" entry in config.json overrides its model's table. 'default' is only a
+# guess, good enough to keep the estimate between corrections; see PoseEstimator.calibrated.
+SPEED_TABLES = {
+    'default': {'pan': 40.0, 'tilt': 40.0, 'zoom': 1600.0, 'zoom_ratio': 20.0},
+    0x0519: {'pan': 40.0, 'tilt': 40.0, 'zoom': 1600.0, 'zoom_ratio': 20.0},  # ViscaOverIP.simulator
+}
+
+# Re-read the real position this often, sooner while the camera is moving
+IDLE_CORRECTION_INTERVAL = 2.0
+MOVING_CORRECTION_INTERVAL = 0.5
+
+
+class _Axis:
+    __slots__ = ('position', 'velocity', 'target', 'low', 'high')
+
+    def __init__(self, low, high):
+        self.position = 0.0
+        self.velocity = 0.0  # units per second, always pointing at `target` if there is one
+        self.target = None  # absolute move in progress
+        self.low = low
+        self.high = high
+
+    def advance(self, elapsed):
+        if not self.velocity:
+            return
+        position = self.position + self.velocity * elapsed
+        if self.target is not None and (position - self.target) * self.velocity >= 0:
+            position, self.velocity, self.target = self.target, 0.0, None
+        self.position = max(self.low, min(self.high, position))
+
+    def drive(self, velocity):
+        self.velocity = velocity
+        self.target = None
+
+    def move_to(self, target, speed):
+        self.target = max(self.low, min(self.high, target))
+        self.velocity = math.copysign(speed, self.target - self.position) if self.target != self.position else 0.0
+
+
+class PoseEstimator:
+    """
+    Estimates where one camera is pointing without asking it.
+
+    Every command sent to the camera is fed to `observe()`, which turns it into axis velocities using
+    the model's speed table. `pose()` integrates those velocities, so reading it costs nothing.
+    The estimate drifts, so it is pulled back to the truth with occasional pipelined inquiries
+    (see `correction_due` and `correct`).
+    """
+
+    def __init__(self, table=None):
+        self.table = dict(table or SPEED_TABLES['default'])
+        self.pan = _Axis(-PAN_LIMIT, PAN_LIMIT)
+        self.tilt = _Axis(TILT_MIN, TILT_MAX)
+        self.zoom = _Axis(0, ZOOM_MAX)
+        self.known = False  # False until the first correction, or after a move we can't predict
+        self.calibrated = table is not None  # False while the table is the 'default' guess
+        self.model = None
+
+        self.corrections = 0
+        self.last_error = (0.0, 0.0, 0.0)  # estimate minus measurement at the last correction
+        self.corrected_at = None
+        self._last_attempt = None
+
+        self.camera = None
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    # Camera attachment ------------------------------------------------------
+
+    def attach(self, camera, table=None):
+        """Starts following `camera`. The speed table comes from `table`, else from the camera's model."""
+        self.detach()
+        if table is None:
+            try:
+                self.model = camera.get_version()['model']
+                table = SPEED_TABLES.get(self.model)
+            except Exception as e:
+                logging.warning(f"Could not read the model of camera {camera.ip}: {e}")
+        with self._lock:
+            self.table = {**SPEED_TABLES['default'], **(table or {})}
+            self.calibrated = table is not None
+            self.known = False
+        self.camera = camera
+        camera.command_listeners.append(self.observe)
+
+    def detach(self):
+        if self.camera is not None and self.observe in self.camera.command_listeners:
+            self.camera.command_listeners.remove(self.observe)
+        self.camera = None
+
+    # Model ------------------------------------------------------------------
+
+    def _speed(self, axis, step):
+        rate = self.table[axis]
+        if isinstance(rate, (list, tuple)):
+            return float(rate[min(step, len(rate) - 1)])
+        return rate * step
+
+    def _advance(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        if elapsed > 0:
+            for axis in (self.pan, self.tilt, self.zoom):
+                axis.advance(elapsed)
+
+    def observe(self, command_hex, now=None):
+        """Updates the motion model from a VISCA command (the hex between 81 01 and FF)."""
+        body = bytes.fromhex(command_hex)
+        if len(body) < 2:
+            return
+        now = time.monotonic() if now is None else now
+        directions = {0x01: -1, 0x02: 1}
+        with self._lock:
+            self._advance(now)
+            category, command = body[0], body[1]
+            if category == 0x06 and command == 0x01 and len(body) >= 6:  # pan/tilt drive
+                self.pan.drive(directions.get(body[4], 0) * self._speed('pan', body[2]))
+                self.tilt.drive(directions.get(body[5], 0) * self._speed('tilt', body[3]))
+            elif category == 0x06 and command in (0x02, 0x03) and len(body) >= 12:  # absolute / relative
+                pan, tilt = decode_nibbles(body[4:8]), decode_nibbles(body[8:12])
+                if command == 0x03:
+                    pan, tilt = self.pan.position + pan, self.tilt.position + tilt
+                self.pan.move_to(pan, self._speed('pan', max(body[2], 1)))
+                self.tilt.move_to(tilt, self._speed('tilt', max(body[3], 1)))
+            elif category == 0x06 and command == 0x04:  # home
+                self.pan.move_to(0, self._speed('pan', 24))
+                self.tilt.move_to(0, self._speed('tilt', 23))
+            elif category == 0x04 and command == 0x07 and len(body) >= 3:  # zoom drive
+                direction = {0x2: 1, 0x3: -1}.get(body[2] >> 4, 0)
+                self.zoom.drive(direction * self._speed('zoom', max(body[2] & 0x0F, 1)))
+            elif category == 0x04 and command == 0x47 and len(body) >= 6:  # zoom direct
+                self.zoom.move_to(decode_nibbles(body[2:6], signed=False), self._speed('zoom', 7))
+            elif category == 0x06 and command == 0x05 or category == 0x04 and command == 0x3F and body[2:3] == b'\x02':
+                # Pan/tilt reset and preset recall go somewhere we can't predict
+                for axis in (self.pan, self.tilt, self.zoom):
+                    axis.drive(0.0)
+                self.known = False
+
+    def pose(self, now=None) -> dict:
+        """The current estimate, without touching the network."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._advance(now)
+            return {
+                'pan': self.pan.position,
+                'tilt': self.tilt.position,
+                'zoom': self.zoom.position,
+                'moving': self.moving,
+                'known': self.known,
+                'since_correction': None if self.corrected_at is None else now - self.corrected_at,
+            }
+
+    @property
+    def moving(self) -> bool:
+        return any(axis.velocity for axis in (self.pan, self.tilt, self.zoom))
+
+    def magnification(self) -> float:
+        """Approximate optical magnification: zoom lenses are close to exponential in zoom position."""
+        with self._lock:
+            self._advance(time.monotonic())
+            return self.table['zoom_ratio'] ** (self.zoom.position / ZOOM_MAX)
+
+    # Correction -------------------------------------------------------------
+
+    def correction_due(self, now=None) -> bool:
+        now = time.monotonic() if now is None else now
+        if self._last_attempt is None:
+            return True
+        interval = MOVING_CORRECTION_INTERVAL if self.moving or not self.known else IDLE_CORRECTION_INTERVAL
+        return now - self._last_attempt >= interval
+
+    def correct(self, pan, tilt, zoom, measured_at, now=None):
+        """Pulls the estimate onto a measurement taken at `measured_at` (e.g. the middle of the round
+        trip), carrying it forward to now with the current velocities."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._advance(now)
+            carried = now - measured_at
+            errors = []
+            for axis, measured in ((self.pan, pan), (self.tilt, tilt), (self.zoom, zoom)):
+                errors.append(axis.position - axis.velocity * carried - measured)
+                axis.position = measured
+                axis.advance(carried)
+            self.last_error = tuple(errors)
+            self.known = True
+            self.corrections += 1
+            self.corrected_at = now
+
+    def correct_from(self, camera) -> bool:
+        """Reads the camera's position (one pipelined round trip) and corrects the estimate."""
+        sent = self._last_attempt = time.monotonic()
+        try:
+            pan, tilt, zoom = camera.get_pose()
+        except Exception as e:
+            logging.debug(f"Position inquiry failed for camera {camera.ip}: {e}")
+            return False
+        received = time.monotonic()
+        self.correct(pan, tilt, zoom, (sent + received) / 2, received)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            **self.pose(),
+            'model': self.model,
+            'calibrated': self.calibrated,
+            'corrections': self.corrections,
+            'last_error': list(self.last_error),
+        }
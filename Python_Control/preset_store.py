@@ -0,0 +1,72 @@
+import json
+import logging
+import os
+import time
+from threading import Lock
+
+
+class FastPresetStore:
+    """
+    Presets kept on this machine instead of in the camera.
+
+    Saving reads the camera's absolute pan/tilt/zoom through inquiries. Recalling drives pan/tilt
+    and zoom to those positions together at full speed, rather than at the camera's own (usually
+    slow) preset speed, and waits for the camera to report both moves complete.
+    Presets are keyed by camera IP so they survive reordering cameras in config.json.
+    """
+
+    def __init__(self, path='fast_presets.json'):
+        self.path = path
+        self._lock = Lock()
+        self.presets = {}  # {camera ip: {preset number (str): {'pan': int, 'tilt': int, 'zoom': int}}}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.presets = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.error(f"Could not load fast presets from {path}: {e}")
+
+    def get(self, ip, preset_num):
+        with self._lock:
+            return self.presets.get(ip, {}).get(str(preset_num))
+
+    def list(self, ip):
+        with self._lock:
+            return dict(self.presets.get(ip, {}))
+
+    def save(self, camera, preset_num):
+        """Captures the camera's current position as a preset and writes the store to disk."""
+        pan, tilt = camera.get_pantilt_position()
+        zoom = camera.get_zoom_position()
+        position = {'pan': pan, 'tilt': tilt, 'zoom': zoom}
+        with self._lock:
+            self.presets.setdefault(camera.ip, {})[str(preset_num)] = position
+            self._write()
+        return position
+
+    def delete(self, ip, preset_num) -> bool:
+        with self._lock:
+            removed = self.presets.get(ip, {}).pop(str(preset_num), None)
+            if removed is not None:
+                self._write()
+        return removed is not None
+
+    def recall(self, camera, preset_num, timeout=10.0):
+        """Moves the camera to a saved preset.
+
+        :return: {'ready': whether the camera reported the shot complete in time, 'elapsed_ms', 'position'}
+        :raises KeyError: if no such preset has been saved for this camera
+        """
+        position = self.get(camera.ip, preset_num)
+        if position is None:
+            raise KeyError(f"No fast preset {preset_num} for camera {camera.ip}")
+        started = time.perf_counter()
+        ready = camera.move_to(position['pan'], position['tilt'], position['zoom'], timeout=timeout)
+        return {'ready': ready, 'elapsed_ms': (time.perf_counter() - started) * 1000, 'position': position}
+
+    def _write(self):
+        # Write to a temporary file first so a crash never leaves a half-written store behind
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.presets, f, indent=2)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,234 @@
+"""
+Records what the operator and the cameras did, for looking into "the camera lagged" reports.
+
+Records are appended to a memory-mapped log file of fixed size. When it fills up it is rotated
+(session.atrec -> session.atrec.1 -> ...) and a fresh one is started, keeping `files` files in all.
+A file is a 24 byte header followed by records, all little endian:
+
+    header: magic b'ATRC' | version (uint16) | reserved (uint16) | wall clock at start (float64)
+            | monotonic clock at start, ns (uint64)
+    record: kind (uint8) | aux (uint8) | payload length (uint16) | monotonic time, ns (uint64) | payload
+
+    kind 1  serial frame     aux: keyboard (0 the main one), payload: the frame's fields joined with commas,
+                             e.g. b'1,-12'
+    kind 2  VISCA sent       payload: camera IPv4 address (4 bytes) + the datagram
+    kind 3  VISCA received   payload: camera IPv4 address (4 bytes) + the datagram
+    kind 4  auto tracking    aux: camera index, payload: pan speed, tilt speed (2 x float32)
+
+The unused tail of a file is zeros, so a record of kind 0 marks the end.
+
+Decode a log from Python_Control:  python -m session_recorder recordings/session.atrec
+"""
+import argparse
+import glob
+import logging
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+
+MAGIC = b'ATRC'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sHHdQ')
+RECORD_HEADER = struct.Struct('<BBHQ')
+AUTOTRACK = struct.Struct('<ff')
+
+SERIAL_FRAME = 1
+VISCA_SENT = 2
+VISCA_RECEIVED = 3
+AUTOTRACK_COMMAND = 4
+
+KIND_NAMES = {SERIAL_FRAME: 'serial', VISCA_SENT: 'visca>', VISCA_RECEIVED: 'visca<', AUTOTRACK_COMMAND: 'track'}
+
+
+class SessionRecorder:
+    """
+    Appends records to a rotating, memory-mapped log. Recording is a lock, a struct pack and a slice
+    copy into the mapping, a few microseconds, so it can sit on the serial, VISCA and API hot paths;
+    the OS writes the pages back in its own time.
+    """
+
+    def __init__(self, path, size_mb=16, files=4):
+        """:param path: the log file; rotated copies get .1, .2, ... appended
+        :param size_mb: size of each file
+        :param files: how many files to keep, counting the one being written
+        """
+        self.path = path
+        self.size = int(size_mb * 1024 * 1024)
+        self.files = max(1, files)
+        self.records = 0
+        self.rotations = 0
+        self._lock = threading.Lock()
+        self._addresses = {}  # camera ip -> packed IPv4 address
+        self._file = None
+        self._mm = None
+        self._position = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._open(rotate=os.path.exists(path))  # never overwrite an earlier session
+
+    @classmethod
+    def from_config(cls, shared_state):
+        """Builds the recorder described by config "recording": {"path": ..., "size_mb": 16, "files": 4},
+        or returns None if recording isn't configured."""
+        settings = shared_state.config.get('recording')
+        if not settings:
+            return None
+        return cls(settings.get('path', 'recordings/session.atrec'), settings.get('size_mb', 16),
+                   settings.get('files', 4))
+
+    # Recording --------------------------------------------------------------
+
+    def serial_frame(self, fields, keyboard=0):
+        """:param fields: a parsed frame from the keyboard, e.g. [b'1', b'-12']
+        :param keyboard: which keyboard sent it, 0 for the main one
+        """
+        self._append(SERIAL_FRAME, keyboard, b','.join(fields))
+
+    def visca(self, sent: bool, ip: str, datagram: bytes):
+        address = self._addresses.get(ip)
+        if address is None:
+            try:
+                address = socket.inet_aton(ip)
+            except OSError:  # a hostname
+                address = bytes(4)
+            self._addresses[ip] = address
+        self._append(VISCA_SENT if sent else VISCA_RECEIVED, 0, address + datagram)
+
+    def autotrack(self, camera_index: int, pan_speed: float, tilt_speed: float):
+        self._append(AUTOTRACK_COMMAND, camera_index & 0xFF, AUTOTRACK.pack(pan_speed, tilt_speed))
+
+    def _append(self, kind, aux, payload):
+        length = RECORD_HEADER.size + len(payload)
+        with self._lock:
+            if self._mm is None:
+                return
+            if self._position + length > self.size:
+                self._rotate()
+            RECORD_HEADER.pack_into(self._mm, self._position, kind, aux, len(payload), time.monotonic_ns())
+            self._mm[self._position + RECORD_HEADER.size:self._position + length] = payload
+            self._position += length
+            self.records += 1
+
+    # Files ------------------------------------------------------------------
+
+    def _open(self, rotate=False):
+        if rotate:
+            for index in range(self.files - 1, 0, -1):
+                older = f'{self.path}.{index}'
+                newer = self.path if index == 1 else f'{self.path}.{index - 1}'
+                if os.path.exists(newer):
+                    os.replace(newer, older)
+            if self.files == 1 and os.path.exists(self.path):
+                os.remove(self.path)
+        self._file = open(self.path, 'w+b')
+        self._file.truncate(self.size)  # sparse zeros: the end of the records is wherever zeros start
+        self._mm = mmap.mmap(self._file.fileno(), self.size)
+        FILE_HEADER.pack_into(self._mm, 0, MAGIC, VERSION, 0, time.time(), time.monotonic_ns())
+        self._position = FILE_HEADER.size
+
+    def _close(self):
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm.close()
+            self._file.close()
+            self._mm = None
+
+    def _rotate(self):
+        """Called with the lock held."""
+        self._close()
+        self._open(rotate=True)
+        self.rotations += 1
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def stats(self) -> dict:
+        return {'path': self.path, 'records': self.records, 'rotations': self.rotations,
+                'bytes_used': self._position, 'file_size': self.size}
+
+
+# Reading ------------------------------------------------------------------------
+
+def log_files(path) -> list:
+    """The files of a rotated log, oldest first."""
+    rotated = [name for name in glob.glob(f'{glob.escape(path)}.*') if name.rsplit('.', 1)[1].isdigit()]
+    rotated.sort(key=lambda name: int(name.rsplit('.', 1)[1]), reverse=True)
+    return rotated + ([path] if os.path.exists(path) else [])
+
+
+def read_records(path):
+    """Yields (monotonic_ns, kind, aux, payload) from one log file, plus the file's header first as
+    ('header', wall clock at start, monotonic ns at start).
+
+    :raises ValueError: if it isn't a session log
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < FILE_HEADER.size:
+        raise ValueError(f'{path} is too short to be a session log')
+    magic, version, _, wall_start, mono_start = FILE_HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} session log')
+    yield 'header', wall_start, mono_start
+    position = FILE_HEADER.size
+    while position + RECORD_HEADER.size <= len(data):
+        kind, aux, length, timestamp = RECORD_HEADER.unpack_from(data, position)
+        if kind == 0:
+            break
+        position += RECORD_HEADER.size
+        yield timestamp, kind, aux, data[position:position + length]
+        position += length
+
+
+def describe(kind, aux, payload) -> str:
+    if kind == SERIAL_FRAME:
+        frame = payload.decode(errors='replace')
+        return f'keyboard {aux + 1} {frame}' if aux else frame  # numbered as main.py names them
+    if kind in (VISCA_SENT, VISCA_RECEIVED):
+        ip, datagram = socket.inet_ntoa(payload[:4]), payload[4:]
+        sequence = int.from_bytes(datagram[4:8], 'big')
+        return f'{ip:<15} {datagram[:2].hex()} seq={sequence:<6} {datagram[8:].hex(" ")}'
+    if kind == AUTOTRACK_COMMAND:
+        pan, tilt = AUTOTRACK.unpack(payload)
+        return f'camera {aux} pan {pan:+.2f} tilt {tilt:+.2f}'
+    return payload.hex(' ')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='the log file; its rotated predecessors are read first')
+    parser.add_argument('--kinds', nargs='*', choices=list(KIND_NAMES.values()), help='only show these records')
+    parser.add_argument('--summary', action='store_true', help='only print record counts per kind')
+    args = parser.parse_args()
+
+    files = log_files(args.path)
+    if not files:
+        parser.error(f'No log found at {args.path}')
+    counts = {}
+    origin = None
+    for path in files:
+        for record in read_records(path):
+            if record[0] == 'header':
+                _, wall_start, mono_start = record
+                if origin is None:
+                    origin = mono_start
+                if not args.summary:
+                    print(f'# {path}: started {time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(wall_start))}')
+                continue
+            timestamp, kind, aux, payload = record
+            name = KIND_NAMES.get(kind, f'kind{kind}')
+            counts[name] = counts.get(name, 0) + 1
+            if args.summary or (args.kinds and name not in args.kinds):
+                continue
+            print(f'{(timestamp - origin) / 1e9:12.6f}  {name:<7} {describe(kind, aux, payload)}')
+    if args.summary:
+        for name, count in sorted(counts.items()):
+            print(f'{name:<7} {count}')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,23 +1,50 @@
 # shared_state.py
 
 import json
-from ViscaOverIP.camera import Camera
+import os
+import threading
+import time
+from camera_pool import CameraPool
+from motion_mixer import MotionMixer
+from pose_estimator import PoseEstimator
+from preset_store import FastPresetStore
 
 class SharedState:
     def __init__(self, config_file='config.json'):
+        config_dir = os.path.dirname(os.path.abspath(config_file))
         # Load camera configuration
         with open(config_file, 'r') as config_file:
             self.config = json.load(config_file)
         
         # Shared state variables
         self.cameras = self.config['cameras']
+        self.config_version = 0  # Bumped on every config change, used for API caching
         self.current_camera_index = 0
         self.cam = None
+        self.camera_pool = CameraPool()  # One connection per camera, shared by switching and broadcasts
+        # Locally cached absolute positions, stored next to the config file
+        self.fast_presets = FastPresetStore(os.path.join(config_dir, 'fast_presets.json'))
 
         self.currentPan = 0
         self.currentTilt = 0
         self.currentZoom = 0
 
+        # Every keyboard: this SharedState is the main keyboard's station, extra ones are
+        # KeyboardStations. Each camera is driven by at most one of them at a time.
+        self.name = 'the main keyboard'
+        self.stations = [self]
+        self.camera_owners = {}  # camera index -> the station that has it selected
+        self.last_moved = time.monotonic()  # when the main keyboard's stick was last off centre
+        # Seconds a keyboard must leave its camera's stick alone before another one may take the camera
+        # over ("keyboards": {"takeover_after": ...}, null to never allow it)
+        self.takeover_after = self.config.get('keyboards', {}).get('takeover_after', 10.0)
+        self._owners_lock = threading.Lock()
+
+        # Final pan/tilt/zoom output per camera index, combining joystick and auto tracking
+        self.mixers = {}
+        # Dead-reckoned pan/tilt/zoom per camera index, kept up to date by the actuation workers
+        self.estimators = {}
+
         self.home_mode = False
         self.fast_mode_active = False
 
@@ -26,26 +53,126 @@ class SharedState:
 
         self.controller = None  # Add this line
         self.led_manager = None  # Centralised LED state manager
+        self.detection_service = None  # Optional server-side person detection
+        self.actuation = None  # Optional ActuationPool driving every camera concurrently
+        self.macros = None  # Optional MacroEngine running timed sequences and tours
+        self.health = None  # Optional HealthMonitor probing every camera in the background
+        self.recorder = None  # Optional SessionRecorder logging joystick input and VISCA traffic
 
-    def connect_to_camera(self, index):
-        """Connect to a camera based on index from the config."""
+    def connect_to_camera(self, index, station=None):
+        """Connect a keyboard to a camera based on index from the config.
+        :param station: the KeyboardStation switching; the main keyboard if None
+        """
+        station = station or self
         if 0 <= index < len(self.cameras):
+            if self.health is not None and self.health.is_down(self.cameras[index]['ip']):
+                # Don't sit through a timeout cascade on a camera that isn't answering
+                print(f"Camera at {self.cameras[index]['ip']} is down, not switching to it")
+                return False
             try:
-                if self.cam:
-                    self.cam.close_connection()
-                self.cam = Camera(self.cameras[index]['ip'])
-                self.current_camera_index = index
-                self.cam.slow_pan_tilt(True)
+                cam = self.camera_pool.get(self.cameras[index]['ip'])
+                previous = station.current_camera_index
+                held = self.camera_owners.get(previous) is station
+                if not self._claim_camera(station, index):
+                    print(f"Camera at {self.cameras[index]['ip']} is in use by "
+                          f"{self.camera_owners[index].name}, not switching to it")
+                    return False
+                if index != previous and held and previous in self.mixers:
+                    # The joystick moves on to the new camera, so stop it driving the old one
+                    self.mixers[previous].set_joystick(0, 0, 0)
+                    self.mixers[previous].tick()
+                station.cam = cam
+                station.current_camera_index = index
+                self.get_mixer(index).set_camera(cam)
+                cam.slow_pan_tilt(True)
                 # Disable zoom-triggered autofocus to prevent unwanted movement during zoom
                 try:
-                    self.cam.set_autofocus_mode('normal')
+                    cam.set_autofocus_mode('normal')
                 except Exception as e:
                     print(f"Warning: Could not set autofocus mode: {e}")
                 return True
             except Exception as e:
                 print(f"Error connecting to camera at {self.cameras[index]['ip']}: {e}")
+                self.camera_pool.discard(self.cameras[index]['ip'])
         return False
 
+    def _claim_camera(self, station, index):
+        """Makes `station` the keyboard driving camera `index`, unless another keyboard has it and has
+        moved its stick in the last `takeover_after` seconds. :return: whether it did"""
+        with self._owners_lock:
+            owner = self.camera_owners.get(index)
+            if owner is not None and owner is not station:
+                idle = time.monotonic() - owner.last_moved
+                if self.takeover_after is None or idle < self.takeover_after:
+                    return False
+                print(f"{station.name} takes the camera at {self.cameras[index]['ip']} over from {owner.name}, "
+                      f"idle for {idle:.0f} s")
+            if self.camera_owners.get(station.current_camera_index) is station:
+                del self.camera_owners[station.current_camera_index]
+            self.camera_owners[index] = station
+            return True
+
+    def add_station(self, station):
+        """Attach an extra keyboard, see KeyboardStation."""
+        self.stations.append(station)
+        station.controller.inputCtrl.keyboard = len(self.stations) - 1
+        station.controller.inputCtrl.recorder = self.recorder
+
+    def remove_station(self, station):
+        """Detach an extra keyboard, e.g. one that was unplugged, and let go of its camera."""
+        if station in self.stations:
+            self.stations.remove(station)
+        index = station.current_camera_index
+        with self._owners_lock:
+            held = self.camera_owners.get(index) is station
+            if held:
+                del self.camera_owners[index]
+        if held and index in self.mixers:
+            self.mixers[index].set_joystick(0, 0, 0)
+            self.tick_motion(station)
+
+    def get_keyboards(self):
+        """Every keyboard, the camera it has selected and whether it still drives that camera."""
+        return [{'name': station.name,
+                 'camera_index': station.current_camera_index,
+                 'driving': self.camera_owners.get(station.current_camera_index) is station}
+                for station in self.stations]
+
+    def broadcast(self, action, args=(), camera_indices=None, timeout=10.0):
+        """Run one command on several cameras at the same time.
+
+        :param action: one of camera_pool.BROADCAST_ACTIONS, e.g. 'recall_preset' or 'home'
+        :param args: positional arguments for the action
+        :param camera_indices: the cameras to act on; all configured cameras if None
+        :return: a per-camera outcome report, see CameraPool.broadcast
+        """
+        if camera_indices is None:
+            camera_indices = range(len(self.cameras))
+        invalid = [index for index in camera_indices if not 0 <= index < len(self.cameras)]
+        if invalid:
+            raise ValueError(f'Unknown camera indices: {invalid}')
+        targets = {index: self.cameras[index]['ip'] for index in camera_indices}
+        return self.camera_pool.broadcast(targets, action, args, timeout)
+
+    def _camera_for(self, camera_index):
+        if camera_index is None:
+            camera_index = self.current_camera_index
+        if not 0 <= camera_index < len(self.cameras):
+            raise ValueError(f'Unknown camera index: {camera_index}')
+        return self.camera_pool.get(self.cameras[camera_index]['ip'])
+
+    def save_fast_preset(self, preset_num, camera_index=None):
+        """Capture a camera's current pan/tilt/zoom as a fast preset (the selected camera if no index)."""
+        return self.fast_presets.save(self._camera_for(camera_index), preset_num)
+
+    def recall_fast_preset(self, preset_num, camera_index=None, timeout=10.0):
+        """Drive a camera to a fast preset at full speed and wait until it arrives."""
+        return self.fast_presets.recall(self._camera_for(camera_index), preset_num, timeout)
+
+    def mark_config_changed(self):
+        """Record that the config or camera list has been modified."""
+        self.config_version += 1
+
     def reset_camera(self):
         """Resets the camera connection and initializes state."""
         self.cam = None
@@ -55,33 +182,96 @@ class SharedState:
         self.fast_mode_active = False
         self.home_mode = False
 
+    def get_mixer(self, index):
+        """The motion mixer for a camera index, created on first use."""
+        if index not in self.mixers:
+            # setdefault keeps this safe when the API and an actuation worker race to create it
+            self.mixers.setdefault(index, MotionMixer())
+        return self.mixers[index]
+
+    def get_estimator(self, index):
+        """The pose estimator for a camera index, created on first use."""
+        if index not in self.estimators:
+            self.estimators.setdefault(index, PoseEstimator())
+        return self.estimators[index]
+
+    def get_poses(self):
+        """Estimated pan/tilt/zoom of every camera, at no network cost."""
+        return {index: estimator.stats() for index, estimator in self.estimators.items()}
+
+    def joystick_gain(self, camera_index=None):
+        """Pan/tilt joystick gain for a camera (the selected one if no index): the further it is zoomed in,
+        the slower it moves, so the picture moves at roughly the same rate at any zoom. Off unless
+        "zoom_sensitivity": {"enabled": true}, and only for cameras whose zoom ratio is known: a model in
+        pose_estimator.SPEED_TABLES or a "speed_table" in the camera's config."""
+        settings = self.config.get('zoom_sensitivity', {})
+        estimator = self.estimators.get(self.current_camera_index if camera_index is None else camera_index)
+        if not settings.get('enabled', False) or estimator is None or not estimator.known \
+                or not estimator.calibrated:
+            return 1.0
+        return max(settings.get('min_gain', 0.2), min(1.0, 1.0 / estimator.magnification()))
+
+    def update_joystick(self, pan, tilt, zoom, station=None):
+        """Feed the latest joystick position to the selected camera and update its output.
+        :param station: the KeyboardStation whose joystick this is; the main keyboard if None
+        """
+        station = station or self
+        station.currentPan = pan
+        station.currentTilt = tilt
+        station.currentZoom = zoom
+        if pan or tilt or zoom:
+            station.last_moved = time.monotonic()
+        index = station.current_camera_index
+        if index is None or self.camera_owners.get(index, station) is not station:
+            return  # another keyboard took the camera over
+        if (pan or tilt or zoom) and self.macros and self.macros.is_running(camera_index=index):
+            # Grabbing the joystick takes the camera back from a running macro
+            self.macros.stop_macro(camera_indices=[index])
+        gain = self.joystick_gain(index)
+        self.get_mixer(index).set_joystick(pan * gain, tilt * gain, zoom)
+        self.tick_motion(station)
+
     def update_pan_tilt(self, pan, tilt):
-        """Update pan and tilt state, combining joystick and auto tracking."""
-        self.currentPan = pan
-        self.currentTilt = tilt
-        
-        # Get auto tracking commands for current camera if active
-        auto_pan = 0
-        auto_tilt = 0
-        if (self.controller and self.controller.inputCtrl.auto_tracking_active and 
-            self.current_camera_index in self.auto_tracking_commands):
-            auto_commands = self.auto_tracking_commands[self.current_camera_index]
-            auto_pan = auto_commands.get('pan_speed', 0)
-            auto_tilt = auto_commands.get('tilt_speed', 0)
-        
-        # Combine joystick and auto tracking (additive)
-        combined_pan = pan + auto_pan
-        combined_tilt = tilt + auto_tilt
-        
-        # Clamp to valid VISCA range [-24, 24]
-        combined_pan = max(-24, min(24, combined_pan))
-        combined_tilt = max(-24, min(24, combined_tilt))
-        
-        if self.cam:
-            try:
-                self.cam.pantilt(pan_speed=-combined_pan, tilt_speed=-combined_tilt)
-            except Exception as e:
-                print(f"Error updating pan/tilt: {e}")
+        """Update pan and tilt from the joystick."""
+        self.update_joystick(pan, tilt, self.currentZoom)
+
+    def update_zoom(self, zoom):
+        """Update zoom state."""
+        self.update_joystick(self.currentPan, self.currentTilt, zoom)
+
+    def tick_motion(self, station=None):
+        """Recompute the selected camera's output if any input changed and send what differs.
+        When an ActuationPool is running its workers tick every mixer instead.
+        :param station: the KeyboardStation whose camera to tick; the main keyboard's if None
+        """
+        station = station or self
+        if station.cam is None or (self.actuation and self.actuation.is_running()):
+            return
+        mixer = self.get_mixer(station.current_camera_index)
+        mixer.set_auto_enabled(self.auto_tracking_enabled(station.current_camera_index))
+        mixer.tick()
+
+    def move_camera(self, camera_index, pan=None, tilt=None, zoom=None, lease=0.5, source='api'):
+        """Claim a camera's pan/tilt and/or zoom for a motion source, see MotionMixer.claim."""
+        if not 0 <= camera_index < len(self.cameras):
+            raise ValueError(f'Unknown camera index: {camera_index}')
+        self.get_mixer(camera_index).claim(source, pan, tilt, zoom, lease)
+        if camera_index == self.current_camera_index:
+            self.tick_motion()
+
+    def release_camera(self, camera_index, source='api'):
+        """Withdraw a motion source's claims on a camera."""
+        if not 0 <= camera_index < len(self.cameras):
+            raise ValueError(f'Unknown camera index: {camera_index}')
+        self.get_mixer(camera_index).release(source)
+        if camera_index == self.current_camera_index:
+            self.tick_motion()
+
+    def auto_tracking_enabled(self, camera_index=None):
+        """Whether auto tracking drives a camera: each camera follows the auto-tracking button of the
+        keyboard that has it selected, and the rest follow the main keyboard's."""
+        station = self.camera_owners.get(camera_index, self)
+        return bool(station.controller and station.controller.inputCtrl.auto_tracking_active)
 
     def update_auto_tracking_command(self, camera_index, pan_speed, tilt_speed):
         """Update auto tracking command for a specific camera."""
@@ -89,18 +279,35 @@ class SharedState:
             'pan_speed': pan_speed,
             'tilt_speed': tilt_speed
         }
+        if self.recorder is not None:
+            self.recorder.autotrack(camera_index, pan_speed, tilt_speed)
+        self.get_mixer(camera_index).set_auto(pan_speed, tilt_speed)
 
-    def update_zoom(self, zoom):
-        """Update zoom state."""
-        self.currentZoom = zoom
-        if self.cam:
-            self.cam.zoom(speed=zoom)
+    def get_motion_stats(self):
+        """Sent and suppressed VISCA motion commands per camera index."""
+        if self.actuation:
+            return self.actuation.stats()
+        return {index: mixer.stats() for index, mixer in self.mixers.items()}
 
-    def home_camera(self):
-        """Send the camera to home position."""
-        if self.cam:
-            self.cam.reset_sequence_number()
-            self.cam.home()
+    def get_link_stats(self):
+        """Link quality per camera index: round-trip estimates, timeouts, lanes and the command window."""
+        connected = self.camera_pool.connected()
+        stats = {}
+        for index, camera_config in enumerate(self.cameras):
+            camera = connected.get(camera_config['ip'])
+            stats[index] = {'ip': camera_config['ip'], 'connected': camera is not None}
+            if camera is not None:
+                stats[index].update(camera.transport_stats())
+        return stats
+
+    def home_camera(self, station=None):
+        """Send the camera to home position.
+        :param station: the KeyboardStation whose camera to home; the main keyboard's if None
+        """
+        station = station or self
+        if station.cam and self.camera_owners.get(station.current_camera_index, station) is station:
+            station.cam.reset_sequence_number()
+            station.cam.home()
 
     def toggle_fast_mode(self, mode):
         """Enable or disable fast pan/tilt mode."""
@@ -115,10 +322,35 @@ class SharedState:
         """Attach a centralised LED state manager."""
         self.led_manager = led_manager
 
+    def set_actuation(self, actuation):
+        """Attach the ActuationPool that drives every camera's mixer."""
+        self.actuation = actuation
+
+    def set_macro_engine(self, macros):
+        """Attach the MacroEngine that runs macros and tours."""
+        self.macros = macros
+
+    def set_health_monitor(self, health):
+        """Attach the HealthMonitor that probes every camera."""
+        self.health = health
+
+    def set_recorder(self, recorder):
+        """Attach a SessionRecorder, fed by the keyboard, the camera connections and auto tracking."""
+        self.recorder = recorder
+        self.camera_pool.set_recorder(recorder)
+        for station in self.stations:
+            if station.controller is not None:
+                station.controller.inputCtrl.recorder = recorder
+
+    def set_detection_service(self, detection_service):
+        """Attach the server-side person detection service."""
+        self.detection_service = detection_service
+
     def update_leds(self):
-        """Delegate LED refresh to the central manager (if attached)."""
-        if self.led_manager:
-            self.led_manager.update()
+        """Delegate LED refresh to every keyboard's manager (if attached)."""
+        for station in self.stations:
+            if station.led_manager:
+                station.led_manager.update()
 
     def update_fast_mode_led(self):
         if self.fast_mode_active:
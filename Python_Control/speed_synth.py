@@ -0,0 +1,65 @@
+import math
+from typing import Optional
+
+
+class SpeedSynthesizer:
+    """
+    Turns a continuous speed for one axis into the integer steps VISCA accepts.
+
+    The output is re-quantised at a bounded rate using error feedback (first order sigma-delta):
+    the difference between the requested speed and what was actually sent is integrated over time
+    and folded into the next choice, so the time average of the integer stream matches the request.
+    A request of 1.25 becomes 1, 1, 1, 2, 1, 1, 1, 2, ... at the synthesiser's command rate.
+    """
+
+    def __init__(self, max_speed=24, rate=20.0):
+        """:param max_speed: the largest magnitude the output may take
+        :param rate: the maximum number of re-quantisations per second while dithering
+        """
+        self.max_speed = max_speed
+        self.interval = 1.0 / rate
+
+        self.target = 0.0
+        self.output = 0
+        self.error = 0.0  # accumulated (target - output), in speed steps * seconds
+        self._last_update: Optional[float] = None
+        self._last_emit = float('-inf')
+
+    def set_target(self, speed: float):
+        self.target = max(-self.max_speed, min(self.max_speed, float(speed)))
+
+    def reset(self):
+        self.target = 0.0
+        self.output = 0
+        self.error = 0.0
+        self._last_update = None
+        self._last_emit = float('-inf')
+
+    def update(self, now: float) -> Optional[int]:
+        """Integrates the error since the last call and re-quantises when due: the axis has to stop,
+        the target moved more than a step away from the output, or the command interval has elapsed.
+
+        :return: the new integer speed, or None if the output was left unchanged
+        """
+        if self._last_update is not None:
+            self.error += (self.target - self.output) * (now - self._last_update)
+            # Never let the error carry more than one step held for one interval
+            self.error = max(-self.interval, min(self.interval, self.error))
+        self._last_update = now
+
+        if self.target == 0:
+            self.error = 0.0
+            new_output = 0
+        elif abs(self.target - self.output) > 1 or now - self._last_emit >= self.interval:
+            new_output = math.floor(self.target + self.error / self.interval + 0.5)
+            new_output = max(-self.max_speed, min(self.max_speed, new_output))
+            if new_output * self.target < 0:
+                new_output = 0  # dithering must never reverse the direction of travel
+            self._last_emit = now
+        else:
+            return None
+
+        if new_output == self.output:
+            return None
+        self.output = new_output
+        return new_output
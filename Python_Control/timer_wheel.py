@@ -0,0 +1,80 @@
+import logging
+import threading
+import time
+
+
+class Timer:
+    __slots__ = ('due_tick', 'callback', 'cancelled')
+
+    def __init__(self, due_tick, callback):
+        self.due_tick = due_tick
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    A hashed timing wheel: one thread fires every timer, however many are pending.
+
+    Time is cut into ticks and each timer hangs off the slot its due tick hashes to, so scheduling
+    and cancelling are O(1) and every tick only looks at one slot. Callbacks run on the wheel's
+    thread and must return quickly; hand anything that blocks (like a VISCA round trip) to a pool.
+    """
+
+    def __init__(self, tick=0.01, slots=512):
+        """:param tick: the wheel's resolution in seconds
+        :param slots: number of slots; timers further out than `tick * slots` simply go round again
+        """
+        self.tick = tick
+        self._slots = [[] for _ in range(slots)]
+        self._lock = threading.Lock()
+        self._current_tick = 0
+        self._started_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._started_at = time.monotonic()
+        self._current_tick = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='timer-wheel')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def schedule(self, delay, callback) -> Timer:
+        """Calls `callback()` on the wheel thread after `delay` seconds (rounded up to the next tick)."""
+        with self._lock:
+            due = self._current_tick + max(1, -(-delay // self.tick))
+            timer = Timer(int(due), callback)
+            self._slots[timer.due_tick % len(self._slots)].append(timer)
+        return timer
+
+    def _run(self):
+        while not self._stop.is_set():
+            target_tick = int((time.monotonic() - self._started_at) / self.tick)
+            while self._current_tick < target_tick:
+                self._fire(self._current_tick + 1)
+            self._stop.wait(max(0.0, self._started_at + (self._current_tick + 1) * self.tick - time.monotonic()))
+
+    def _fire(self, tick):
+        with self._lock:
+            self._current_tick = tick
+            slot = self._slots[tick % len(self._slots)]
+            due = [timer for timer in slot if timer.due_tick <= tick]
+            if due:
+                slot[:] = [timer for timer in slot if timer.due_tick > tick]
+        for timer in due:
+            if timer.cancelled:
+                continue
+            try:
+                timer.callback()
+            except Exception as e:
+                logging.error(f"Error in timer callback: {e}")